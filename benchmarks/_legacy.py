@@ -0,0 +1,303 @@
+"""Reference copies of pipeline stages as they were before they were optimized.
+
+The benchmarks time these against the current implementations and use them to
+check that the optimized code still produces identical output. Do not import
+this module from the application.
+"""
+import os
+import re
+import base64
+from pathlib import Path
+
+from markdown_converter_core import PREVIEW_PAGE_SIZES_IN, resource_path
+
+
+def find_color_folder(base_path: Path) -> Path:
+    color_folders = []
+    for root, dirs, files in os.walk(base_path):
+        if os.path.basename(root).lower() == "flat": #'Color' or the one with complex gradients looks fucked up so use the flat ones.
+            parent = Path(root).parent
+            if parent.name.lower() == "default":
+                # Prefer this immediately
+                return Path(root)
+            color_folders.append(Path(root))
+    # If no 'Color' inside 'Default', return any found 'Color' folder
+    return color_folders[0] if color_folders else None
+
+def replace_glyphs_with_svg(text: str, emoji_mapping: dict, img_style: str = "") -> str:
+        # Build a regex pattern to match all glyphs in one pass
+        if not emoji_mapping:
+            return text
+
+        glyphs = list(emoji_mapping.keys())
+        # Sort by length descending to avoid partial matches
+        glyphs.sort(key=len, reverse=True)
+        pattern = re.compile('|'.join(map(re.escape, glyphs)))
+
+        # Cache SVG content to avoid repeated disk reads
+        svg_cache = {}
+
+        def remove_svg_clip_path(svg_content: str) -> str:
+            # Remove <clipPath> definitions in <defs>
+            svg_content = re.sub(
+                r'<defs>\s*<clipPath[^>]*>.*?</clipPath>\s*</defs>', '', svg_content, flags=re.DOTALL
+            )
+            # Remove clip-path attributes like clip-path="url(#...)"
+            svg_content = re.sub(
+                r'\sclip-path="url\(#.*?\)"', '', svg_content
+            )
+            return svg_content
+
+        def repl(match):
+            glyph = match.group(0)
+            if glyph in svg_cache:
+                svg_content = svg_cache[glyph]
+            else:
+                folder_name = emoji_mapping[glyph]
+                # MODIFICATION: Use resource_path to locate assets relative to the script/executable
+                fluentui_path = resource_path("assets/fluentui_assets")
+                base_assets = Path(fluentui_path) / folder_name
+                color_folder = find_color_folder(base_assets)
+                svg_file = None
+                if color_folder:
+                    svg_file = next(color_folder.glob('*.svg'), None)
+                if svg_file:
+                    with open(svg_file, 'r', encoding='utf-8') as svg_f:
+                        svg_content = svg_f.read()
+                    # Clean up and prepare SVG content
+                    svg_content = re.sub(r'[\r\n\t]', ' ', svg_content)
+                    svg_content = re.sub(r'\s{2,}', ' ', svg_content).strip()
+                    
+                    # Ensure xmlns attribute is present for compatibility
+                    if 'xmlns=' not in svg_content:
+                        svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"')
+                    
+                    # Remove clip-paths as workaround for wkhtmltopdf SVG rendering issues
+                    svg_content = remove_svg_clip_path(svg_content)
+
+                    svg_cache[glyph] = svg_content
+                else:
+                    svg_cache[glyph] = glyph
+                    svg_content = glyph
+
+            # If we have SVG content, embed as background image in a span for better wkhtmltopdf compatibility
+            if svg_content.startswith("<svg"):
+                # Remove XML declaration if present for cleaner embedding
+                svg_clean = re.sub(r'<\?xml.*?\?>', '', svg_content).strip()
+
+                # Remove any existing width/height attributes from the <svg> tag.
+                svg_no_size = re.sub(r'\s+width="[^"]+"', '', svg_clean, 1)
+                svg_no_size = re.sub(r'\s+height="[^"]+"', '', svg_no_size, 1)
+
+                # Inject the desired high-resolution dimensions to force high-quality rasterization.
+                svg_with_size = re.sub(r'<svg', '<svg width="128" height="128"', svg_no_size, 1)
+
+                # Base64 encoding for background-image
+                svg_base64 = base64.b64encode(svg_with_size.encode('utf-8')).decode('ascii')
+                background_style = (
+                    f'display:inline-block;width:1.2em;height:1.2em;margin:0 0.1em;'
+                    f'background:url(data:image/svg+xml;base64,{svg_base64}) no-repeat center center;'
+                    f'background-size:contain;vertical-align:-0.3em;'
+                )
+                # Merge with any additional img_style
+                if img_style:
+                    background_style += img_style
+                return f'<span style="{background_style}"></span>'
+            else:
+                # If it's not SVG, return the original glyph
+                return svg_content
+
+        return pattern.sub(repl, text)
+
+
+def correct_table_spacing(md_text: str) -> str:
+    """Adds blank lines before tables if they're missing, which is required for proper markdown rendering."""
+    table_row_pattern = r'^\s*\|.*\|\s*$'
+    lines = md_text.split('\n')
+    corrected_lines = []
+    for i, line in enumerate(lines):
+        if re.match(table_row_pattern, line):
+            is_table_start = True
+            if i > 0:
+                prev_line = lines[i-1].strip()
+                if (re.match(table_row_pattern, prev_line) or 
+                    re.match(r'^\s*\|[\s\-\:]*\|\s*$', prev_line)):
+                    is_table_start = False
+            if is_table_start and i > 0:
+                prev_line = lines[i-1].strip()
+                if prev_line and not re.match(r'^\s*$', prev_line):
+                    corrected_lines.append('')
+        corrected_lines.append(line)
+    return '\n'.join(corrected_lines)
+
+def correct_table_separator_spacing(md_text: str) -> str:
+    """Ensures table separators (|---|---| lines) have proper spacing around them."""
+    separator_pattern = r'^\s*\|[\s\-\:\|]*\|\s*$'
+    lines = md_text.split('\n')
+    corrected_lines = []
+    for i, line in enumerate(lines):
+        if re.match(separator_pattern, line) and re.search(r'[\-]+', line):
+            corrected_lines.append(line)
+        else:
+            corrected_lines.append(line)
+    return '\n'.join(corrected_lines)
+
+def correct_markdown_table_list_spacing(md_text: str) -> str:
+    """Corrects markdown formatting errors where lists or headings immediately
+    follow a table without a blank line, causing rendering issues."""
+    pattern = re.compile(
+        r"(^\s*\|.*\|\s*$)\n(^\s*(?:[\*\-\+]|\d+\.(?!\S)|#+)\s+.*$)",
+        re.MULTILINE
+    )
+    previous_text = None
+    max_iterations = 10
+    count = 0
+    corrected_text = md_text
+    while corrected_text != previous_text and count < max_iterations:
+        previous_text = corrected_text
+        corrected_text = pattern.sub(r"\1\n\n\2", previous_text)
+        count += 1
+        if previous_text == corrected_text:
+            break
+    return corrected_text
+
+def correct_general_list_and_heading_spacing(md_text: str) -> str:
+    """Corrects markdown formatting errors where lists or headings immediately
+    follow a paragraph-like line without a blank line.
+    Ensures that list items are not incorrectly separated from each other.
+    """
+    pattern = re.compile(
+        r"("
+        r"^"
+        r"(?!(?:[ \t]+.*)\n\s*(?:[\*\-\+]|\d+\.(?!\S))\s+)"
+        r"[ \t]*"
+        r"(?!(?:[\*\-\+]|\d+\.(?!\S))\s+)"
+        r"(?!(?:  (?:[\*\-\+]|\d+\.)[ \t]+|  \#+[ \t]+|  [ \t]*\||  [ \t]*>|  [ \t]*(?:---|\*\*\*|___)[ \t]*$|  [ \t]*(?:```|~~~)))"
+        r"(?![ \t]*$)"
+        r".+"
+        r"$"
+        r")"
+        r"\n"
+        r"("
+        r"^[ \t]*(?:[\*\-\+]|\d+\.(?!\S)|\#+)\s+.*$"
+        r")",
+        re.MULTILINE | re.VERBOSE
+    )
+    previous_text = None
+    max_iterations = 10 
+    count = 0
+    corrected_text = md_text
+    while corrected_text != previous_text and count < max_iterations:
+        previous_text = corrected_text
+        corrected_text = pattern.sub(r"\1\n\n\2", previous_text)
+        count += 1
+        if previous_text == corrected_text:
+            break
+    return corrected_text
+
+
+def auto_fix_markdown(md_text: str) -> str:
+    """The auto-fix steps in the order create_html_body applied them."""
+    md_text = re.sub(r'^(#+)\s*\*\*(.*?)\*\*', r'\1 \2', md_text, flags=re.MULTILINE)
+    md_text = correct_table_spacing(md_text)
+    md_text = correct_table_separator_spacing(md_text)
+    md_text = correct_markdown_table_list_spacing(md_text)
+    md_text = correct_general_list_and_heading_spacing(md_text)
+    return md_text
+
+
+def analyze_table_width(html_content):
+    table_pattern = r'<table[^>]*>(.*?)</table>'
+    tables = re.findall(table_pattern, html_content, re.DOTALL)
+    max_columns = 0
+    for table in tables:
+        header_match = re.search(r'<tr[^>]*>(.*?)</tr>', table, re.DOTALL)
+        if header_match:
+            cells = re.findall(r'<t[hd][^>]*>', header_match.group(1))
+            max_columns = max(max_columns, len(cells))
+    return max_columns
+
+
+def get_table_css(html_content, options):
+    table_handling = options["table_handling"]
+    max_columns = analyze_table_width(html_content)
+    is_landscape = options["orientation"] == "landscape"
+
+    # Only set background colors if using the default light theme
+    theme = options["current_theme"]
+    if theme == "default_light.css":
+        th_bg = "background-color: #f4f4f4;"
+        th_color = ""
+        td_bg = ""
+    else:
+        th_bg = ""
+        th_color = ""
+        td_bg = ""
+
+    base_css = (
+        f"table {{ border-collapse: collapse; width: 100%; margin: 1em 0; page-break-inside: avoid; }} "
+        f"th, td {{ border: 1px solid #ddd; text-align: left; vertical-align: top; padding: 8px; {td_bg} }} "
+        f"th {{ {th_bg} font-weight: bold; {th_color} }}"
+    )
+
+    if table_handling == "smart_fit":
+        if max_columns > 8 or (max_columns > 6 and not is_landscape):
+            return base_css + "table { font-size: 0.7em; } th, td { padding: 4px 6px; word-wrap: break-word; hyphens: auto; max-width: 120px; min-width: 60px; }"
+        elif max_columns > 5 or (max_columns > 4 and not is_landscape):
+            return base_css + "table { font-size: 0.85em; } th, td { padding: 6px 8px; word-wrap: break-word; hyphens: auto; max-width: 150px; }"
+        else:
+            return base_css + "th, td { word-wrap: break-word; hyphens: auto; }"
+    elif table_handling == "smaller_font":
+        return base_css + "table { font-size: 0.7em; } th, td { padding: 4px 6px; word-wrap: break-word; hyphens: auto; }"
+    else:  # break_words
+        return base_css + "table { table-layout: fixed; } th, td { word-wrap: break-word; word-break: break-all; hyphens: auto; overflow-wrap: break-word; }"
+
+
+def load_theme_css(themes_dir, options):
+    """Read the selected theme, or return an empty string if it does not exist."""
+    theme_path = os.path.join(themes_dir, options["current_theme"])
+    theme_css = ""
+    if os.path.exists(theme_path):
+        with open(theme_path, 'r', encoding='utf-8') as f:
+            theme_css = f.read()
+    return theme_css
+
+
+def preview_page_css(options):
+    """The md2pdf-page stylesheet as build_preview composed it."""
+    page_w_in, page_h_in = PREVIEW_PAGE_SIZES_IN.get(options["page_size"], (8.27, 11.69))
+    if options["orientation"] == 'landscape':
+        page_w_in, page_h_in = page_h_in, page_w_in
+
+    try:
+        margin_t = float(options["margin_top"])
+        margin_b = float(options["margin_bottom"])
+        margin_l = float(options["margin_left"])
+        margin_r = float(options["margin_right"])
+    except ValueError: # Handle invalid or empty fields
+        margin_t, margin_b, margin_l, margin_r = 0.8, 0.8, 0.6, 0.6
+
+    content_w_in = page_w_in - margin_l - margin_r
+
+    preview_specific_css = f"""
+    html {{
+        padding: 2em 0;          /* Vertical spacing for the shadow effect */
+        display: flex;
+        justify-content: center;
+    }}
+    body {{
+        /* Set page width based on paper size minus horizontal margins */
+        width: {content_w_in}in;
+        max-width: 98%;          /* Prevent overflow on narrow windows and allow slight padding */
+
+        /* Use padding to simulate the document margins */
+        padding: {margin_t}in {margin_r}in {margin_b}in {margin_l}in;
+
+        /* Visual styling to make it look like a page */
+        box-shadow: 0 0.5rem 2rem rgba(0,0,0,0.4);
+        box-sizing: border-box;  /* Include padding and border in the element's total width and height */
+        margin: 0 !important;    /* Override any margin the theme might set */
+    }}
+    """
+
+    return f"@media screen {{ {preview_specific_css} }}"
@@ -0,0 +1,132 @@
+"""Markdown auto-fix: the old iterative regex passes vs. the single-pass MarkdownAutoFixer.
+
+Run from the repository root:
+
+    python benchmarks/bench_auto_fix.py
+    python benchmarks/bench_auto_fix.py --size 20000 --random-documents 50000
+
+First checks that both produce the same text on a golden corpus: the README,
+a hand-written document full of the slips auto-fix repairs, and seeded random
+documents built from tricky lines. The old table/list pass re-inserted a blank
+line on each of its ten iterations, so runs of blank lines are collapsed
+before comparing. Then times both on the corpus and on adversarial inputs of
+``--size`` characters, and the new fixer alone on inputs 100 times larger.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+from benchmarks import _legacy  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SLIPS = """# **Quarterly report**
+##
+**Summary in bold**
+Intro paragraph right before a table.
+| Region | Revenue |
+|:---|---:|
+| EMEA | 1.2M |
+- a list right after the table
+- second item
+Paragraph text
+1. numbered item after text
+2. another
+  indented continuation
+  - nested item
+# Heading after a list
+Text before a heading
+## Next section
+> quote
+- item after a quote
+---
+* star item
++ plus item
+```
+| not | really | a table |
+- inside a fence
+```
+#Not a heading
+- item
+  1. nested numbered
+Closing line
+"""
+
+TRICKY_LINES = [
+    "", " ", "\t", "Plain text", "  indented text", "    code line", "- item", "-", "- ", "  - nested",
+    "* star", "+ plus", "1. one", "1.", "12.x", "# Heading", "#", "##  ", "**bold**", "  **bold** tail",
+    "# **Bold heading**", "#**Bold**", "| a | b |", "|---|---|", " | row |", "|x", "> quote", "---",
+    "***", "___ ", "```", "~~~python", "#hashtag", "- - -", "1.\ttab", "text with | pipe", "|",
+]
+
+
+def random_documents(count, seed=0):
+    rng = random.Random(seed)
+    return ["\n".join(rng.choice(TRICKY_LINES) for _ in range(rng.randint(1, 25))) for _ in range(count)]
+
+
+def golden_corpus(random_count):
+    with open(os.path.join(ROOT, "README.md"), encoding="utf-8") as f:
+        readme = f.read()
+    return {"README.md": readme, "slips": SLIPS, "slips x200": SLIPS * 200}, random_documents(random_count)
+
+
+def collapse_blank_lines(text):
+    return re.sub(r'\n{3,}', '\n\n', text)
+
+
+def adversarial_inputs(size):
+    return {
+        "paragraph lines": "\n".join("a line of one long paragraph" for _ in range(size // 29)),
+        "indented lines": "\n".join("  indented text" for _ in range(size // 16)),
+        "one long line": "word " * (size // 5),
+        "whitespace line": " " * size + "\ntext",
+        "pipes": "|" * size,
+        "table then list": "| a | b |\n- item\n" * (size // 17),
+        "bare headings": "#\n" * (size // 2),
+        "unclosed bold": "# **" + "*" * size,
+    }
+
+
+def timed_ms(func, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000,
+                        help="characters per adversarial input (the old passes are quadratic on some)")
+    parser.add_argument("--random-documents", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    documents, randoms = golden_corpus(args.random_documents)
+    for name, text in list(documents.items()) + [(f"random #{i}", text) for i, text in enumerate(randoms)]:
+        expected = collapse_blank_lines(_legacy.auto_fix_markdown(text))
+        if collapse_blank_lines(core.MarkdownAutoFixer.fix(text)) != expected:
+            sys.exit(f"auto-fix output differs for {name}: {text!r}")
+    print(f"identical output on {len(documents)} documents and {len(randoms)} random documents")
+
+    print(f"{'input':<18}{'chars':>9}{'old ms':>11}{'new ms':>10}{'new ms x100':>13}")
+    for name, text in documents.items():
+        print(f"{name:<18}{len(text):>9}{timed_ms(_legacy.auto_fix_markdown, text):>11.2f}"
+              f"{timed_ms(core.MarkdownAutoFixer.fix, text):>10.2f}")
+    large = adversarial_inputs(args.size * 100)
+    for name, text in adversarial_inputs(args.size).items():
+        print(f"{name:<18}{len(text):>9}{timed_ms(_legacy.auto_fix_markdown, text, repeat=1):>11.2f}"
+              f"{timed_ms(core.MarkdownAutoFixer.fix, text):>10.2f}"
+              f"{timed_ms(core.MarkdownAutoFixer.fix, large[name], repeat=1):>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
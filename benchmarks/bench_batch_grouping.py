@@ -0,0 +1,68 @@
+"""Throughput of batch conversion with 1, 10 and 100 documents per wkhtmltopdf run.
+
+Run from the repository root (needs wkhtmltopdf, plus pypdf for group sizes > 1):
+
+    python benchmarks/bench_batch_grouping.py
+    python benchmarks/bench_batch_grouping.py --documents 200 --groups 1 25 --jobs 4
+
+Writes a set of short synthetic documents to a temporary folder and converts
+them with run_batch at each group size, reporting wall time and documents per
+second. The book mode (one combined PDF for every document) is timed as well.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+
+
+def make_document(index: int) -> str:
+    return (f"# Release note {index}\n\n"
+            f"Short summary for component {index} ✅.\n\n"
+            "| Field | Value |\n|---|---|\n"
+            f"| build | {1000 + index} |\n| status | shipped 🚀 |\n\n"
+            "- fixed a crash on start-up\n- improved error messages\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--jobs", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    options = {**core.DEFAULT_OPTIONS, "generate_toc": False, "pdf_cache": False}
+    blocker = core.group_conversion_blocker(options)
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as tmp:
+        source_dir = os.path.join(tmp, "src")
+        os.makedirs(source_dir)
+        for index in range(args.documents):
+            with open(os.path.join(source_dir, f"note{index:04d}.md"), "w", encoding="utf-8") as f:
+                f.write(make_document(index))
+        themes_dir = os.path.join(tmp, "themes")
+
+        print(f"{args.documents} documents, {args.jobs} job(s)")
+        print(f"{'docs/run':>9}{'runs':>6}{'wall s':>9}{'docs/s':>9}{'failed':>8}")
+        for group_size in args.groups:
+            if group_size > 1 and blocker:
+                print(f"{group_size:>9}  skipped: {blocker}")
+                continue
+            pairs = core.collect_batch_inputs([source_dir], os.path.join(tmp, f"out{group_size}"))
+            summary = core.run_batch(pairs, options, args.jobs, themes_dir, group_size=group_size)
+            runs = -(-len(pairs) // group_size)
+            print(f"{group_size:>9}{runs:>6}{summary['wall_seconds']:>9.2f}"
+                  f"{summary['total'] / summary['wall_seconds']:>9.1f}{summary['failed']:>8}")
+
+        pairs = core.collect_batch_inputs([source_dir], os.path.join(tmp, "book"))
+        start = time.perf_counter()
+        summary = core.run_book(pairs, os.path.join(tmp, "book.pdf"), options, themes_dir)
+        wall = time.perf_counter() - start
+        print(f"{'book':>9}{1:>6}{wall:>9.2f}{len(pairs) / wall:>9.1f}{summary['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
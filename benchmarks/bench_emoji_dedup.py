@@ -0,0 +1,90 @@
+"""Compare inline per-occurrence emoji images with the per-document CSS class mode.
+
+Run from the repository root:
+
+    python benchmarks/bench_emoji_dedup.py
+    python benchmarks/bench_emoji_dedup.py --pdf   # also render both with wkhtmltopdf
+
+Builds a synthetic emoji-dense corpus (checklists and a chat export) and reports
+the HTML size and Markdown render time for each mode, plus the resulting PDF
+size and wkhtmltopdf time when --pdf is given.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown  # noqa: E402
+
+import markdown_converter_core as core  # noqa: E402
+
+EXTENSIONS = ['tables', 'extra', 'sane_lists', 'fenced_code', 'nl2br', 'toc', 'smarty']
+STATUS = ["✅", "❌", "⚠️", "🚧"]
+CHAT = ["😂", "👍", "🎉", "🔥", "❤️", "🙏", "😅", "🤔", "👀", "🚀", "💯", "😭"]
+
+
+def make_corpus(items: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = ["# Release checklist", ""]
+    for i in range(items):
+        lines.append(f"- {rng.choice(STATUS)} Task {i}: verify component {rng.randint(1, 99)}")
+    lines += ["", "# Chat export", ""]
+    for i in range(items):
+        reactions = " ".join(rng.choice(CHAT) for _ in range(rng.randint(1, 3)))
+        lines.append(f"**user{i % 7}**: message number {i} {reactions}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render(md_text, mapping, dedupe):
+    emoji_classes = {} if dedupe else None
+    start = time.perf_counter()
+    text = core.replace_glyphs_with_svg(md_text, mapping, emoji_classes=emoji_classes)
+    html = markdown.markdown(text, extensions=EXTENSIONS)
+    if emoji_classes:
+        html = core.emoji_stylesheet(emoji_classes, mapping) + html
+    return html, time.perf_counter() - start
+
+
+def render_pdf(html):
+    import pdfkit
+    with tempfile.TemporaryDirectory() as tmp:
+        html_path = os.path.join(tmp, "doc.html")
+        pdf_path = os.path.join(tmp, "doc.pdf")
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'></head><body>{html}</body></html>")
+        start = time.perf_counter()
+        pdfkit.from_file(html_path, pdf_path, options={'quiet': None, 'enable-local-file-access': None})
+        return os.path.getsize(pdf_path), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--pdf", action="store_true", help="also render PDFs (needs wkhtmltopdf)")
+    args = parser.parse_args(argv)
+
+    mapping = core.load_mapping_from_file()
+    header = f"{'items':>6}{'mode':>8}{'emoji':>7}{'html KiB':>11}{'render ms':>11}"
+    print(header + (f"{'pdf KiB':>10}{'pdf s':>8}" if args.pdf else ""))
+    for items in args.items:
+        md_text = make_corpus(items)
+        found = []
+        core.get_emoji_matcher(mapping).sub(lambda glyph: found.append(glyph) or glyph, md_text)
+        glyphs = len(found)
+        render(md_text, mapping, True)  # resolve every glyph once so both modes start warm
+        for mode, dedupe in (("inline", False), ("dedupe", True)):
+            html, seconds = render(md_text, mapping, dedupe)
+            row = f"{items:>6}{mode:>8}{glyphs:>7}{len(html.encode('utf-8')) / 1024:>11.1f}{seconds * 1000:>11.1f}"
+            if args.pdf:
+                pdf_bytes, pdf_s = render_pdf(html)
+                row += f"{pdf_bytes / 1024:>10.1f}{pdf_s:>8.2f}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark for replace_glyphs_with_svg: legacy per-call regex vs. the shared matcher.
+
+Run from the repository root (asset paths are resolved relative to it):
+
+    python benchmarks/bench_emoji_matcher.py
+    python benchmarks/bench_emoji_matcher.py --sizes 10KB 1MB --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+from benchmarks import _legacy  # noqa: E402
+
+# A handful of glyphs covering single codepoints, variation selectors, ZWJ
+# sequences and keycaps (which start with an ASCII character).
+SAMPLE_GLYPHS = ["✅", "🚀", "👍", "🔥", "❤️", "✈️", "👩‍💻", "1️⃣", "#️⃣", "🎉"]
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua 2024 #tag * item café naïve 東京").split()
+
+
+def parse_size(value: str) -> int:
+    units = {"KB": 1024, "MB": 1024 * 1024}
+    for suffix, factor in units.items():
+        if value.upper().endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+
+def make_corpus(size: int, emoji_every: int, seed: int = 0) -> str:
+    """Build roughly ``size`` characters of prose, inserting a glyph every ``emoji_every`` words."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    count = 0
+    while length < size:
+        count += 1
+        if emoji_every and count % emoji_every == 0:
+            word = rng.choice(SAMPLE_GLYPHS)
+        else:
+            word = rng.choice(WORDS)
+        if count % 12 == 0:
+            word += ".\n\n" if count % 60 == 0 else "."
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)
+
+
+def time_call(func, text, mapping, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text, mapping)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["10KB", "1MB", "20MB"])
+    parser.add_argument("--repeat", type=int, default=3, help="best-of-N repetitions per measurement")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    mapping = core.load_mapping_from_file()
+    print(f"load_mapping_from_file (incl. matcher build): {(time.perf_counter() - start) * 1000:.1f} ms")
+    if not mapping:
+        sys.exit("assets/emoji_mapping.json not found; run from the repository root")
+
+    print(f"{'input':<14}{'size':>8}{'legacy ms':>14}{'matcher ms':>14}{'speedup':>12}")
+    for label in args.sizes:
+        size = parse_size(label)
+        for kind, emoji_every in (("ascii", 0), ("mixed", 40)):
+            text = make_corpus(size, emoji_every)
+            if kind == "ascii":
+                text = text.encode("ascii", "ignore").decode("ascii")
+            # Let the legacy pattern land in the re module cache before timing.
+            _legacy.replace_glyphs_with_svg(text[:4096], mapping)
+            core.replace_glyphs_with_svg(text[:4096], mapping)
+            repeat = 1 if size > 4 * 1024 * 1024 else args.repeat
+            legacy_s, legacy_out = time_call(_legacy.replace_glyphs_with_svg, text, mapping, repeat)
+            new_s, new_out = time_call(core.replace_glyphs_with_svg, text, mapping, repeat)
+            if legacy_out != new_out:
+                sys.exit(f"output mismatch for {kind} {label}")
+            print(f"{kind:<14}{label:>8}{legacy_s * 1000:>14.2f}{new_s * 1000:>14.2f}{legacy_s / max(new_s, 1e-9):>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Benchmark cold emoji resolution: asset-folder walk vs. the prebuilt SQLite store.
+
+Run from the repository root after `python build_emoji_store.py`:
+
+    python benchmarks/bench_emoji_store.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=0, help="only resolve the first N glyphs")
+    args = parser.parse_args(argv)
+
+    mapping = core.load_mapping_from_file()
+    store = core.get_emoji_store()
+    if store is None:
+        sys.exit(f"{core.EMOJI_STORE_PATH} not found; run `python build_emoji_store.py` first")
+    glyphs = sorted(mapping)[:args.limit or None]
+
+    start = time.perf_counter()
+    walked = {glyph: core.load_svg_data_uri(mapping[glyph]) for glyph in glyphs}
+    walk_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stored = {glyph: store.lookup(glyph)[1] for glyph in glyphs}
+    store_s = time.perf_counter() - start
+
+    if walked != stored:
+        sys.exit("store contents differ from the asset folders; rebuild the store")
+    print(f"store: {os.path.getsize(store.path) / 1024:.0f} KiB, version {store.version[:12]}")
+    print(f"{len(glyphs)} glyphs  walk: {walk_s * 1000 / len(glyphs):.3f} ms/glyph  "
+          f"store: {store_s * 1000 / len(glyphs):.4f} ms/glyph  ({walk_s / store_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Image optimization: bytes handed to wkhtmltopdf with and without downsampling.
+
+Run from the repository root (needs Pillow):
+
+    python benchmarks/bench_image_optimizer.py
+    python benchmarks/bench_image_optimizer.py --images 10 --megapixels 20 --dpi 150 300
+
+Writes noisy photo-like JPEGs and screenshot-like PNGs of the given size to a
+temporary folder, builds the HTML page for a document that shows them, and
+reports for each target DPI the pixels and bytes wkhtmltopdf would have to
+load, the time of a cold run (resampling) and a warm run (disk cache hit in a
+fresh process-like optimizer).
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+import markdown_converter_core as core  # noqa: E402
+
+
+def make_images(folder, count, megapixels):
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    names = []
+    for index in range(count):
+        noise = Image.effect_noise((width, height), 40 + index).convert("RGB")
+        if index % 2:
+            name = f"screenshot{index}.png"
+            noise.quantize(16).save(os.path.join(folder, name))
+        else:
+            name = f"photo{index}.jpg"
+            noise.save(os.path.join(folder, name), quality=92)
+        names.append(name)
+    return names
+
+
+def referenced_images(html):
+    paths = []
+    for src in re.findall(r'src="(file://[^"]+)"', html):
+        paths.append(urllib.request.url2pathname(urllib.parse.urlparse(src).path))
+    return paths
+
+
+def load_cost(paths):
+    pixels = 0
+    for path in paths:
+        with Image.open(path) as image:
+            pixels += image.width * image.height
+    return pixels / 1e6, sum(os.path.getsize(path) for path in paths) / 2**20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--megapixels", type=float, default=20)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 300, 600])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as tmp:
+        names = make_images(tmp, args.images, args.megapixels)
+        md_text = "# Photos\n\n" + "\n\n".join(f"![{name}]({name})" for name in names) + "\n"
+        pipeline = core.ConversionPipeline(emoji_mapping={}, themes_dir=os.path.join(tmp, "themes"))
+        options = dict(core.DEFAULT_OPTIONS, optimize_images=False)
+
+        html = pipeline.build_html_document(md_text, options, tmp)
+        megapixels, megabytes = load_cost(referenced_images(html))
+        print(f"{args.images} images of {args.megapixels:g} MP, A4 portrait")
+        print(f"{'dpi':>8}{'MP':>9}{'MB':>9}{'cold s':>9}{'warm s':>9}")
+        print(f"{'original':>8}{megapixels:>9.1f}{megabytes:>9.1f}{'':>9}{'':>9}")
+        for dpi in args.dpi:
+            cache_dir = os.path.join(tmp, f"cache{dpi}")
+            options = dict(core.DEFAULT_OPTIONS, optimize_images=True, image_dpi=dpi)
+            pipeline.images = core.ImageOptimizer(cache_dir)
+            start = time.perf_counter()
+            html = pipeline.build_html_document(md_text, options, tmp)
+            cold = time.perf_counter() - start
+            pipeline.images = core.ImageOptimizer(cache_dir)
+            start = time.perf_counter()
+            if pipeline.build_html_document(md_text, options, tmp) != html:
+                sys.exit("a warm run produced different HTML")
+            warm = time.perf_counter() - start
+            megapixels, megabytes = load_cost(referenced_images(html))
+            print(f"{dpi:>8}{megapixels:>9.1f}{megabytes:>9.1f}{cold:>9.2f}{warm:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Preview Markdown rendering: full markdown.markdown vs. the incremental block renderer.
+
+Run from the repository root:
+
+    python benchmarks/bench_incremental_preview.py
+    python benchmarks/bench_incremental_preview.py --sizes 100KB 2MB
+
+Builds a runbook-like document (headings, lists, tables, fenced code, reference
+links) and times one full render, the first incremental render (cold cache) and
+incremental renders after typical edits. Every incremental result is checked
+against a full render.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown  # noqa: E402
+
+import markdown_converter_core as core  # noqa: E402
+
+EXTENSIONS = [name for name, enabled in core.DEFAULT_OPTIONS["extensions"].items() if enabled]
+
+
+def parse_size(value: str) -> int:
+    units = {"KB": 1024, "MB": 1024 * 1024}
+    for suffix, factor in units.items():
+        if value.upper().endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+
+def make_runbook(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sections = []
+    length = 0
+    index = 0
+    while length < size:
+        index += 1
+        section = (
+            f"## Step {index}: restart service {rng.randint(1, 50)}\n\n"
+            f"Check the [dashboard][dash] and the [runbook index][index] before continuing.\n\n"
+            "1. Drain the node\n2. Restart the service\n3. Verify health checks\n\n"
+            "| host | role | status |\n|---|---|---|\n"
+            f"| web-{index} | frontend | ok |\n| db-{index} | primary | degraded |\n\n"
+            "```bash\n"
+            f"kubectl rollout restart deployment/svc-{index}\n"
+            "kubectl rollout status deployment/svc-{index}\n"
+            "```\n\n"
+            "> Note: escalate if the restart takes longer than *five minutes*.\n"
+        )
+        sections.append(section)
+        length += len(section)
+    sections.append("[dash]: https://dashboards.example/ops \"Ops\"\n[index]: https://wiki.example/runbooks\n")
+    return "\n".join(sections)
+
+
+def normalize(html):
+    # The incremental renderer may differ only in blank lines between top-level elements.
+    return re.sub(r'>\n+<', '>\n<', html)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["100KB", "1MB"])
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>7}{'blocks':>8}{'case':>22}{'ms':>10}")
+    for label in args.sizes:
+        text = make_runbook(parse_size(label))
+        blocks = len(core.IncrementalMarkdownRenderer.split_blocks(text))
+        renderer = core.IncrementalMarkdownRenderer()
+        middle = text.index("## Step", len(text) // 2)
+        edits = {
+            "type one character": text[:middle + 20] + "x" + text[middle + 20:],
+            "add a paragraph": text[:middle] + "A new paragraph.\n\n" + text[middle:],
+            "duplicate a heading": text[:middle] + "## Step 1: restart service 1\n\n" + text[middle:],
+            "change a reference": text.replace("https://wiki.example/runbooks", "https://wiki.example/ops"),
+        }
+
+        full, full_s = timed(lambda: markdown.markdown(text, extensions=EXTENSIONS))
+        cold, cold_s = timed(renderer.render, text, EXTENSIONS)
+        if normalize(cold) != normalize(full):
+            sys.exit(f"incremental output differs from a full render ({label}, cold)")
+        print(f"{label:>7}{blocks:>8}{'full render':>22}{full_s * 1000:>10.1f}")
+        print(f"{'':>7}{'':>8}{'incremental, cold':>22}{cold_s * 1000:>10.1f}")
+        for case, edited in edits.items():
+            renderer.render(text, EXTENSIONS)
+            result, seconds = timed(renderer.render, edited, EXTENSIONS)
+            if normalize(result) != normalize(markdown.markdown(edited, extensions=EXTENSIONS)):
+                sys.exit(f"incremental output differs from a full render ({label}, {case})")
+            print(f"{'':>7}{'':>8}{case:>22}{seconds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
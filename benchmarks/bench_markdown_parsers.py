@@ -0,0 +1,59 @@
+"""Per-render parser setup cost: markdown.markdown() vs. the shared parser pool.
+
+Run from the repository root:
+
+    python benchmarks/bench_markdown_parsers.py
+    python benchmarks/bench_markdown_parsers.py --renders 500
+
+Times building a Markdown object with the app's default extensions on its own,
+then rendering a short and a medium document with a fresh parser per call
+(markdown.markdown) and with markdown_parsers.convert.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown  # noqa: E402
+
+import markdown_converter_core as core  # noqa: E402
+
+EXTENSIONS = [name for name, enabled in core.DEFAULT_OPTIONS["extensions"].items() if enabled]
+SHORT = "# Note\n\nA short *note* with a [link](https://example.com).\n\n- one\n- two\n"
+MEDIUM = "\n".join(
+    f"## Section {i}\n\nSome text with `code` and **bold**.\n\n| a | b |\n|---|---|\n| {i} | {i * 2} |\n"
+    for i in range(40))
+
+
+def per_call_ms(func, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        func()
+    return (time.perf_counter() - start) * 1000 / renders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    # Import every extension module once so neither side pays for first-time imports.
+    markdown.markdown(MEDIUM, extensions=EXTENSIONS)
+    pool = core.MarkdownParserPool()
+    setup_ms = per_call_ms(lambda: markdown.Markdown(extensions=EXTENSIONS), args.renders)
+    print(f"extensions: {', '.join(EXTENSIONS)}")
+    print(f"Markdown(extensions=...) alone: {setup_ms:.3f} ms")
+    print(f"{'document':<10}{'chars':>8}{'fresh ms':>11}{'pooled ms':>11}{'saved':>9}")
+    for name, text in (("short", SHORT), ("medium", MEDIUM)):
+        if pool.convert(text, EXTENSIONS) != markdown.markdown(text, extensions=EXTENSIONS):
+            sys.exit(f"pooled output differs for the {name} document")
+        fresh_ms = per_call_ms(lambda: markdown.markdown(text, extensions=EXTENSIONS), args.renders)
+        pooled_ms = per_call_ms(lambda: pool.convert(text, EXTENSIONS), args.renders)
+        print(f"{name:<10}{len(text):>8}{fresh_ms:>11.3f}{pooled_ms:>11.3f}{1 - pooled_ms / fresh_ms:>8.0%}")
+    print(f"parsers built by the pool: {pool.created}")
+
+
+if __name__ == "__main__":
+    main()
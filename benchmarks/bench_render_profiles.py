@@ -0,0 +1,80 @@
+"""Render profiles: conversion time and PDF size for each of RENDER_PROFILES.
+
+Run from the repository root (needs wkhtmltopdf; Pillow for the photos):
+
+    python benchmarks/bench_render_profiles.py
+    python benchmarks/bench_render_profiles.py --sections 80 --images 8 --repeat 3
+
+Writes a report-like document with headings, tables, emoji and, when Pillow is
+installed, noisy photos larger than the page, then converts it once per profile
+with the PDF cache off. Prints the best wall time, the PDF size and the page
+count for each profile.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+
+
+def write_photos(directory, count):
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    names = []
+    for i in range(count):
+        name = f"photo{i}.jpg"
+        Image.effect_noise((3000, 2000), 40 + i).convert("RGB").save(os.path.join(directory, name), quality=95)
+        names.append(name)
+    return names
+
+
+def make_report(sections, photos):
+    parts = []
+    for i in range(1, sections + 1):
+        parts.append(f"# Section {i} ✅\n\nStatus is good 🚀, with one open item ⚠️ and a note 📝.\n")
+        parts.append(("The service handled its load within the agreed limits. " * 8) + "\n")
+        parts.append("| Metric | Value |\n|---|---|\n" + "".join(f"| metric {row} | {row * 3}% |\n" for row in range(6)))
+        if photos:
+            parts.append(f"![figure {i}]({photos[i % len(photos)]})\n")
+    return "\n".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    pipeline = core.ConversionPipeline()
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as directory:
+        photos = write_photos(directory, args.images)
+        md_text = make_report(args.sections, photos)
+        print(f"{len(md_text)} characters, {len(photos)} photos"
+              + ("" if photos else " (install Pillow to include photos)"))
+        print(f"{'profile':<10}{'dpi':>6}{'seconds':>10}{'PDF KB':>10}{'pages':>7}")
+        for name, profile in core.RENDER_PROFILES.items():
+            options = core.apply_render_profile(dict(core.DEFAULT_OPTIONS, pdf_cache=False), name)
+            output_path = os.path.join(directory, f"{name}.pdf")
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pipeline.convert_markdown_to_pdf(md_text, output_path, options, base_dir=directory)
+                best = min(best, time.perf_counter() - start)
+            try:
+                from pypdf import PdfReader
+                pages = len(PdfReader(output_path).pages)
+            except ImportError:
+                pages = "?"
+            print(f"{name:<10}{profile['pdf_dpi']:>6}{best:>10.2f}"
+                  f"{os.path.getsize(output_path) / 1024:>10.0f}{pages:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Very large documents: one wkhtmltopdf process vs. sections rendered in parallel.
+
+Run from the repository root (needs wkhtmltopdf and pypdf; POSIX only, for
+the child-process memory figures):
+
+    python benchmarks/bench_sectioned_render.py
+    python benchmarks/bench_sectioned_render.py --chapters 600 --jobs 2 4 8 --toc
+
+Writes a long manual-like document (chapters of prose, tables and code) and
+converts it once monolithically and once per --jobs value with the
+parallel_sections option. Each conversion runs in a fresh Python process so
+that its figures are its own: wall time, the peak RSS of the largest
+wkhtmltopdf process it started, and the page count of the result.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+
+
+def make_manual(chapters: int) -> str:
+    parts = []
+    for chapter in range(1, chapters + 1):
+        parts.append(f"# Chapter {chapter}: subsystem {chapter}\n")
+        for section in range(1, 6):
+            parts.append(f"## {chapter}.{section} Configuration\n")
+            parts.append(("The subsystem reads its settings at start-up and *validates* every value "
+                          "before accepting traffic. Invalid values are reported in the log. ") * 6 + "\n")
+            parts.append("| Setting | Default | Notes |\n|---|---|---|\n" + "".join(
+                f"| option_{row} | {row * 10} | applies to `mode {row}` |\n" for row in range(8)))
+            parts.append("```python\n" + "".join(f"configure(option_{row}={row * 10})\n" for row in range(6)) + "```\n")
+    return "\n".join(parts)
+
+
+def child(md_path, output_path, jobs, toc):
+    import resource
+
+    with open(md_path, encoding="utf-8") as f:
+        md_text = f.read()
+    options = dict(core.DEFAULT_OPTIONS, parallel_sections=jobs, generate_toc=toc, pdf_cache=False,
+                   optimize_images=False)
+    pipeline = core.ConversionPipeline()
+    start = time.perf_counter()
+    pipeline.convert_markdown_to_pdf(md_text, output_path, options)
+    wall = time.perf_counter() - start
+    from pypdf import PdfReader
+    # ru_maxrss of the children is the peak of the largest one, in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak_mb = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    print(json.dumps({"wall": wall, "peak_mb": peak_mb, "pages": len(PdfReader(output_path).pages)}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=300)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[2, 4, os.cpu_count() or 4])
+    parser.add_argument("--toc", action="store_true", help="generate the table of contents")
+    parser.add_argument("--child", nargs=3, metavar=("MD", "PDF", "JOBS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        md_path, output_path, jobs = args.child
+        return child(md_path, output_path, int(jobs), args.toc)
+
+    blocker = core.sectioned_conversion_blocker(core.DEFAULT_OPTIONS)
+    if blocker:
+        sys.exit(f"Cannot benchmark sectioned rendering: {blocker}.")
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as tmp:
+        md_path = os.path.join(tmp, "manual.md")
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write(make_manual(args.chapters))
+        print(f"{args.chapters} chapters, {os.path.getsize(md_path) / 2**20:.1f} MB of Markdown, "
+              f"table of contents {'on' if args.toc else 'off'}")
+        print(f"{'mode':<14}{'wall s':>9}{'peak RSS MB':>13}{'pages':>7}")
+        for jobs in [0] + args.jobs:
+            output_path = os.path.join(tmp, f"manual{jobs}.pdf")
+            command = [sys.executable, os.path.abspath(__file__), "--child", md_path, output_path, str(jobs)]
+            result = subprocess.run(command + (["--toc"] if args.toc else []), capture_output=True, text=True)
+            if result.returncode:
+                sys.exit(result.stderr)
+            figures = json.loads(result.stdout.strip().splitlines()[-1])
+            mode = "monolithic" if jobs == 0 else f"{jobs} sections"
+            print(f"{mode:<14}{figures['wall']:>9.2f}{figures['peak_mb']:>13.0f}{figures['pages']:>7}")
+
+
+if __name__ == "__main__":
+    main()
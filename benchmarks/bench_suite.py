@@ -0,0 +1,331 @@
+"""Stage-by-stage timings of the conversion pipeline on a generated corpus, saved as JSON.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py -o before.json
+    python benchmarks/bench_suite.py -o after.json --scale 0.1 --repeat 3
+    python benchmarks/bench_suite.py --compare before.json after.json
+
+Generates a fixed corpus (the same text on every run): a short note, an
+emoji-heavy chat export, a document of wide tables, a manual of about 10 MB
+(times --scale) and a code-heavy document highlighted by codehilite. Each
+document is passed through the stages of a PDF conversion in order, each stage
+timed on the previous stage's output:
+
+    emoji        replace_glyphs_with_svg + emoji_stylesheet
+    auto_fix     MarkdownAutoFixer.fix
+    markdown     Markdown -> HTML through the shared parser pool
+    table_css    ConversionPipeline.get_table_css
+    html         theme stylesheet + html_page
+    pdf          ConversionPipeline.convert_markdown_to_pdf end to end
+
+The pdf stage runs wkhtmltopdf with the PDF cache and image downsampling off.
+When wkhtmltopdf cannot be found, or with --stub, a stand-in that only reads
+its input and writes a one-page PDF is used instead, so that stage then
+measures the pipeline around wkhtmltopdf; the JSON records which one ran.
+Nothing here needs a display. The JSON holds the best and median time of
+each stage in milliseconds; --compare prints the ratio of two such files.
+
+It also records how long ``import markdown_converter_core`` takes in a fresh
+interpreter (``python -X importtime``, median of --import-runs) and the
+dependencies that cost the most. The run fails if that exceeds
+--import-budget-ms or if the import pulled in a GUI toolkit.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORE_MODULE = "markdown_converter_core"
+GUI_MODULES = ("tkinter", "tkwebview2", "tkinterdnd2")
+
+STUB_WKHTMLTOPDF = r'''
+import sys
+args = sys.argv[1:]
+if "--version" in args:
+    print("wkhtmltopdf 0.12.6 (benchmark stub)")
+    sys.exit(0)
+for path in args[:-1]:
+    if path.endswith(".html"):
+        with open(path, "rb") as f:
+            f.read()
+with open(args[-1], "wb") as f:
+    f.write(b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+            b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+            b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+            b"trailer<</Root 1 0 R>>\n%%EOF\n")
+'''
+
+EMOJI = "😀😂🎉👍🔥🚀✅❌⚠️📝💡🙏❤️👀🤔👋🏽🇩🇪"
+WORDS = ("the service deploy config value request latency cache worker queue node "
+         "release metric error retry limit region user build test review").split()
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_note(rng):
+    return (f"# Meeting note\n\n{sentence(rng)} {sentence(rng)}\n\n"
+            f"- {sentence(rng, 5)}\n- {sentence(rng, 6)}\n- [link](https://example.com)\n")
+
+
+def make_chat(rng, messages=2000):
+    lines = ["# Chat export\n"]
+    for i in range(messages):
+        emoji = "".join(rng.choice(EMOJI) for _ in range(rng.randint(1, 4)))
+        lines.append(f"**user{i % 7}** {10 + i // 60 % 14}:{i % 60:02d}  \n{sentence(rng, rng.randint(3, 10))} {emoji}\n")
+    return "\n".join(lines)
+
+
+def make_wide_tables(rng, tables=60, columns=14, rows=25):
+    parts = ["# Wide tables\n"]
+    for t in range(tables):
+        parts.append(f"## Table {t}\n\n{sentence(rng)}\n")
+        parts.append("| " + " | ".join(f"column {c}" for c in range(columns)) + " |")
+        parts.append("|" + "---|" * columns)
+        for _ in range(rows):
+            parts.append("| " + " | ".join(rng.choice(WORDS) for _ in range(columns)) + " |")
+        parts.append("")
+    return "\n".join(parts)
+
+
+def make_manual(rng, size):
+    parts = []
+    length = 0
+    chapter = 0
+    while length < size:
+        chapter += 1
+        part = [f"# Chapter {chapter}\n"]
+        for section in range(1, 6):
+            part.append(f"## {chapter}.{section} {sentence(rng, 3)[:-1]}\n")
+            part.append(" ".join(sentence(rng) for _ in range(10)) + "\n")
+            part.append(f"1. {sentence(rng, 6)}\n2. {sentence(rng, 6)}\n   - {sentence(rng, 4)}\n")
+            part.append("| Setting | Default |\n|---|---|\n" + "".join(
+                f"| option_{row} | {row * 10} |\n" for row in range(5)))
+            part.append(f"> **Note:** {sentence(rng)}\n")
+        text = "\n".join(part)
+        parts.append(text)
+        length += len(text)
+    return "\n".join(parts)
+
+
+def make_code(rng, blocks=300):
+    parts = ["# Code samples\n"]
+    for i in range(blocks):
+        parts.append(f"## Sample {i}\n\n{sentence(rng)}\n")
+        parts.append("```python\n" + "".join(
+            f"def handler_{i}_{n}(request, retries={n}):\n"
+            f"    \"\"\"{sentence(rng, 5)}\"\"\"\n"
+            f"    return {{'status': {200 + n}, 'body': request.get('{rng.choice(WORDS)}')}}\n\n"
+            for n in range(5)) + "```\n")
+        parts.append(f"Inline `code_{i}()` and a list:\n\n- `{rng.choice(WORDS)}`\n")
+    return "\n".join(parts)
+
+
+def make_corpus(scale):
+    rng = random.Random(20240501)
+    return {
+        "note": make_note(rng),
+        "chat": make_chat(rng),
+        "wide_tables": make_wide_tables(rng),
+        "manual": make_manual(rng, int(10 * 1024 * 1024 * scale)),
+        "code": make_code(rng),
+    }
+
+
+def write_stub(directory):
+    script = os.path.join(directory, "wkhtmltopdf_stub.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(STUB_WKHTMLTOPDF)
+    if os.name == "nt":
+        launcher = os.path.join(directory, "wkhtmltopdf_stub.cmd")
+        with open(launcher, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        launcher = os.path.join(directory, "wkhtmltopdf_stub")
+        with open(launcher, "w", encoding="utf-8") as f:
+            f.write(f"#!{sys.executable}\n{STUB_WKHTMLTOPDF}")
+        os.chmod(launcher, 0o755)
+    return launcher
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, {"best_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3)}
+
+
+def run_document(pipeline, md_text, options, work_dir, repeat, pdf_repeat):
+    extensions = [name for name, enabled in options["extensions"].items() if enabled]
+    stages = {}
+
+    def emoji():
+        classes = {}
+        text = core.replace_glyphs_with_svg(md_text, pipeline.emoji_mapping, emoji_classes=classes,
+                                           emoji_size=int(options["emoji_size"]))
+        return core.emoji_stylesheet(classes, pipeline.emoji_mapping, emoji_size=int(options["emoji_size"])), text
+
+    (emoji_css, text), stages["emoji"] = timed(emoji, repeat)
+    text, stages["auto_fix"] = timed(lambda: core.MarkdownAutoFixer.fix(text), repeat)
+    (html_body, _), stages["markdown"] = timed(lambda: core.markdown_parsers.render(text, extensions), repeat)
+    _, stages["table_css"] = timed(lambda: pipeline.get_table_css(html_body, options), repeat)
+
+    def assemble():
+        columns = pipeline.analyze_table_width(html_body)
+        stylesheet = pipeline.themes.stylesheet(options["current_theme"], options["table_handling"],
+                                                options["orientation"], core.table_width_bucket(columns))
+        return core.html_page(stylesheet, emoji_css + html_body)
+
+    page, stages["html"] = timed(assemble, repeat)
+    if pdf_repeat:
+        output_path = os.path.join(work_dir, "out.pdf")
+        _, stages["pdf"] = timed(lambda: pipeline.convert_markdown_to_pdf(md_text, output_path, options,
+                                                                          work_dir=work_dir), pdf_repeat)
+    return {"chars": len(md_text), "html_chars": len(page), "stages": stages}
+
+
+def import_time(runs):
+    """Time importing the core module in fresh interpreters with ``-X importtime``."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    totals = []
+    for _ in range(runs):
+        stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {CORE_MODULE}"],
+                                cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+        # Lines read "import time: <self us> | <cumulative us> | <indented module name>".
+        entries = []
+        for line in stderr.splitlines():
+            if line.startswith("import time:") and not line.endswith("| imported package"):
+                _, cumulative, name = line[len("import time:"):].split("|")
+                entries.append((name.rstrip(), int(cumulative)))
+        # A module is listed after everything it imported; the interpreter's
+        # own start-up imports come before that.
+        end = next(index for index, (name, _) in enumerate(entries) if name == f" {CORE_MODULE}")
+        start = max((index for index, (name, _) in enumerate(entries[:end]) if not name.startswith("  ")),
+                    default=-1) + 1
+        totals.append((entries[end][1], entries[start:end]))
+    total_us, entries = sorted(totals, key=lambda run: run[0])[len(totals) // 2]
+    # Direct imports of the core module are indented by three spaces.
+    dependencies = sorted(((name.strip(), us) for name, us in entries if name.startswith("   ")
+                           and not name.startswith("    ")), key=lambda entry: -entry[1])
+    return {
+        "module": CORE_MODULE,
+        "ms": round(total_us / 1000, 1),
+        "heaviest": {name: round(us / 1000, 1) for name, us in dependencies[:8]},
+        "gui_modules": sorted({name.strip().split(".")[0] for name, _ in entries} & set(GUI_MODULES)),
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old: {old['meta'].get('commit')} ({old['meta']['wkhtmltopdf']})  "
+          f"new: {new['meta'].get('commit')} ({new['meta']['wkhtmltopdf']})")
+    print(f"{'document':<13}{'stage':<11}{'old ms':>11}{'new ms':>11}{'new/old':>9}")
+    for name, result in new["documents"].items():
+        for stage, timing in result["stages"].items():
+            before = old["documents"].get(name, {}).get("stages", {}).get(stage)
+            if not before:
+                continue
+            ratio = timing["best_ms"] / before["best_ms"] if before["best_ms"] else float("nan")
+            print(f"{name:<13}{stage:<11}{before['best_ms']:>11.2f}{timing['best_ms']:>11.2f}{ratio:>9.2f}")
+    if "import" in old and "import" in new:
+        before, after = old["import"]["ms"], new["import"]["ms"]
+        print(f"{'import':<13}{'core':<11}{before:>11.2f}{after:>11.2f}{after / before:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="JSON results file")
+    parser.add_argument("--scale", type=float, default=1.0, help="size factor for the 10 MB manual")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per in-process stage")
+    parser.add_argument("--pdf-repeat", type=int, default=1, help="end-to-end conversions per document (0 skips)")
+    parser.add_argument("--stub", action="store_true", help="use the wkhtmltopdf stand-in even if it is installed")
+    parser.add_argument("--only", nargs="+", metavar="DOCUMENT", help="run only these corpus documents")
+    parser.add_argument("--import-runs", type=int, default=5, help="fresh interpreters timing the import")
+    parser.add_argument("--import-budget-ms", type=float, default=150,
+                        help="fail if importing the core module takes longer (default: %(default)s)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    options = dict(core.DEFAULT_OPTIONS, pdf_cache=False, optimize_images=False, parallel_sections=0)
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as work_dir:
+        wkhtmltopdf = "real"
+        if not args.stub:
+            try:
+                core.find_wkhtmltopdf_configuration(options["wkhtmltopdf_path"])
+            except IOError:
+                args.stub = True
+        if args.stub:
+            wkhtmltopdf = "stub"
+            os.environ[core.WKHTMLTOPDF_ENV_VAR] = write_stub(work_dir)
+
+        pipeline = core.ConversionPipeline()
+        corpus = make_corpus(args.scale)
+        documents = {}
+        for name, md_text in corpus.items():
+            if args.only and name not in args.only:
+                continue
+            documents[name] = run_document(pipeline, md_text, options, work_dir, args.repeat, args.pdf_repeat)
+            timings = "  ".join(f"{stage} {timing['best_ms']:.1f}"
+                                for stage, timing in documents[name]["stages"].items())
+            print(f"{name:<12}{len(md_text):>10} chars  {timings} ms", file=sys.stderr)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "wkhtmltopdf": wkhtmltopdf,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "pdf_repeat": args.pdf_repeat,
+        },
+        "import": import_time(args.import_runs),
+        "documents": documents,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    imported = results["import"]
+    print(f"import {CORE_MODULE}: {imported['ms']} ms (budget {args.import_budget_ms:g} ms); heaviest: "
+          + ", ".join(f"{name} {ms} ms" for name, ms in imported["heaviest"].items()), file=sys.stderr)
+    if imported["gui_modules"]:
+        sys.exit(f"importing {CORE_MODULE} loaded GUI modules: {', '.join(imported['gui_modules'])}")
+    if imported["ms"] > args.import_budget_ms:
+        sys.exit(f"importing {CORE_MODULE} took {imported['ms']} ms, over the {args.import_budget_ms:g} ms budget")
+
+
+if __name__ == "__main__":
+    main()
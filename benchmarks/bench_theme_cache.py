@@ -0,0 +1,86 @@
+"""Per-render stylesheet cost: reading the theme every time vs. ThemeManager.
+
+Run from the repository root:
+
+    python benchmarks/bench_theme_cache.py
+    python benchmarks/bench_theme_cache.py --renders 2000
+
+Writes the default themes to a temporary folder and times composing the
+stylesheets of one PDF page and one preview the old way (read the theme file,
+rebuild the table and page CSS) and through the pipeline's ThemeManager. The
+outputs are compared, and a theme edited on disk must show up on the next
+render.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown_converter_core as core  # noqa: E402
+from benchmarks import _legacy  # noqa: E402
+
+HTML_BODY = "<p>Intro</p>\n" + "<table>\n<tr><th>a</th><th>b</th><th>c</th><th>d</th><th>e</th><th>f</th></tr>\n</table>\n" * 5
+
+
+def per_call_us(func, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        func()
+    return (time.perf_counter() - start) * 1e6 / renders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="md2pdf_bench_") as themes_dir:
+        core.setup_themes(themes_dir)
+        pipeline = core.ConversionPipeline(emoji_mapping={}, themes_dir=themes_dir)
+        options = dict(core.DEFAULT_OPTIONS, table_handling="smart_fit")
+
+        def old_pdf():
+            return f"{_legacy.load_theme_css(themes_dir, options)}\n        {_legacy.get_table_css(HTML_BODY, options)}"
+
+        def new_pdf():
+            bucket = core.table_width_bucket(pipeline.analyze_table_width(HTML_BODY))
+            return pipeline.themes.stylesheet(options["current_theme"], options["table_handling"],
+                                              options["orientation"], bucket)
+
+        def old_preview():
+            return (_legacy.load_theme_css(themes_dir, options), _legacy.get_table_css(HTML_BODY, options),
+                    _legacy.preview_page_css(options))
+
+        def new_preview():
+            return (pipeline.load_theme_css(options), pipeline.get_table_css(HTML_BODY, options),
+                    core.preview_page_css(options["page_size"], options["orientation"], options["margin_top"],
+                                         options["margin_bottom"], options["margin_left"], options["margin_right"]))
+
+        if old_pdf() != new_pdf():
+            sys.exit("the PDF stylesheet differs")
+        if [re.sub(r'\s+', ' ', css) for css in old_preview()] != [re.sub(r'\s+', ' ', css) for css in new_preview()]:
+            sys.exit("the preview stylesheets differ")
+
+        print(f"{'stylesheets':<14}{'old us':>10}{'cached us':>11}")
+        cases = (
+            ("theme only", lambda: _legacy.load_theme_css(themes_dir, options), lambda: pipeline.load_theme_css(options)),
+            ("PDF page", old_pdf, new_pdf),
+            ("preview", old_preview, new_preview),
+        )
+        for name, old, new in cases:
+            print(f"{name:<14}{per_call_us(old, args.renders):>10.1f}{per_call_us(new, args.renders):>11.1f}")
+        print(f"theme file reads through ThemeManager: {pipeline.themes.reads}")
+
+        with open(os.path.join(themes_dir, options["current_theme"]), "a", encoding="utf-8") as f:
+            f.write("\nbody { color: #123456; }")
+        if "#123456" not in new_pdf():
+            sys.exit("an edited theme did not show up on the next render")
+        print(f"edited theme picked up; reads: {pipeline.themes.reads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Table measuring and image path rewriting: regex passes over the HTML vs. the tree.
+
+Run from the repository root:
+
+    python benchmarks/bench_tree_inspection.py
+    python benchmarks/bench_tree_inspection.py --sizes 1MB 4MB
+
+Renders a document with many tables and images and times the two jobs the
+pipeline used to do after rendering, as regex passes over the finished HTML,
+against the DocumentInspector tree processor doing them during the parse
+(its run() alone is timed). Both must agree on the column count and the HTML.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown  # noqa: E402
+
+import markdown_converter_core as core  # noqa: E402
+
+EXTENSIONS = [name for name, enabled in core.DEFAULT_OPTIONS["extensions"].items() if enabled]
+BASE_DIR = "/home/user/notes"
+
+
+def parse_size(value: str) -> int:
+    units = {"KB": 1024, "MB": 1024 * 1024}
+    for suffix, factor in units.items():
+        if value.upper().endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+
+def make_document(size: int) -> str:
+    sections = []
+    length = 0
+    index = 0
+    while length < size:
+        index += 1
+        columns = 3 + index % 6
+        section = (
+            f"## Measurement {index}\n\n"
+            f"![plot {index}](plots/run{index}.png) compared with ![reference](https://example.com/ref.png).\n\n"
+            + "| " + " | ".join(f"col {c}" for c in range(columns)) + " |\n"
+            + "|" + "---|" * columns + "\n"
+            + ("| " + " | ".join(str(index * c) for c in range(columns)) + " |\n") * 5 + "\n"
+        )
+        sections.append(section)
+        length += len(section)
+    return "".join(sections)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["256KB", "1MB"])
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>7}{'html MB':>9}{'render ms':>11}{'regex passes ms':>17}{'in tree ms':>12}")
+    for label in args.sizes:
+        text = make_document(parse_size(label))
+        md = markdown.Markdown(extensions=EXTENSIONS)
+        start = time.perf_counter()
+        html = md.convert(text)
+        render_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns = core.html_table_columns(html)
+        resolved = core.resolve_html_image_paths(html, BASE_DIR)
+        regex_s = time.perf_counter() - start
+
+        md.reset()
+        inspector = core.DocumentInspector.attach(md, BASE_DIR)
+        run = inspector.run
+        tree_s = 0.0
+
+        def timed_run(root):
+            nonlocal tree_s
+            start = time.perf_counter()
+            run(root)
+            tree_s = time.perf_counter() - start
+
+        inspector.run = timed_run
+        tree_html, tree_columns = md.convert(text), inspector.table_columns
+        if (tree_html, tree_columns) != (resolved, columns):
+            sys.exit(f"tree inspection disagrees with the regex passes ({label})")
+        print(f"{label:>7}{len(html) / 2**20:>9.2f}{render_s * 1000:>11.1f}{regex_s * 1000:>17.1f}{tree_s * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
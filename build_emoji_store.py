@@ -0,0 +1,85 @@
+"""Build assets/emoji_store.sqlite3 from the FluentUI Flat SVGs.
+
+Run this after updating assets/emoji_mapping.json or assets/fluentui_assets:
+
+    python build_emoji_store.py
+
+Every glyph in the mapping is resolved, cleaned and encoded exactly as the
+converter would do at runtime, and the resulting data URIs are written to a
+single SQLite file. At runtime the converter then resolves a glyph with one
+indexed lookup instead of walking its asset folder.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+from markdown_converter_core import (
+    EMOJI_STORE_PATH,
+    emoji_assets_fingerprint,
+    load_mapping_from_file,
+    load_svg_data_uri,
+    resource_path,
+)
+
+
+def build_emoji_store(output_path: str, mapping_file: str) -> dict:
+    """Write the store to ``output_path`` and return a summary of what was built."""
+    mapping = load_mapping_from_file(mapping_file)
+    if not mapping:
+        raise SystemExit(f"Could not load emoji mapping from '{mapping_file}'.")
+
+    rows = []
+    digest = hashlib.sha256()
+    for glyph in sorted(mapping):
+        data_uri = load_svg_data_uri(mapping[glyph])
+        rows.append((glyph, data_uri))
+        digest.update(glyph.encode('utf-8') + b'\0' + (data_uri or '').encode('ascii') + b'\0')
+
+    # Build next to the target and swap it in, so a running app never sees a partial file.
+    tmp_path = output_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE emoji (glyph TEXT PRIMARY KEY, data_uri TEXT) WITHOUT ROWID")
+        conn.executemany("INSERT INTO emoji VALUES (?, ?)", rows)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('version', digest.hexdigest()),
+            ('glyph_count', str(len(rows))),
+            # The converter ignores the store once the assets no longer match this.
+            ('assets_fingerprint', emoji_assets_fingerprint(mapping_file)),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, output_path)
+
+    return {
+        'glyphs': len(rows),
+        'missing': sum(1 for _, data_uri in rows if data_uri is None),
+        'bytes': os.path.getsize(output_path),
+        'version': digest.hexdigest(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the prebuilt emoji store used by the converter.")
+    parser.add_argument('--mapping', default=resource_path("assets/emoji_mapping.json"),
+                        help="emoji mapping JSON (default: %(default)s)")
+    parser.add_argument('--output', default=resource_path(EMOJI_STORE_PATH),
+                        help="store to write (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = build_emoji_store(args.output, args.mapping)
+    print(f"Wrote {args.output}: {summary['glyphs']} glyphs ({summary['missing']} without SVG), "
+          f"{summary['bytes'] / 1024:.0f} KiB in {time.perf_counter() - start:.1f}s, "
+          f"version {summary['version'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3275 @@
+"""The Markdown -> HTML -> PDF pipeline and the headless batch converter.
+
+Everything here works without a display: the GUI lives in
+markdown_converter_gui.py and markdown_converter_app.py is the entry point for
+both. Markdown, pdfkit, the emoji mapping and the other costlier pieces are
+loaded the first time they are needed, not on import.
+"""
+# PRE-REQUISITES:
+# pip install markdown pdfkit
+import os
+from pathlib import Path
+import re
+import json
+import sys
+import threading
+import urllib.parse
+import base64
+import codecs
+import collections
+import contextlib
+import hashlib
+import functools
+import math
+import tempfile
+import shutil
+import html
+import io
+import argparse
+import glob
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Helper to find asset path for PyInstaller
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
+
+# Prebuilt emoji data URIs, generated offline by build_emoji_store.py
+EMOJI_STORE_PATH = "assets/emoji_store.sqlite3"
+
+def load_mapping_from_file(input_file: str = None) -> dict:
+    input_file = input_file or resource_path("assets/emoji_mapping.json")
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Return an empty dict if the file is missing or corrupted
+        return {}
+    # Build the glyph matcher once here so every later replace_glyphs_with_svg
+    # call (one per preview refresh / conversion) reuses it.
+    get_emoji_matcher(mapping)
+    return mapping
+
+class EmojiMatcher:
+    """Finds emoji glyphs in text, always preferring the longest glyph at a position.
+
+    Glyphs are stored in a codepoint trie. A compiled pattern of every possible
+    first codepoint lets the regex engine skip plain text at C speed, so the trie
+    is only walked where an emoji can actually start.
+    """
+
+    def __init__(self, glyphs):
+        self.trie = {}
+        # Glyphs that only contain ASCII would defeat the str.isascii() fast path.
+        self.has_ascii_glyph = False
+        ascii_followers = {}
+        other_starts = set()
+        for glyph in glyphs:
+            if not glyph:
+                continue
+            if glyph.isascii():
+                self.has_ascii_glyph = True
+            node = self.trie
+            for char in glyph:
+                node = node.setdefault(char, {})
+            node[None] = glyph
+            if glyph[0].isascii():
+                # Keycaps like "1\ufe0f\u20e3" start with an ASCII character; only
+                # treat that character as a candidate when the next one fits.
+                ascii_followers.setdefault(glyph[0], set()).add(glyph[1:2])
+            else:
+                other_starts.add(glyph[0])
+
+        alternatives = []
+        if other_starts:
+            # The regex engine tests non-BMP character sets member by member, so
+            # list nearby first codepoints as a few coarse ranges instead. Stray
+            # symbols inside a range are rejected by the trie walk.
+            ranges = []
+            for codepoint in sorted(map(ord, other_starts)):
+                if ranges and codepoint - ranges[-1][1] <= 64:
+                    ranges[-1][1] = codepoint
+                else:
+                    ranges.append([codepoint, codepoint])
+            alternatives.append('[' + ''.join(
+                re.escape(chr(low)) if low == high else f'{re.escape(chr(low))}-{re.escape(chr(high))}'
+                for low, high in ranges
+            ) + ']')
+        for first, followers in sorted(ascii_followers.items()):
+            if '' in followers:
+                alternatives.append(re.escape(first))
+            else:
+                alternatives.append(re.escape(first) + '(?=[' + ''.join(map(re.escape, sorted(followers))) + '])')
+        self.candidate_pattern = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def match_at(self, text: str, pos: int):
+        """Return the longest glyph starting at ``pos`` or None."""
+        node = self.trie
+        longest = None
+        for index in range(pos, len(text)):
+            node = node.get(text[index])
+            if node is None:
+                break
+            glyph = node.get(None)
+            if glyph is not None:
+                longest = glyph
+        return longest
+
+    def sub(self, repl, text: str) -> str:
+        """Replace every non-overlapping glyph in ``text`` with ``repl(glyph)``."""
+        if self.candidate_pattern is None or (text.isascii() and not self.has_ascii_glyph):
+            return text
+        search = self.candidate_pattern.search
+        parts = []
+        last = 0
+        match = search(text)
+        while match:
+            start = match.start()
+            glyph = self.match_at(text, start)
+            if glyph is None:
+                match = search(text, start + 1)
+                continue
+            parts.append(text[last:start])
+            parts.append(repl(glyph))
+            last = start + len(glyph)
+            match = search(text, last)
+        if not parts:
+            return text
+        parts.append(text[last:])
+        return ''.join(parts)
+
+# Matchers built for each mapping, keyed by id(). The mapping is kept alongside so
+# the id cannot be reused by another dict while the entry is alive. Mappings are
+# treated as read-only once loaded.
+_emoji_matchers = {}
+
+def get_emoji_matcher(emoji_mapping: dict) -> EmojiMatcher:
+    """Return the process-wide matcher for ``emoji_mapping``, building it on first use."""
+    entry = _emoji_matchers.get(id(emoji_mapping))
+    if entry is None or entry[0] is not emoji_mapping:
+        entry = (emoji_mapping, EmojiMatcher(emoji_mapping.keys()))
+        _emoji_matchers[id(emoji_mapping)] = entry
+    return entry[1]
+    
+# create a function that replaces the emoji glyphs with their corresponding html svg derived from the mapping
+def find_color_folder(base_path: Path) -> Path:
+    color_folders = []
+    for root, dirs, files in os.walk(base_path):
+        if os.path.basename(root).lower() == "flat": #'Color' or the one with complex gradients looks fucked up so use the flat ones.
+            parent = Path(root).parent
+            if parent.name.lower() == "default":
+                # Prefer this immediately
+                return Path(root)
+            color_folders.append(Path(root))
+    # If no 'Color' inside 'Default', return any found 'Color' folder
+    return color_folders[0] if color_folders else None
+
+def remove_svg_clip_path(svg_content: str) -> str:
+    # Remove <clipPath> definitions in <defs>
+    svg_content = re.sub(
+        r'<defs>\s*<clipPath[^>]*>.*?</clipPath>\s*</defs>', '', svg_content, flags=re.DOTALL
+    )
+    # Remove clip-path attributes like clip-path="url(#...)"
+    svg_content = re.sub(
+        r'\sclip-path="url\(#.*?\)"', '', svg_content
+    )
+    return svg_content
+
+# The size load_svg_data_uri (and so the prebuilt emoji store) gives every SVG;
+# wkhtmltopdf rasterizes the emoji at this many pixels.
+EMOJI_RASTER_SIZE = 128
+
+def load_svg_data_uri(folder_name: str) -> str:
+    """Read the Flat SVG of an emoji asset folder and return it as a base64 data URI.
+
+    The SVG is cleaned up for wkhtmltopdf and sized for high-quality rasterization.
+    Returns None if the folder has no usable SVG.
+    """
+    # MODIFICATION: Use resource_path to locate assets relative to the script/executable
+    fluentui_path = resource_path("assets/fluentui_assets")
+    base_assets = Path(fluentui_path) / folder_name
+    color_folder = find_color_folder(base_assets)
+    svg_file = None
+    if color_folder:
+        svg_file = next(color_folder.glob('*.svg'), None)
+    if not svg_file:
+        return None
+    with open(svg_file, 'r', encoding='utf-8') as svg_f:
+        svg_content = svg_f.read()
+    # Clean up and prepare SVG content
+    svg_content = re.sub(r'[\r\n\t]', ' ', svg_content)
+    svg_content = re.sub(r'\s{2,}', ' ', svg_content).strip()
+
+    # Ensure xmlns attribute is present for compatibility
+    if 'xmlns=' not in svg_content:
+        svg_content = svg_content.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"')
+
+    # Remove clip-paths as workaround for wkhtmltopdf SVG rendering issues
+    svg_content = remove_svg_clip_path(svg_content)
+    if not svg_content.startswith("<svg"):
+        return None
+
+    # Remove XML declaration if present for cleaner embedding
+    svg_clean = re.sub(r'<\?xml.*?\?>', '', svg_content).strip()
+
+    # Remove any existing width/height attributes from the <svg> tag.
+    svg_no_size = re.sub(r'\s+width="[^"]+"', '', svg_clean, 1)
+    svg_no_size = re.sub(r'\s+height="[^"]+"', '', svg_no_size, 1)
+
+    # Inject the desired high-resolution dimensions to force high-quality rasterization.
+    svg_with_size = re.sub(r'<svg', f'<svg width="{EMOJI_RASTER_SIZE}" height="{EMOJI_RASTER_SIZE}"', svg_no_size, 1)
+
+    # Base64 encoding for background-image
+    svg_base64 = base64.b64encode(svg_with_size.encode('utf-8')).decode('ascii')
+    return f'data:image/svg+xml;base64,{svg_base64}'
+
+class EmojiAssetStore:
+    """Read-only view of the prebuilt emoji store written by build_emoji_store.py.
+
+    The store is a SQLite file mapping each glyph to its ready-to-embed data URI
+    (NULL when the glyph has no usable SVG), so resolving a glyph is one indexed
+    lookup instead of a walk over its asset folder.
+    """
+
+    def __init__(self, path: str):
+        import sqlite3
+        self.path = path
+        uri = 'file:' + urllib.parse.quote(Path(path).resolve().as_posix()) + '?mode=ro'
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.version = meta.get('version')
+        # emoji_assets_fingerprint() when the store was built; None for stores built before it was recorded.
+        self.assets_fingerprint = meta.get('assets_fingerprint')
+
+    def lookup(self, glyph: str):
+        """Return ``(found, data_uri)``; ``found`` is False if the glyph is not in the store."""
+        with self._lock:
+            row = self._conn.execute("SELECT data_uri FROM emoji WHERE glyph = ?", (glyph,)).fetchone()
+        if row is None:
+            return False, None
+        return True, row[0]
+
+def emoji_assets_fingerprint(mapping_file: str = None) -> str:
+    """Summarize the emoji mapping and asset files as their count and newest modification time.
+
+    The emoji store records this when it is built; a different value later
+    means the assets changed since, and the store may hold outdated SVGs.
+    """
+    mapping_file = mapping_file or resource_path("assets/emoji_mapping.json")
+    stats = [os.stat(mapping_file)] if os.path.exists(mapping_file) else []
+    folders = [resource_path("assets/fluentui_assets")]
+    while folders:
+        try:
+            with os.scandir(folders.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        folders.append(entry.path)
+                    else:
+                        stats.append(entry.stat())
+        except FileNotFoundError:
+            pass
+    return f"{len(stats)}:{max((stat.st_mtime_ns for stat in stats), default=0)}"
+
+@functools.lru_cache(maxsize=None)
+def get_emoji_store(path: str = None):
+    """Open the emoji store once per process. Returns None if it has not been built or is out of date."""
+    import sqlite3
+    path = path or resource_path(EMOJI_STORE_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        store = EmojiAssetStore(path)
+    except sqlite3.Error as e:
+        print(f"Warning: Ignoring unreadable emoji store '{path}': {e}")
+        return None
+    if store.assets_fingerprint != emoji_assets_fingerprint():
+        print(f"Warning: Ignoring emoji store '{path}', which is older than the emoji assets; "
+              f"run build_emoji_store.py to rebuild it.")
+        return None
+    return store
+
+# Data URIs resolved so far in this process, keyed by (glyph, raster size)
+# (None for glyphs without an SVG).
+_emoji_data_uris = {}
+
+def resolve_emoji_data_uri(glyph: str, emoji_mapping: dict, size: int = EMOJI_RASTER_SIZE) -> str:
+    """Return the data URI for ``glyph`` rasterized at ``size`` pixels, using the prebuilt store when available."""
+    try:
+        return _emoji_data_uris[glyph, size]
+    except KeyError:
+        pass
+    if size != EMOJI_RASTER_SIZE:
+        data_uri = resize_svg_data_uri(resolve_emoji_data_uri(glyph, emoji_mapping), size)
+    else:
+        store = get_emoji_store()
+        found, data_uri = store.lookup(glyph) if store else (False, None)
+        if not found:
+            # No store, or one built from an older mapping: read the asset folder.
+            data_uri = load_svg_data_uri(emoji_mapping[glyph])
+    _emoji_data_uris[glyph, size] = data_uri
+    return data_uri
+
+def resize_svg_data_uri(data_uri: str, size: int) -> str:
+    """Change the EMOJI_RASTER_SIZE dimensions of a load_svg_data_uri result to ``size``."""
+    if data_uri is None:
+        return None
+    prefix, _, encoded = data_uri.partition(',')
+    svg = base64.b64decode(encoded).decode('utf-8')
+    svg = svg.replace(f'<svg width="{EMOJI_RASTER_SIZE}" height="{EMOJI_RASTER_SIZE}"',
+                      f'<svg width="{size}" height="{size}"', 1)
+    return f"{prefix},{base64.b64encode(svg.encode('utf-8')).decode('ascii')}"
+
+# Layout of an emoji span in dedupe mode; the image itself comes from the per-glyph class.
+EMOJI_CLASS_STYLE = (
+    'display:inline-block;width:1.2em;height:1.2em;margin:0 0.1em;'
+    'background-repeat:no-repeat;background-position:center center;'
+    'background-size:contain;vertical-align:-0.3em;'
+)
+
+def replace_glyphs_with_svg(text: str, emoji_mapping: dict, img_style: str = "", emoji_classes: dict = None,
+                            emoji_size: int = EMOJI_RASTER_SIZE) -> str:
+        """Replace emoji glyphs with spans showing their SVG as a background image.
+
+        By default every span carries its image inline. If ``emoji_classes`` is a
+        dict, spans instead reference a short per-glyph class name and the dict is
+        filled with glyph -> class name; pass it to emoji_stylesheet() to emit the
+        matching rules once per document. ``emoji_size`` is the raster size in
+        pixels.
+        """
+        if not emoji_mapping:
+            return text
+
+        # The matcher is built once per mapping and shared across calls
+        matcher = get_emoji_matcher(emoji_mapping)
+
+        def repl(glyph):
+            data_uri = resolve_emoji_data_uri(glyph, emoji_mapping, emoji_size)
+            if data_uri is None:
+                # If there is no SVG, return the original glyph
+                return glyph
+
+            if emoji_classes is not None:
+                class_name = emoji_classes.setdefault(glyph, f'e{len(emoji_classes)}')
+                return f'<span class="emoji {class_name}"></span>'
+
+            # Embed as background image in a span for better wkhtmltopdf compatibility
+            background_style = (
+                f'display:inline-block;width:1.2em;height:1.2em;margin:0 0.1em;'
+                f'background:url({data_uri}) no-repeat center center;'
+                f'background-size:contain;vertical-align:-0.3em;'
+            )
+            # Merge with any additional img_style
+            if img_style:
+                background_style += img_style
+            return f'<span style="{background_style}"></span>'
+
+        # The replacement for a glyph never changes within a call, so build each
+        # span once instead of formatting it for every occurrence.
+        replacements = {}
+
+        def cached_repl(glyph):
+            replacement = replacements.get(glyph)
+            if replacement is None:
+                replacement = replacements[glyph] = repl(glyph)
+            return replacement
+
+        return matcher.sub(cached_repl, text)
+
+def emoji_stylesheet(emoji_classes: dict, emoji_mapping: dict, img_style: str = "",
+                     emoji_size: int = EMOJI_RASTER_SIZE) -> str:
+    """Build the <style> block for the classes collected by replace_glyphs_with_svg."""
+    if not emoji_classes:
+        return ""
+    rules = [f'span.emoji {{ {EMOJI_CLASS_STYLE}{img_style} }}']
+    for glyph, class_name in emoji_classes.items():
+        data_uri = resolve_emoji_data_uri(glyph, emoji_mapping, emoji_size)
+        rules.append(f'span.{class_name} {{ background-image:url({data_uri}); }}')
+    return '<style>\n' + '\n'.join(rules) + '\n</style>\n'
+
+# --- Converter options ---
+# The same keys are stored in the config file, read by the GUI and by
+# `python -m markdown_converter_app convert`.
+CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".md2pdf_converter_config.json")
+THEMES_DIR = os.path.join(os.path.expanduser("~"), ".md2pdf_converter_themes")
+IMAGE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".md2pdf_converter_cache", "images")
+PDF_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".md2pdf_converter_cache", "pdf")
+
+DEFAULT_OPTIONS = {
+    "output_folder": os.path.join(os.path.expanduser("~"), "Desktop", "PDF_Output"),
+    "table_handling": "smart_fit",
+    "orientation": "portrait",
+    "page_size": "A4",
+    "margin_top": "0.8",
+    "margin_bottom": "0.8",
+    "margin_left": "0.6",
+    "margin_right": "0.6",
+    "header_left": "",
+    "header_center": "",
+    "header_right": "",
+    "footer_left": "",
+    "footer_center": "Page [page] of [topage]",
+    "footer_right": "",
+    "generate_toc": False,
+    "auto_fix_markdown": True,
+    "dedupe_emoji": True,
+    # Above 1, long documents are cut at their top-level headings and the
+    # sections rendered by up to this many wkhtmltopdf processes at once
+    # (needs pypdf).
+    "parallel_sections": 0,
+    # How many GUI conversions may run at once; later ones wait in the job list.
+    "conversion_workers": 2,
+    # Local images wider than their printed size at image_dpi are downsampled
+    # (needs Pillow); JPEGs are re-encoded at image_quality.
+    "optimize_images": True,
+    # A name from RENDER_PROFILES sets the keys below (and generate_toc);
+    # "custom" leaves them as they are.
+    "render_profile": "classic",
+    "pdf_dpi": 600,
+    "image_dpi": 600,
+    "image_quality": 100,
+    "emoji_size": 128,
+    "smart_shrinking": True,
+    "print_media_type": False,
+    # Finished PDFs are kept in PDF_CACHE_DIR, so converting an unchanged
+    # document again copies the earlier result instead of running wkhtmltopdf.
+    "pdf_cache": True,
+    "pdf_cache_max_mb": 1024,
+    "current_theme": "default_light.css",
+    "wkhtmltopdf_path": "",
+    # If set, the stages of every preview and conversion are appended to this
+    # file as Chrome trace events (open it in chrome://tracing or Perfetto).
+    "trace_log": "",
+    # Upper limit for how long the preview waits after the first edit it has
+    # not shown yet; below it the wait follows how long recent previews took
+    # to render (see PreviewPacer).
+    "preview_max_delay_ms": 2000,
+    # Previews whose HTML is larger than this (in KB) only build the part of the
+    # page near the cursor and the scroll position; 0 turns this off.
+    "preview_virtual_kb": 2048,
+    "extensions": {
+        'tables': True, 'extra': True, 'sane_lists': True, 'fenced_code': True,
+        'codehilite': True, 'nl2br': True, 'toc': True, 'admonition': True,
+        'attr_list': True, 'def_list': True, 'footnotes': True, 'meta': False,
+        'smarty': True, 'wikilinks': False
+    },
+}
+
+# Render quality presets. pdf_dpi, image_dpi and image_quality are handed to
+# wkhtmltopdf (image_dpi and image_quality also drive the image downsampler),
+# emoji_size is the emoji raster size in pixels, smart_shrinking lets
+# wkhtmltopdf scale content to fit the page instead of laying it out exactly
+# like the preview, and print_media_type applies the theme's @media print rules.
+# "classic" (the default) is what earlier versions passed to wkhtmltopdf in
+# effect: they dropped every bare flag and pdfkit ignored their TOC request.
+RENDER_PROFILES = {
+    "classic": {"pdf_dpi": 600, "image_dpi": 600, "image_quality": 100, "emoji_size": 128,
+                "smart_shrinking": True, "print_media_type": False, "generate_toc": False},
+    "draft": {"pdf_dpi": 96, "image_dpi": 96, "image_quality": 60, "emoji_size": 32,
+              "smart_shrinking": True, "print_media_type": True, "generate_toc": False},
+    "standard": {"pdf_dpi": 300, "image_dpi": 300, "image_quality": 85, "emoji_size": 64,
+                 "smart_shrinking": False, "print_media_type": True, "generate_toc": True},
+    "print": {"pdf_dpi": 600, "image_dpi": 600, "image_quality": 100, "emoji_size": 128,
+              "smart_shrinking": False, "print_media_type": True, "generate_toc": True},
+}
+
+def apply_render_profile(options: dict, profile: str) -> dict:
+    """Return a copy of ``options`` switched to the render profile named ``profile`` (or "custom")."""
+    if profile != "custom" and profile not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile '{profile}' (choose from {', '.join(RENDER_PROFILES)} or custom).")
+    return {**options, **RENDER_PROFILES.get(profile, {}), "render_profile": profile}
+
+def options_from_config(config: dict) -> dict:
+    """Merge a loaded config dict over DEFAULT_OPTIONS, ignoring unknown keys.
+
+    A known ``render_profile`` wins over the individual settings it covers.
+    A config saved before render profiles existed names none; it loads as
+    "custom", so its own settings (such as ``generate_toc``) are kept.
+    """
+    options = {key: config.get(key, default) for key, default in DEFAULT_OPTIONS.items() if key != "extensions"}
+    options["extensions"] = dict(DEFAULT_OPTIONS["extensions"])
+    for ext_name, value in config.get("extensions", {}).items():
+        if ext_name in options["extensions"]:
+            options["extensions"][ext_name] = value
+    if "render_profile" not in config:
+        if config:
+            options["render_profile"] = "custom"
+    elif options["render_profile"] in RENDER_PROFILES:
+        options = apply_render_profile(options, options["render_profile"])
+    return options
+
+def load_options(config_path: str = CONFIG_PATH) -> dict:
+    """Read converter options from the config file, falling back to the defaults."""
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        config = {}
+    return options_from_config(config)
+
+DEFAULT_LIGHT_CSS = """
+body { font-family: Barlow, sans-serif; line-height: 1.6; font-size: 16px; margin: 0; font-weight: 100; color: #111; }
+h1,h2,h3,h4,h5,h6 { margin: 0.2em 0; page-break-after: avoid; }
+p { font-weight: 100; color: #111; margin: 0.5em 0; orphans: 2; widows: 2; }
+b, strong { color: #000; font-weight: bold; }
+pre { background: #2d2d2d; border-radius: 4px; margin: 0.5em 0; padding: 1em; color: #fff; overflow-x: auto; page-break-inside: avoid; }
+code { font-family: 'Fira Code', Consolas, Monaco, monospace; }
+:not(pre) > code { background: #f0f0f0; padding: 2px 4px; border-radius: 3px; color: #e83e8c; }
+img { max-width: 100%; height: auto; page-break-inside: avoid; }
+ul, ol { margin-top: 0; }
+blockquote { border-left: 4px solid #ddd; padding-left: 1em; margin-left: 0; color: #666; }
+h1 { font-size: 2.2em; color: #2c3e50; border-bottom: 2px solid #eee; padding-bottom: 0.5rem; }
+h2 { font-size: 1.8em; color: #34495e; } h3 { font-size: 1.4em; color: #455a64; }
+h4 { font-size: 1.2em; color: #546e7a; } h5 { font-size: 1.1em; color: #607d8b; }
+h6 { font-size: 1em; color: #78909c; }
+        """
+
+GITHUB_DARK_CSS = """
+        /* GitHub Dark Theme - Enhanced for Markdown to PDF */
+        body {
+        font-family: -apple-system,BlinkMacSystemFont,"Segoe UI",Helvetica,Arial,sans-serif,"Apple Color Emoji","Segoe UI Emoji";
+        color-scheme: dark;
+        background-color: #0d1117;
+        color: #c9d1d9;
+        line-height: 1.6;
+        font-size: 16px;
+        margin: 0;
+        }
+        h1, h2, h3, h4, h5, h6 {
+        margin: 24px 0 16px;
+        font-weight: 600;
+        line-height: 1.25;
+        padding-bottom: .3em;
+        border-bottom: 1px solid #21262d;
+        page-break-after: avoid;
+        }
+        h1 { font-size: 2em; }
+        h2 { font-size: 1.5em; }
+        h3 { font-size: 1.25em; }
+        h4 { font-size: 1.1em; }
+        h5 { font-size: 1em; }
+        h6 { font-size: 0.95em; }
+        p {
+        margin-top: 0;
+        margin-bottom: 16px;
+        orphans: 2;
+        widows: 2;
+        }
+        b, strong { font-weight: 600; color: #fff; }
+        em, i { color: #d2a8ff; }
+        hr {
+        border: 0;
+        border-top: 1px solid #21262d;
+        margin: 24px 0;
+        }
+        a {
+        color: #58a6ff;
+        text-decoration: underline;
+        }
+        a:hover {
+        color: #79c0ff;
+        text-decoration: underline;
+        }
+        ul, ol {
+        margin-top: 0;
+        margin-bottom: 16px;
+        padding-left: 2em;
+        }
+        li {
+        margin-bottom: 0.25em;
+        }
+        pre {
+        background-color: #161b22;
+        word-wrap: normal;
+        padding: 16px;
+        overflow: auto;
+        line-height: 1.45;
+        border-radius: 6px;
+        color: #c9d1d9;
+        font-size: 0.95em;
+        margin: 0.5em 0;
+        page-break-inside: avoid;
+        }
+        code {
+        font-family: 'Fira Code', Consolas, Monaco, monospace;
+        font-size: 85%;
+        color: #a5d6ff;
+        }
+        :not(pre) > code {
+        padding: .2em .4em;
+        margin: 0;
+        background-color: rgba(110,118,129,0.4);
+        border-radius: 6px;
+        color: #d2a8ff;
+        }
+        blockquote {
+        padding: 0 1em;
+        color: #8b949e;
+        border-left: .25em solid #30363d;
+        margin: 0.5em 0;
+        background: rgba(110,118,129,0.08);
+        border-radius: 4px;
+        }
+        img {
+        max-width: 100%;
+        height: auto;
+        background: #161b22;
+        border: 1px solid #30363d;
+        border-radius: 4px;
+        page-break-inside: avoid;
+        }
+        table {
+        border-collapse: collapse;
+        width: 100%;
+        margin: 1em 0;
+        background: #161b22;
+        color: #c9d1d9;
+        page-break-inside: avoid;
+        border-radius: 6px;
+        overflow: hidden;
+        }
+        th, td {
+        border: 1px solid #30363d;
+        text-align: left;
+        vertical-align: top;
+        padding: 8px;
+        }
+        th {
+        background-color: #21262d !important;
+        font-weight: bold;
+        color: #c9d1d9 !important;
+        }
+        tr:nth-child(even) td {
+        background-color: #161b22;
+        }
+        tr:nth-child(odd) td {
+        background-color: #161b22;
+        }
+        thead {
+        background: #21262d;
+        }
+        tfoot {
+        background: #161b22;
+        font-style: italic;
+        }
+        mark {
+        background: #bb8009;
+        color: #fff;
+        padding: 0 0.2em;
+        border-radius: 2px;
+        }
+        sup, sub {
+        font-size: 0.8em;
+        color: #8b949e;
+        }
+        del {
+        color: #8b949e;
+        text-decoration: line-through;
+        }
+        kbd {
+        background: #21262d;
+        color: #c9d1d9;
+        border: 1px solid #30363d;
+        border-radius: 3px;
+        padding: 2px 4px;
+        font-size: 0.95em;
+        font-family: inherit;
+        }
+        details, summary {
+        background: #161b22;
+        border: 1px solid #30363d;
+        border-radius: 4px;
+        padding: 4px 8px;
+        margin: 0.5em 0;
+        color: #c9d1d9;
+        }
+        summary {
+        cursor: pointer;
+        font-weight: bold;
+        }
+        .admonition, .note, .warning, .tip, .important {
+        border-left: 4px solid #d29922;
+        background: #161b22;
+        padding: 0.5em 1em;
+        margin: 1em 0;
+        border-radius: 4px;
+        color: #c9d1d9;
+        }
+        .admonition-title {
+        font-weight: bold;
+        color: #d29922;
+        }
+        .footnote-ref, .footnote-backref {
+        color: #58a6ff;
+        text-decoration: underline;
+        font-size: 0.9em;
+        }
+        .footnotes {
+        font-size: 0.95em;
+        color: #8b949e;
+        border-top: 1px solid #30363d;
+        margin-top: 2em;
+        padding-top: 1em;
+        }
+        .toc {
+        background: #161b22;
+        border: 1px solid #30363d;
+        border-radius: 4px;
+        padding: 1em;
+        margin: 1em 0;
+        }
+        .toc ul, .toc ol {
+        padding-left: 1.5em;
+        }
+        ::-webkit-scrollbar {
+        width: 8px;
+        background: #161b22;
+        }
+        ::-webkit-scrollbar-thumb {
+        background: #30363d;
+        border-radius: 4px;
+        }
+        """
+
+DEFAULT_THEMES = {
+    "default_light.css": DEFAULT_LIGHT_CSS,
+    "github_dark.css": GITHUB_DARK_CSS
+}
+
+def setup_themes(themes_dir: str = THEMES_DIR):
+    """Create themes directory and default themes if they don't exist."""
+    if not os.path.exists(themes_dir):
+        os.makedirs(themes_dir)
+
+    for filename, content in DEFAULT_THEMES.items():
+        path = os.path.join(themes_dir, filename)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content.strip())
+
+def table_width_bucket(max_columns: int) -> int:
+    """Collapse a table column count to the thresholds table_stylesheet cares about."""
+    return sum(max_columns > threshold for threshold in (4, 5, 6, 8))
+
+@functools.lru_cache(maxsize=None)
+def table_stylesheet(theme: str, table_handling: str, orientation: str, width_bucket: int) -> str:
+    """CSS rules for tables, for a table_width_bucket of the widest table's column count."""
+    is_landscape = orientation == "landscape"
+
+    # Only set background colors if using the default light theme
+    if theme == "default_light.css":
+        th_bg = "background-color: #f4f4f4;"
+        th_color = ""
+        td_bg = ""
+    else:
+        th_bg = ""
+        th_color = ""
+        td_bg = ""
+
+    base_css = (
+        f"table {{ border-collapse: collapse; width: 100%; margin: 1em 0; page-break-inside: avoid; }} "
+        f"th, td {{ border: 1px solid #ddd; text-align: left; vertical-align: top; padding: 8px; {td_bg} }} "
+        f"th {{ {th_bg} font-weight: bold; {th_color} }}"
+    )
+
+    if table_handling == "smart_fit":
+        # Buckets: 4 = more than 8 columns, 3 = 7-8, 2 = 6, 1 = 5, 0 = up to 4.
+        if width_bucket >= 4 or (width_bucket >= 3 and not is_landscape):
+            return base_css + "table { font-size: 0.7em; } th, td { padding: 4px 6px; word-wrap: break-word; hyphens: auto; max-width: 120px; min-width: 60px; }"
+        elif width_bucket >= 2 or (width_bucket >= 1 and not is_landscape):
+            return base_css + "table { font-size: 0.85em; } th, td { padding: 6px 8px; word-wrap: break-word; hyphens: auto; max-width: 150px; }"
+        else:
+            return base_css + "th, td { word-wrap: break-word; hyphens: auto; }"
+    elif table_handling == "smaller_font":
+        return base_css + "table { font-size: 0.7em; } th, td { padding: 4px 6px; word-wrap: break-word; hyphens: auto; }"
+    else:  # break_words
+        return base_css + "table { table-layout: fixed; } th, td { word-wrap: break-word; word-break: break-all; hyphens: auto; overflow-wrap: break-word; }"
+
+class ThemeManager:
+    """The theme stylesheets of one themes folder, read once per file change.
+
+    Each render stats the selected theme file and re-reads it only when its
+    modification time or size changed, so edits on disk show up on the next
+    render. The stylesheet of a PDF page (theme plus table rules) is composed
+    once per table handling, orientation and table width bucket, and dropped
+    together with the theme text when the file changes.
+    """
+
+    def __init__(self, themes_dir: str = THEMES_DIR):
+        self.themes_dir = themes_dir
+        self._lock = threading.Lock()
+        # theme file name -> (stamp, css, {(table_handling, orientation, bucket): stylesheet})
+        self._themes = {}
+        self.reads = 0
+
+    def _entry(self, theme: str):
+        path = os.path.join(self.themes_dir, theme)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # A missing theme renders unstyled.
+            return None, "", {}
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._themes.get(theme)
+        if entry is None or entry[0] != stamp:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = (stamp, f.read(), {})
+            with self._lock:
+                self._themes[theme] = entry
+                self.reads += 1
+        return entry
+
+    def theme_css(self, theme: str) -> str:
+        """The text of ``theme``, or an empty string if the file does not exist."""
+        return self._entry(theme)[1]
+
+    def stylesheet(self, theme: str, table_handling: str, orientation: str, width_bucket: int) -> str:
+        """The contents of a PDF page's <style> element: the theme followed by the table rules."""
+        _, theme_css, composed = self._entry(theme)
+        key = (table_handling, orientation, width_bucket)
+        css = composed.get(key)
+        if css is None:
+            css = f"{theme_css}\n        {table_stylesheet(theme, table_handling, orientation, width_bucket)}"
+            composed[key] = css
+        return css
+
+class ImageOptimizer:
+    """Downsamples local images that are stored larger than they will be printed.
+
+    wkhtmltopdf decodes every image at full size, so a 20-megapixel screenshot
+    shown a few inches wide costs render time and PDF size for nothing. An
+    image wider than ``max_width_px`` is resized to that width and re-encoded
+    (JPEG stays JPEG at the given quality, anything else becomes PNG). Results
+    are cached in ``cache_dir`` under the hash of the source file's contents
+    and the parameters, so repeated conversions reuse them.
+
+    Needs Pillow; without it, or for anything Pillow cannot read, the original
+    image is used.
+    """
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size, max_width_px, quality) -> path to use, so an
+        # unchanged file is neither hashed nor decoded again in this process.
+        self._results = {}
+        self.resampled = 0
+
+    def optimize(self, path: str, max_width_px: int, quality: int) -> str:
+        """Return the path of a copy of ``path`` at most ``max_width_px`` wide, or ``path`` itself."""
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return path
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size, max_width_px, quality)
+            with self._lock:
+                result = self._results.get(key)
+            if result is None or not os.path.exists(result):
+                result = self._optimize(path, max_width_px, quality)
+                with self._lock:
+                    self._results[key] = result
+            return result
+        except Exception as e:
+            # Never fail a conversion over an image; wkhtmltopdf gets the original.
+            print(f"Warning: Not optimizing image '{path}': {e}")
+            return path
+
+    def _optimize(self, path, max_width_px, quality):
+        from PIL import Image
+
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        for ext in ("jpg", "png"):
+            cached = os.path.join(self.cache_dir, f"{digest}-{max_width_px}w-q{quality}.{ext}")
+            if os.path.exists(cached):
+                return cached
+
+        with Image.open(path) as image:
+            if image.width <= max_width_px or getattr(image, "n_frames", 1) > 1:
+                return path
+            is_jpeg = image.format == "JPEG"
+            if image.mode not in (("RGB", "L", "CMYK") if is_jpeg else ("RGB", "RGBA", "L", "LA")):
+                image = image.convert("RGB" if is_jpeg else "RGBA")
+            height = max(1, round(image.height * max_width_px / image.width))
+            resized = image.resize((max_width_px, height), Image.LANCZOS)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = os.path.join(self.cache_dir, f"{digest}-{max_width_px}w-q{quality}.{'jpg' if is_jpeg else 'png'}")
+        # Write under a temporary name: batch workers may produce the same file at once.
+        fd, temp_path = tempfile.mkstemp(prefix="tmp_", suffix=os.path.splitext(cached)[1], dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if is_jpeg:
+                    resized.save(f, "JPEG", quality=quality, optimize=True)
+                else:
+                    resized.save(f, "PNG")
+            os.replace(temp_path, cached)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with self._lock:
+            self.resampled += 1
+        return cached
+
+    def rewriter(self, content_width_in: float, dpi: int, quality: int):
+        """A DocumentInspector ``rewrite_image`` hook pointing local images at optimized copies."""
+        def rewrite(url, width_attr):
+            path = local_file_path(url)
+            if path is None:
+                return url
+            width_in = content_width_in
+            match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(?:px)?\s*', width_attr or "")
+            if match:
+                # CSS pixels are 1/96 in.
+                width_in = min(width_in, float(match.group(1)) / 96)
+            optimized = self.optimize(path, max(1, math.ceil(width_in * dpi)), quality)
+            return url if optimized == path else file_url(optimized)
+        return rewrite
+
+# Points the converter at a specific wkhtmltopdf binary; wins over the config file.
+WKHTMLTOPDF_ENV_VAR = "MD2PDF_WKHTMLTOPDF"
+
+# Successful lookups keyed by override ('' for auto-discovery), with the time each took.
+_wkhtmltopdf_configs = {}
+_wkhtmltopdf_lock = threading.Lock()
+
+def _probe_wkhtmltopdf(override: str):
+    import pdfkit
+    if override:
+        # Accept either a path or a command name on PATH.
+        path = override if os.path.exists(override) else shutil.which(override)
+        if not path:
+            raise IOError(f"Configured wkhtmltopdf not found: '{override}'.")
+        return pdfkit.configuration(wkhtmltopdf=path)
+
+    possible_paths = [
+        r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe',
+        r'C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe',
+    ]
+    for path in possible_paths:
+        if os.path.exists(path):
+            return pdfkit.configuration(wkhtmltopdf=path)
+
+    # shutil.which searches PATH in-process; pdfkit.configuration() would spawn `which`/`where.exe`.
+    path = shutil.which('wkhtmltopdf')
+    if not path:
+        raise IOError("Could not find wkhtmltopdf in known locations or PATH.")
+    return pdfkit.configuration(wkhtmltopdf=path)
+
+def find_wkhtmltopdf_configuration(override: str = None):
+    """Locate wkhtmltopdf and return a pdfkit configuration for it.
+
+    The lookup runs once per process and is cached. The MD2PDF_WKHTMLTOPDF
+    environment variable, then ``override`` (the ``wkhtmltopdf_path`` option),
+    take precedence over searching the usual install locations and PATH.
+    Failures are not cached, so installing wkhtmltopdf takes effect on retry.
+    """
+    override = os.environ.get(WKHTMLTOPDF_ENV_VAR) or override or ''
+    with _wkhtmltopdf_lock:
+        cached = _wkhtmltopdf_configs.get(override)
+        if cached is None:
+            start = time.perf_counter()
+            config = _probe_wkhtmltopdf(override)
+            cached = _wkhtmltopdf_configs[override] = (config, time.perf_counter() - start)
+    return cached[0]
+
+def wkhtmltopdf_probe_seconds() -> float:
+    """Total time this process has spent locating wkhtmltopdf."""
+    return sum(seconds for _, seconds in _wkhtmltopdf_configs.values())
+
+# Bump when the way PDFs are produced changes without the key's inputs changing.
+PDF_CACHE_FORMAT = 1
+
+def header_footer_placeholders(pdf_options) -> set:
+    """The bracketed wkhtmltopdf variables (e.g. "[date]") used in the header and footer fields."""
+    fields = (value for name, value in pdf_options.items() if name.startswith(('header-', 'footer-')))
+    return {match for value in fields if isinstance(value, str) for match in re.findall(r'\[\w+\]', value)}
+
+# ioctl request that makes a file share another file's data blocks (linux/fs.h).
+FICLONE = 0x40049409
+
+def copy_file(source, destination):
+    """Copy ``source`` to a new file ``destination``, as cheaply as the file system allows.
+
+    Tries a reflink (Btrfs, XFS, ...), whose blocks are only copied once
+    either file changes, then an in-kernel copy_file_range, then a plain copy.
+    """
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            import fcntl
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except (ImportError, OSError):
+            pass
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while os.copy_file_range(src.fileno(), dst.fileno(), 2**30):
+                    pass
+                return
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        shutil.copyfileobj(src, dst)
+
+class PdfCache:
+    """Finished PDFs stored under a hash of everything that went into them.
+
+    The key covers the HTML pages handed to wkhtmltopdf (which already embed
+    the Markdown, the theme and table CSS and the emoji SVGs), the contents of
+    the local images they reference, the wkhtmltopdf options and the
+    wkhtmltopdf binary itself. A header or footer showing [date] or [isodate]
+    adds today's date, so the PDF is not reused on a later day; one showing
+    [time] is never cached (see cacheable). A hit copies the stored PDF to the
+    output path (see copy_file) instead of running wkhtmltopdf. It is not
+    linked: a viewer saving the output in place would change the entry too.
+
+    The least recently used entries are deleted once the directory grows past
+    the size given to ``store``. Batch workers share the directory: files are
+    written atomically and each process evicts on its own, so the limit is
+    approximate while several processes write at once.
+    """
+
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size) -> content digest of a referenced file.
+        self._file_digests = {}
+        # Bytes this process believes are stored; None until the first scan.
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _file_digest(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._file_digests.get(key)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            with self._lock:
+                self._file_digests[key] = digest
+        return digest
+
+    @staticmethod
+    def cacheable(pdf_options) -> bool:
+        """False if the PDF shows the time it was rendered at, which no stored PDF can match."""
+        return '[time]' not in header_footer_placeholders(pdf_options)
+
+    def key(self, html_documents, pdf_options, toc, config) -> str:
+        """Return the cache key for rendering ``html_documents`` with these wkhtmltopdf settings."""
+        binary = config.wkhtmltopdf
+        binary = binary.decode() if isinstance(binary, bytes) else binary
+        stat = os.stat(binary)
+        # wkhtmltopdf stamps the render date into these fields.
+        dated = header_footer_placeholders(pdf_options) & {'[date]', '[isodate]'}
+        render_date = time.strftime("%Y-%m-%d") if dated else None
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps([PDF_CACHE_FORMAT, sorted(pdf_options.items()), toc,
+                                  [binary, stat.st_mtime_ns, stat.st_size], render_date]).encode('utf-8'))
+        for document in html_documents:
+            encoded = document.encode('utf-8')
+            digest.update(b"\0%d\0" % len(encoded) + encoded)
+            for url in re.findall(r'\bsrc\s*=\s*["\']([^"\']+)["\']', document):
+                path = local_file_path(html.unescape(url))
+                if path is not None:
+                    digest.update(f"\0{path}\0{self._file_digest(path)}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Put the stored PDF for ``key`` at ``output_path``. Returns False on a miss."""
+        entry = self._entry_path(key)
+        try:
+            # The modification time is the entry's last use, for eviction.
+            os.utime(entry)
+            # Copy next to the output, then rename over it, so a failure
+            # never leaves a half-written PDF behind.
+            fd, temp_path = tempfile.mkstemp(prefix="temp_output_", suffix=".pdf",
+                                             dir=os.path.dirname(os.path.abspath(output_path)))
+            os.close(fd)
+            try:
+                os.remove(temp_path)
+                copy_file(entry, temp_path)
+                os.replace(temp_path, output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, pdf_path: str, max_bytes: int):
+        """Copy the freshly written ``pdf_path`` into the cache, then evict down to ``max_bytes``."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = os.path.join(self.cache_dir, f"tmp_{os.getpid()}_{threading.get_ident()}_{key}.pdf")
+        try:
+            copy_file(pdf_path, temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self._entry_path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            over = self._total_bytes is None or self._total_bytes > max_bytes
+        if over:
+            self.evict(max_bytes)
+
+    def evict(self, max_bytes: int):
+        """Delete the least recently used entries until the cache holds at most ``max_bytes``."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pdf") and not entry.name.startswith("tmp_"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._total_bytes = total
+            self.evicted += evicted
+
+    def stats(self) -> dict:
+        """Hits, misses and evictions in this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+# Paper sizes in inches, used to lay out the live preview like the printed page.
+PREVIEW_PAGE_SIZES_IN = {
+    "A4": (8.27, 11.69), "Letter": (8.5, 11.0), "Legal": (8.5, 14.0),
+    "A3": (11.69, 16.53), "A5": (5.83, 8.27)
+}
+
+@functools.lru_cache(maxsize=64)
+def preview_page_css(page_size, orientation, margin_top, margin_bottom, margin_left, margin_right):
+    """Preview-only styles that lay the body out like a printed page."""
+    page_w_in, page_h_in = PREVIEW_PAGE_SIZES_IN.get(page_size, (8.27, 11.69))
+    if orientation == 'landscape':
+        page_w_in, page_h_in = page_h_in, page_w_in
+
+    try:
+        margin_t = float(margin_top)
+        margin_b = float(margin_bottom)
+        margin_l = float(margin_left)
+        margin_r = float(margin_right)
+    except ValueError: # Handle invalid or empty fields
+        margin_t, margin_b, margin_l, margin_r = 0.8, 0.8, 0.6, 0.6
+
+    content_w_in = page_w_in - margin_l - margin_r
+
+    preview_specific_css = f"""
+    html {{
+        padding: 2em 0;          /* Vertical spacing for the shadow effect */
+        display: flex;
+        justify-content: center;
+    }}
+    body {{
+        /* Set page width based on paper size minus horizontal margins */
+        width: {content_w_in}in;
+        max-width: 98%;          /* Prevent overflow on narrow windows and allow slight padding */
+
+        /* Use padding to simulate the document margins */
+        padding: {margin_t}in {margin_r}in {margin_b}in {margin_l}in;
+
+        /* Visual styling to make it look like a page */
+        box-shadow: 0 0.5rem 2rem rgba(0,0,0,0.4);
+        box-sizing: border-box;  /* Include padding and border in the element's total width and height */
+        margin: 0 !important;    /* Override any margin the theme might set */
+    }}
+    """
+
+    return f"@media screen {{ {preview_specific_css} }}"
+
+def page_content_width_in(page_size, orientation, margin_left, margin_right) -> float:
+    """Width of the printable area in inches."""
+    page_w_in, page_h_in = PREVIEW_PAGE_SIZES_IN.get(page_size, (8.27, 11.69))
+    if orientation == 'landscape':
+        page_w_in = page_h_in
+    try:
+        return page_w_in - float(margin_left) - float(margin_right)
+    except ValueError: # Handle invalid or empty fields
+        return page_w_in - 0.6 - 0.6
+
+# The options ConversionPipeline.build_preview reads. Changing any other
+# option (headers, TOC, PDF settings, ...) leaves the preview as it is.
+PREVIEW_OPTION_KEYS = ("table_handling", "orientation", "page_size", "margin_top", "margin_bottom", "margin_left",
+                       "margin_right", "auto_fix_markdown", "dedupe_emoji", "emoji_size", "current_theme",
+                       "extensions")
+
+def preview_options_key(options: dict, base_dir: str = None) -> str:
+    """Fingerprint of everything apart from the text that the preview of a document depends on."""
+    return json.dumps([base_dir] + [options[key] for key in PREVIEW_OPTION_KEYS], sort_keys=True)
+
+class RenderCancelled(Exception):
+    """Raised inside the pipeline when the render it belongs to has been superseded."""
+
+# The StageTimings being recorded on each thread, if any.
+_current_timings = threading.local()
+_trace_lock = threading.Lock()
+# perf_counter() has no fixed origin; adding this gives Unix time for trace timestamps.
+_PERF_COUNTER_EPOCH = time.time() - time.perf_counter()
+
+class StageTimings:
+    """Wall-clock time spent in each stage of one preview render or conversion.
+
+    Used as ``with StageTimings("convert", trace_path) as timings:`` around the
+    work. While the block runs, timed_stage() blocks on the same thread add
+    their time to it; a stage that runs more than once is summed. Outside
+    such a block timed_stage() only costs a thread-local lookup. If
+    ``trace_path`` is set, log() appends the stages to that file as Chrome
+    trace events.
+    """
+
+    def __init__(self, name, trace_path=""):
+        self.name = name
+        self.trace_path = trace_path
+        self.stages = {}
+        self.start = self.end = None
+        self._events = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_current_timings, "value", None)
+        _current_timings.value = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end = time.perf_counter()
+        _current_timings.value = self._previous
+        return False
+
+    def add(self, stage, start, end):
+        self.stages[stage] = self.stages.get(stage, 0.0) + end - start
+        if self.trace_path:
+            self._events.append((stage, start, end, threading.get_ident()))
+
+    def summary(self):
+        """The stages as text for the status bar, e.g. "markdown 41 ms, wkhtmltopdf 1.2 s"."""
+        return ", ".join(f"{stage} {seconds * 1000:.0f} ms" if seconds < 1 else f"{stage} {seconds:.1f} s"
+                         for stage, seconds in self.stages.items())
+
+    def log(self):
+        """Append this run and its stages to the trace file, if there is one."""
+        if not self.trace_path or self.start is None:
+            return
+        events = [(self.name, self.start, self.end or time.perf_counter(), threading.get_ident())] + self._events
+        append_trace_events(self.trace_path, self.name, events)
+
+@contextlib.contextmanager
+def timed_stage(stage):
+    """Add the time spent in the block to the thread's current StageTimings, if any."""
+    timings = getattr(_current_timings, "value", None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, start, time.perf_counter())
+
+def append_trace_events(path, category, events):
+    """Append ``(name, start, end, thread id)`` perf_counter spans to a Chrome trace file.
+
+    The file uses the trace event JSON array format and is never closed with
+    "]" (which chrome://tracing and Perfetto accept), so later runs and other
+    processes can keep appending to it. Errors are ignored; tracing must not
+    fail a conversion.
+    """
+    pid = os.getpid()
+    lines = "".join(json.dumps({"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                                "ts": round((start + _PERF_COUNTER_EPOCH) * 1e6),
+                                "dur": round((end - start) * 1e6)}) + ",\n"
+                    for name, start, end, tid in events)
+    try:
+        with _trace_lock, open(path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                lines = "[\n" + lines
+            f.write(lines)
+    except OSError:
+        pass
+
+# Image URLs that are left alone: absolute URLs and paths, and inline data.
+ABSOLUTE_URL_RE = re.compile(r'^(https?://|file://|data:|/|\\|[A-Za-z]:\\)')
+
+def file_url(path: str) -> str:
+    """A file:/// URL for a local path, in the form the pipeline writes into its HTML."""
+    path = os.path.normpath(path).replace('\\', '/')
+    return f"file:///{path.lstrip('/')}"
+
+def resolve_image_url(url: str, base_dir: str) -> str:
+    """Turn an image URL relative to ``base_dir`` into a file:/// URL; leave others unchanged."""
+    if ABSOLUTE_URL_RE.match(url):
+        return url
+    return file_url(os.path.abspath(os.path.join(base_dir, url)))
+
+def local_file_path(url: str):
+    """Return the path of the existing local file ``url`` points to (file:// or absolute), else None."""
+    import urllib.request
+    if url.startswith("file://"):
+        path = urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+    elif os.path.isabs(url):
+        path = url
+    else:
+        return None
+    return path if os.path.isfile(path) else None
+
+def resolve_html_image_paths(html_content: str, base_dir: str, rewrite_image=None) -> str:
+    """Apply resolve_image_url (and ``rewrite_image``, if given) to the src of every <img> tag in an HTML string.
+
+    ``rewrite_image`` gets the tag's width attribute, like DocumentInspector passes it.
+    """
+    def replace(match):
+        tag = match.group(0)
+        width = re.search(r'\swidth\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', tag, re.IGNORECASE)
+        width_attr = next((value for value in width.groups() if value is not None), None) if width else None
+
+        def replace_src(src_match):
+            url = resolve_image_url(src_match.group(3), base_dir) if base_dir else src_match.group(3)
+            if rewrite_image is not None:
+                url = rewrite_image(url, width_attr)
+            return f"{src_match.group(1)}{src_match.group(2)}{url}{src_match.group(2)}"
+
+        return re.sub(r'(\ssrc=)(["\'])(.*?)\2', replace_src, tag, count=1, flags=re.IGNORECASE)
+
+    return re.sub(r'<img\b[^>]*>', replace, html_content, flags=re.IGNORECASE)
+
+def html_table_columns(html_content: str) -> int:
+    """The number of cells in the first row of the widest table in an HTML string."""
+    tables = re.findall(r'<table[^>]*>(.*?)</table>', html_content, re.DOTALL)
+    max_columns = 0
+    for table in tables:
+        header_match = re.search(r'<tr[^>]*>(.*?)</tr>', table, re.DOTALL)
+        if header_match:
+            cells = re.findall(r'<t[hd][^>]*>', header_match.group(1))
+            max_columns = max(max_columns, len(cells))
+    return max_columns
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+# Serialized as <!--md2pdf-section-->; see DocumentInspector.mark_sections.
+SECTION_MARKER = "md2pdf-section"
+# Serialized as <!--md2pdf-block-->; see DocumentInspector.mark_blocks.
+BLOCK_MARKER = "md2pdf-block"
+
+@functools.lru_cache(maxsize=None)
+def _treeprocessor(cls):
+    """``cls`` combined with markdown's Treeprocessor base class.
+
+    Built on first use, so that importing this module does not import markdown.
+    """
+    import markdown.treeprocessors
+    return type(cls.__name__, (cls, markdown.treeprocessors.Treeprocessor), {})
+
+class DocumentInspector:
+    """Measures tables and resolves relative image paths while the document is still a tree.
+
+    Set ``base_dir`` before a conversion to rewrite relative image URLs against
+    it; afterwards ``table_columns`` holds the cell count of the first row of
+    the widest table. ``rewrite_image``, if set, is then called with each image
+    URL and the image's width attribute (or None) and returns the URL to use.
+    Raw HTML from the source is not in the tree but in the html stash, so
+    stashed strings that contain tables or images get the string versions of
+    these jobs. It becomes a markdown tree processor through _treeprocessor.
+    With ``mark_sections`` set, a SECTION_MARKER comment is
+    inserted before every top-level heading of the document's highest heading
+    level (except a heading that opens the document), so the HTML can be cut
+    into sections without splitting a nested block. With ``mark_blocks`` set,
+    a BLOCK_MARKER comment goes between every two top-level elements.
+    """
+
+    NAME = 'md2pdf_inspect'
+
+    def __init__(self, md):
+        super().__init__(md)
+        self.base_dir = None
+        self.rewrite_image = None
+        self.mark_sections = False
+        self.mark_blocks = False
+        self.table_columns = 0
+
+    @classmethod
+    def attach(cls, md, base_dir=None, rewrite_image=None, mark_sections=False, mark_blocks=False):
+        """Prepare the inspector of ``md`` for the next conversion, registering it if needed."""
+        if cls.NAME not in md.treeprocessors:
+            # After unescape (0), so URLs read as they will be written out.
+            md.treeprocessors.register(_treeprocessor(cls)(md), cls.NAME, -1)
+        inspector = md.treeprocessors[cls.NAME]
+        inspector.base_dir = base_dir
+        inspector.rewrite_image = rewrite_image
+        inspector.mark_sections = mark_sections
+        inspector.mark_blocks = mark_blocks
+        # Markdown.convert skips the tree processors for blank input.
+        inspector.table_columns = 0
+        return inspector
+
+    def run(self, root):
+        columns = 0
+        trees = [root]
+        stash = self.md.htmlStash.rawHtmlBlocks
+        for index, raw in enumerate(stash):
+            if not isinstance(raw, str):
+                # md_in_html keeps parsed elements in the stash.
+                trees.append(raw)
+                continue
+            if "<table" in raw:
+                columns = max(columns, html_table_columns(raw))
+            if (self.base_dir or self.rewrite_image) and "<img" in raw:
+                stash[index] = resolve_html_image_paths(raw, self.base_dir, self.rewrite_image)
+        for tree in trees:
+            for table in tree.iter("table"):
+                row = next(table.iter("tr"), None)
+                if row is not None:
+                    columns = max(columns, sum(1 for cell in row if cell.tag in ("th", "td")))
+            if self.base_dir or self.rewrite_image:
+                for image in tree.iter("img"):
+                    src = image.get("src")
+                    if src and self.base_dir:
+                        src = resolve_image_url(src, self.base_dir)
+                    if src and self.rewrite_image:
+                        src = self.rewrite_image(src, image.get("width"))
+                    if src:
+                        image.set("src", src)
+        self.table_columns = columns
+        if self.mark_sections:
+            levels = [int(child.tag[1]) for child in root if child.tag in HEADING_TAGS]
+            if levels:
+                tag = f"h{min(levels)}"
+                starts = [index for index, child in enumerate(root) if child.tag == tag and index > 0]
+                for index in reversed(starts):
+                    root.insert(index, ET.Comment(SECTION_MARKER))
+        if self.mark_blocks:
+            for index in reversed(range(1, len(root))):
+                root.insert(index, ET.Comment(BLOCK_MARKER))
+
+class MarkdownParserPool:
+    """Reusable ``markdown.Markdown`` instances, keyed by the set of enabled extensions.
+
+    Building a Markdown object imports and registers every extension, which
+    costs more than converting a short document. A parser is checked out for
+    one conversion at a time and reset before it goes back to the pool, so the
+    pool is safe to share between the preview thread, the GUI conversion
+    thread and batch workers.
+    """
+
+    MAX_IDLE_PER_KEY = 4
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+
+    def convert(self, md_text, extensions):
+        """Render ``md_text`` like ``markdown.markdown(md_text, extensions=extensions)``."""
+        return self.render(md_text, extensions)[0]
+
+    def render(self, md_text, extensions, base_dir=None, rewrite_image=None, mark_sections=False, mark_blocks=False):
+        """Like convert, but resolve relative image paths against ``base_dir`` (if given).
+
+        Returns the HTML and the DocumentInspector's table column count;
+        ``rewrite_image``, ``mark_sections`` and ``mark_blocks`` are handed to the DocumentInspector.
+        """
+        extensions = list(extensions)
+        key = frozenset(extensions)
+        with self._lock:
+            idle = self._idle.get(key)
+            md = idle.pop() if idle else None
+        if md is None:
+            import markdown
+            md = markdown.Markdown(extensions=extensions)
+            with self._lock:
+                self.created += 1
+        # A parser that raised may hold half-built state; it is simply not returned.
+        inspector = DocumentInspector.attach(md, base_dir, rewrite_image, mark_sections, mark_blocks)
+        html = md.convert(md_text)
+        table_columns = inspector.table_columns
+        md.reset()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.MAX_IDLE_PER_KEY:
+                idle.append(md)
+        return html, table_columns
+
+# Shared by every pipeline in the process.
+markdown_parsers = MarkdownParserPool()
+
+class _SlugProbe:
+    """Stands in for the toc extension's set of used ids while rendering one block.
+
+    Ids from earlier blocks are looked up in ``prior``; every such lookup is
+    recorded, so a cached block can later be reused only if those lookups would
+    still come out the same.
+    """
+
+    def __init__(self, prior):
+        self.prior = prior
+        self.assigned = set()
+        self.probes = {}
+
+    def __contains__(self, slug):
+        if slug in self.assigned:
+            return True
+        hit = slug in self.prior
+        self.probes.setdefault(slug, hit)
+        return hit
+
+    def add(self, slug):
+        self.assigned.add(slug)
+
+class _ReferenceProbe(dict):
+    """Stands in for ``Markdown.references`` while rendering one block.
+
+    Seeded with the whole document's link references. Records which ids the
+    block looked up and which it defined; a ``frozen`` probe keeps the seeded
+    (document-final) value when the block redefines an id.
+    """
+
+    def __init__(self, seed, frozen):
+        super().__init__(seed)
+        self.frozen = frozen
+        self.defined = {}
+        self.probes = {}
+
+    def __contains__(self, key):
+        self.probes.setdefault(key, self.get(key))
+        return super().__contains__(key)
+
+    def __setitem__(self, key, value):
+        self.defined[key] = value
+        if not self.frozen:
+            super().__setitem__(key, value)
+
+class _AbbreviationProbe(dict):
+    """Stands in for the abbr extension's abbreviation table while rendering one block."""
+
+    def __init__(self, seed, frozen):
+        super().__init__(seed)
+        self.frozen = frozen
+        self.operations = []
+
+    def __setitem__(self, key, value):
+        self.operations.append((key, value))
+        if not self.frozen:
+            super().__setitem__(key, value)
+
+    def pop(self, key, default=None):
+        self.operations.append((key, None))
+        return default if self.frozen else super().pop(key, default)
+
+class _ExplicitIdCollector:
+    """Collects the ids set in the block itself (e.g. by attr_list) before toc assigns its own.
+
+    A markdown tree processor once combined with its base class by _treeprocessor.
+    """
+
+    def __init__(self, md, renderer):
+        super().__init__(md)
+        self.renderer = renderer
+
+    def run(self, root):
+        self.renderer._explicit_ids.update(el.get("id") for el in root.iter() if el.get("id"))
+
+class _BlockRender:
+    """One rendering of a block, plus the document context it depended on."""
+
+    __slots__ = ("html", "table_columns", "ids", "slug_probes", "reference_probes", "abbreviations")
+
+    def __init__(self, html, table_columns, ids, slug_probes, reference_probes, abbreviations):
+        self.html = html
+        self.table_columns = table_columns
+        self.ids = ids
+        self.slug_probes = slug_probes
+        self.reference_probes = reference_probes
+        self.abbreviations = abbreviations
+
+    def fits(self, references, abbreviations, prior_ids):
+        return (all(references.get(key) == value for key, value in self.reference_probes.items())
+                and (self.abbreviations is None or self.abbreviations == abbreviations)
+                and all((slug in prior_ids) == hit for slug, hit in self.slug_probes.items()))
+
+class _BlockRecord:
+    """Everything cached for one block: what it defines and its recent renders."""
+
+    __slots__ = ("references", "abbreviation_operations", "explicit_ids", "renders")
+
+    def __init__(self, references, abbreviation_operations, explicit_ids):
+        self.references = references
+        self.abbreviation_operations = abbreviation_operations
+        self.explicit_ids = explicit_ids
+        self.renders = []
+
+class IncrementalMarkdownRenderer:
+    """Markdown renderer for the live preview that only re-renders changed blocks.
+
+    The source is split into top-level blocks at blank lines, and each block's
+    HTML is cached by its text, so an edit costs a re-render of the blocks it
+    touched. Constructs that Python-Markdown joins across blank lines (fenced
+    code, indented continuations, loose lists, blockquotes, definition lists and
+    raw HTML) stay in one block.
+
+    State shared across blocks is handled explicitly. Link references and
+    abbreviations are collected from every block and fed to each render.
+    toc heading ids are made unique across the whole document. Every cached
+    render records the parts of that shared state it read, and it is reused only
+    while they are unchanged. Documents using footnotes or a [TOC] marker,
+    whose output depends on the whole document, are rendered in one piece and
+    then cut into their top-level elements.
+
+    The output matches ``markdown.markdown`` up to whitespace between top-level
+    elements. Only the blocks of the last two renders are kept.
+    """
+
+    # The opening fence as fenced_code accepts it: optional {attrs} or .lang and hl_lines.
+    FENCE_RE = re.compile(r'^(`{3,}|~{3,})[ ]*(?:\{.*\}|(?:\.?[\w#.+-]*[ ]*)?(?:hl_lines=(["\']).*?\2[ ]*)?)$')
+    LIST_RE = re.compile(r'^[ ]{0,3}(?:[*+-]|\d+\.)[ \t]+')
+    DEF_RE = re.compile(r'^[ ]{0,3}:[ ]{1,3}', re.MULTILINE)
+    QUOTE_RE = re.compile(r'^[ ]{0,3}>')
+    DEFINITION_RE = re.compile(r'^(?:[ ]{0,3}\[[^\]\n]*\]:|\*\[)')
+    HTML_LINE_RE = re.compile(r'^<(!--|[a-zA-Z][a-zA-Z0-9]*)', re.MULTILINE)
+    MAX_RENDERS_PER_BLOCK = 4
+    CHECK_EVERY = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._previous = {}
+        self._slug_probe = None
+        self._explicit_ids = set()
+        self._parsers = {}
+
+    def render(self, md_text, extensions, cancelled=None, base_dir=None):
+        """Render ``md_text`` like ``markdown.markdown(md_text, extensions=extensions)``.
+
+        ``cancelled`` is polled every few blocks; once it returns True the render
+        stops with RenderCancelled, keeping whatever it cached so far. Relative
+        image paths are resolved against ``base_dir`` when it is given.
+        """
+        return "\n".join(self.render_blocks(md_text, extensions, cancelled, base_dir)[0])
+
+    def render_blocks(self, md_text, extensions, cancelled=None, base_dir=None):
+        """Like render, but return the HTML of each non-empty block separately.
+
+        Returns the blocks and the DocumentInspector's table column count.
+        """
+        extensions = list(extensions)
+        uses_footnotes = 'footnotes' in extensions or 'extra' in extensions
+        if (uses_footnotes and '[^' in md_text) or ('toc' in extensions and '[TOC]' in md_text):
+            # Still one fragment per top-level element, so the preview can patch and virtualize it.
+            html, table_columns = markdown_parsers.render(md_text, extensions, base_dir, mark_blocks=True)
+            blocks = (block.strip() for block in html.split(f"<!--{BLOCK_MARKER}-->"))
+            return [block for block in blocks if block], table_columns
+
+        blocks = self.split_blocks(md_text)
+        has_toc = 'toc' in extensions
+
+        def get_parser():
+            # Created on first use and then reused; only one render runs at a time.
+            key = frozenset(extensions)
+            if key not in self._parsers:
+                configs = {'toc': {'slugify': self._slugify}} if has_toc else {}
+                import markdown
+                md = markdown.Markdown(extensions=extensions, extension_configs=configs)
+                if has_toc:
+                    # Between attr_list (8) and toc (5).
+                    md.treeprocessors.register(_treeprocessor(_ExplicitIdCollector)(md, self),
+                                               'md2pdf_explicit_ids', 6)
+                self._parsers[key] = md
+            return self._parsers[key]
+
+        with self._lock:
+            self._previous, self._cache = self._cache, {}
+            try:
+                # Pass 1: find what each block defines, rendering new blocks once to learn it.
+                records = []
+                prior_ids = set()
+                for index, block in enumerate(blocks):
+                    if cancelled is not None and index % self.CHECK_EVERY == 0 and cancelled():
+                        raise RenderCancelled()
+                    key = (tuple(extensions), base_dir, index == 0, block)
+                    record = self._cache.get(key) or self._previous.get(key)
+                    if record is None:
+                        references = _ReferenceProbe({}, frozen=False)
+                        abbreviations = _AbbreviationProbe({}, frozen=False)
+                        block_render = self._render_block(get_parser(), block, index, base_dir, references,
+                                                          abbreviations, prior_ids)
+                        record = _BlockRecord(references.defined, abbreviations.operations,
+                                              frozenset(self._explicit_ids))
+                        record.renders.append(block_render)
+                    self._cache[key] = record
+                    records.append(record)
+                    prior_ids.update(record.explicit_ids, record.renders[0].ids)
+
+                # A full render reserves every explicit id before toc assigns any.
+                explicit_ids = set()
+                references = {}
+                abbreviations = {}
+                for record in records:
+                    explicit_ids.update(record.explicit_ids)
+                    references.update(record.references)
+                    for key, value in record.abbreviation_operations:
+                        if value is None:
+                            abbreviations.pop(key, None)
+                        else:
+                            abbreviations[key] = value
+
+                # Pass 2: reuse the renders made in the same context; re-render the rest.
+                parts = []
+                table_columns = 0
+                prior_ids = set(explicit_ids)
+                for index, (block, record) in enumerate(zip(blocks, records)):
+                    if cancelled is not None and index % self.CHECK_EVERY == 0 and cancelled():
+                        raise RenderCancelled()
+                    block_render = next((r for r in record.renders
+                                         if r.fits(references, abbreviations, prior_ids)), None)
+                    if block_render is None:
+                        block_render = self._render_block(
+                            get_parser(), block, index, base_dir, _ReferenceProbe(references, frozen=True),
+                            _AbbreviationProbe(abbreviations, frozen=True), prior_ids)
+                        record.renders.insert(0, block_render)
+                        del record.renders[self.MAX_RENDERS_PER_BLOCK:]
+                    if block_render.html:
+                        parts.append(block_render.html)
+                    table_columns = max(table_columns, block_render.table_columns)
+                    prior_ids.update(block_render.ids)
+            except RenderCancelled:
+                # Keep everything cached so far for the render that superseded this one.
+                self._cache = {**self._previous, **self._cache}
+                raise
+        return parts, table_columns
+
+    def _render_block(self, md, block, index, base_dir, references, abbreviations, prior_ids):
+        md.reset()
+        inspector = DocumentInspector.attach(md, base_dir)
+        md.references = references
+        has_abbr = 'abbr' in md.treeprocessors
+        if has_abbr:
+            md.treeprocessors['abbr'].abbrs = abbreviations
+            md.parser.blockprocessors['abbr'].abbrs = abbreviations
+        self._slug_probe = _SlugProbe(prior_ids)
+        self._explicit_ids = set()
+        try:
+            # A leading blank line keeps the meta extension from reading later blocks as metadata.
+            html = md.convert(block if index == 0 else "\n" + block)
+            return _BlockRender(html, inspector.table_columns, frozenset(self._slug_probe.assigned),
+                                self._slug_probe.probes, references.probes,
+                                dict(abbreviations) if has_abbr else None)
+        finally:
+            self._slug_probe = None
+
+    def _slugify(self, value, separator):
+        # The toc extension then calls unique() again with only this block's ids,
+        # which leaves an id that is already unique document-wide unchanged.
+        from markdown.extensions.toc import slugify, unique
+        return unique(slugify(value, separator), self._slug_probe)
+
+    @classmethod
+    def split_blocks(cls, md_text):
+        """Split ``md_text`` into blocks that render the same on their own as in place."""
+        blocks = []
+        current = []
+        fence = None
+        after_blank = False
+        for number, line in enumerate(md_text.split("\n")):
+            if fence:
+                current.append(line)
+                if line.rstrip(" ") == fence:
+                    fence = None
+                continue
+            # Like Python-Markdown, a whitespace-only first line does not count as blank.
+            if not line.strip(" \t") and (number or not line):
+                current.append(line)
+                after_blank = True
+                continue
+            if after_blank and current and not line[0].isspace() and not cls._continues(current, line):
+                blocks.append("\n".join(current).rstrip("\n"))
+                current = []
+            after_blank = False
+            current.append(line)
+            match = cls.FENCE_RE.match(line)
+            if match:
+                fence = match.group(1)
+        if current:
+            blocks.append("\n".join(current).rstrip("\n"))
+
+        # A definition list continues into the next block when that block also
+        # holds definitions ("Term\n: definition").
+        merged = []
+        for block in blocks:
+            if merged and cls.DEF_RE.search(block) and cls.DEF_RE.search(merged[-1]):
+                merged[-1] += "\n\n" + block
+            else:
+                merged.append(block)
+        return merged
+
+    @classmethod
+    def _continues(cls, current, line):
+        """True if ``line``, following a blank line, must stay in the same block as ``current``."""
+        # Raw HTML runs until its opening tag is closed, blank lines included.
+        text = "\n".join(current)
+        if "<" in text:
+            for tag in set(cls.HTML_LINE_RE.findall(text)):
+                if tag == "!--":
+                    if text.count("<!--") > text.count("-->"):
+                        return True
+                elif (len(re.findall(rf'<{tag}[\s>]', text, re.IGNORECASE))
+                      > len(re.findall(rf'</{tag}\s*>', text, re.IGNORECASE))):
+                    return True
+        # Definitions hand any lines after them back to the parser, which may join
+        # them to the previous block's last element; so can a stray ":" line.
+        if line.startswith(":") or cls.DEFINITION_RE.match(line):
+            return True
+        if cls.LIST_RE.match(line):
+            return any(cls.LIST_RE.match(previous) for previous in current)
+        if cls.QUOTE_RE.match(line):
+            return any(cls.QUOTE_RE.match(previous) for previous in current)
+        return False
+
+class MarkdownAutoFixer:
+    """Repairs common Markdown slips in one pass over the lines.
+
+    - ``# **Title**`` loses the bold markers (a bare ``#`` line followed by
+      blank lines and a bold line is joined into one heading).
+    - A table gets a blank line before it when it directly follows text.
+    - A list item or heading gets a blank line before it when it directly
+      follows a table row or a paragraph-like line.
+
+    Every decision looks at the current line, the previous one and a little
+    state, so the cost is linear in the text size.
+    """
+    HEADING_BOLD_RE = re.compile(r'(#+)\s*\*\*(.*?)\*\*')
+    BARE_HEADING_RE = re.compile(r'#+\s*$')
+    BOLD_RE = re.compile(r'\s*\*\*(.*?)\*\*')
+    # List or heading marker; callers append "\n" unless the line is the last one,
+    # so a bare "-" or "#" followed by a line break still counts.
+    MARKER_RE = re.compile(r'(?:[*+\-]|\d+\.(?!\S)|#+)\s')
+    LIST_MARKER_RE = re.compile(r'(?:[*+\-]|\d+\.(?!\S))\s')
+    SPACED_MARKER_RE = re.compile(r'(?:[*+\-]|\d+\.|#+)[ \t]')
+    # Lines that start a block of their own: table rows, quotes, rules and fences.
+    BLOCK_START_RE = re.compile(r'[|>]|```|~~~|(?:---|\*\*\*|___)[ \t]*$')
+
+    @staticmethod
+    def _is_table_row(line):
+        stripped = line.strip()
+        return len(stripped) > 1 and stripped[0] == "|" and stripped[-1] == "|"
+
+    @classmethod
+    def _is_paragraph_line(cls, line, before_heading):
+        """True if a list item (or heading) right after ``line`` needs a blank line before it."""
+        rest = line.lstrip(" \t")
+        if not rest or cls.BLOCK_START_RE.match(rest):
+            return False
+        if len(rest) < len(line):
+            # Indented text, unless it is followed by a (nested) list item.
+            return before_heading
+        return not (cls.LIST_MARKER_RE.match(rest + "\n") or cls.SPACED_MARKER_RE.match(rest))
+
+    @classmethod
+    def fix(cls, md_text: str) -> str:
+        lines = md_text.split("\n")
+        last = len(lines) - 1
+        fixed = []
+        previous = None
+        # True while only blank lines followed the last table row.
+        after_row = False
+        # A list marker with nothing after it ("-") after a table takes the next
+        # non-blank line along with it, so that line never counts as a table row.
+        taken = False
+        i = 0
+        while i <= last:
+            line = lines[i]
+            if line.startswith("#"):
+                match = cls.HEADING_BOLD_RE.match(line)
+                if match:
+                    line = f"{match.group(1)} {match.group(2)}{line[match.end():]}"
+                elif cls.BARE_HEADING_RE.match(line):
+                    j = i + 1
+                    while j <= last and not lines[j].strip():
+                        j += 1
+                    match = cls.BOLD_RE.match(lines[j]) if j <= last else None
+                    if match:
+                        line = f"{line.rstrip()} {match.group(1)}{lines[j][match.end():]}"
+                        i = j
+            newline = "" if i == last else "\n"
+            stripped = line.lstrip()
+            is_row = cls._is_table_row(line)
+            if is_row and previous is not None and previous.strip() and not cls._is_table_row(previous):
+                fixed.append("")
+
+            marker = cls.MARKER_RE.match(stripped + newline) if stripped else None
+            takes_next = False
+            if marker and after_row:
+                if previous:
+                    fixed.append("")
+                takes_next = not stripped[marker.end() - 1:].strip()
+            elif (marker and previous is not None and cls.MARKER_RE.match(line.lstrip(" \t") + newline)
+                  and cls._is_paragraph_line(previous, stripped[0] == "#")):
+                fixed.append("")
+
+            if stripped:
+                after_row = is_row and not taken
+                taken = takes_next
+            fixed.append(line)
+            previous = line
+            i += 1
+        return "\n".join(fixed)
+
+# wkhtmltopdf TOC options. pdfkit only emits the "toc" page for a non-empty
+# dict, so this cannot be {}.
+WKHTMLTOPDF_TOC = {'toc-header-text': 'Table of Contents'}
+
+def html_page(stylesheet: str, html_body: str, title: str = None) -> str:
+    """Wrap a rendered body and its stylesheet in the HTML page handed to wkhtmltopdf."""
+    title_tag = f"\n    <title>{html.escape(title)}</title>" if title else ""
+    return f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">{title_tag}
+    <style>
+        {stylesheet}
+    </style>
+</head>
+<body>
+{html_body}
+</body>
+</html>
+"""
+
+class ConversionPipeline:
+    """The Markdown -> HTML -> PDF pipeline, independent of the GUI.
+
+    Options are passed to each call as a plain dict shaped like DEFAULT_OPTIONS,
+    so the same pipeline serves the live preview, GUI conversions and headless
+    batch workers.
+    """
+
+    def __init__(self, emoji_mapping: dict = None, themes_dir: str = THEMES_DIR):
+        self._emoji_mapping = emoji_mapping
+        self.themes_dir = themes_dir
+        self.themes = ThemeManager(themes_dir)
+        self.images = ImageOptimizer()
+        self.pdf_cache = PdfCache()
+        self.preview_markdown = IncrementalMarkdownRenderer()
+
+    @property
+    def emoji_mapping(self):
+        """The glyph -> asset folder mapping, read from disk on first use."""
+        if self._emoji_mapping is None:
+            # Two threads may both load it; they get equal mappings.
+            self._emoji_mapping = load_mapping_from_file()
+        return self._emoji_mapping
+
+    def process_relative_image_paths(self, html_content: str, base_path: str) -> str:
+        if not base_path:
+            return html_content
+        return resolve_html_image_paths(html_content, base_path)
+        
+    def analyze_table_width(self, html_content):
+        return html_table_columns(html_content)
+    
+    def get_table_css(self, html_content, options, table_columns=None):
+        """Table rules for ``html_content``; pass ``table_columns`` if it is already known."""
+        if table_columns is None:
+            table_columns = self.analyze_table_width(html_content)
+        return table_stylesheet(options["current_theme"], options["table_handling"], options["orientation"],
+                                table_width_bucket(table_columns))
+
+    def create_html_body(self, md_text, options, base_dir=None, cancelled=None, incremental=False):
+        """Processes markdown text to a clean HTML body.
+
+        Relative image paths are resolved against ``base_dir`` when it is given.
+        ``cancelled`` is polled between stages; once it returns True the render
+        stops with RenderCancelled. ``incremental`` renders through the block
+        cache of ``preview_markdown``, for repeated renders of an edited text.
+        """
+        emoji_css, blocks, _ = self._render_body(md_text, options, base_dir, cancelled, incremental)
+        return emoji_css + "\n".join(blocks)
+
+    def create_html_fragments(self, md_text, options, base_dir=None, cancelled=None, incremental=False):
+        """Like create_html_body, but return the body as a list of top-level HTML fragments."""
+        emoji_css, blocks, _ = self._render_body(md_text, options, base_dir, cancelled, incremental)
+        return [emoji_css] + blocks if emoji_css else blocks
+
+    def _render_body(self, md_text, options, base_dir, cancelled, incremental, rewrite_image=None,
+                     mark_sections=False):
+        """Return the emoji stylesheet (or ""), the rendered HTML blocks and the widest table's column count.
+
+        Relative image paths are resolved and tables measured while Markdown
+        still holds the document as a tree (see DocumentInspector), which also
+        applies ``rewrite_image`` and ``mark_sections`` in full (non-incremental) renders.
+        """
+        def checkpoint():
+            if cancelled is not None and cancelled():
+                raise RenderCancelled()
+
+        # Replace emoji glyphs with SVGs if mapping is available
+        # The new replace_glyphs_with_svg function contains all necessary styling,
+        # so we no longer need to pass an img_style parameter.
+        # In dedupe mode each distinct emoji is embedded once as a CSS class.
+        emoji_classes = {} if options["dedupe_emoji"] else None
+        emoji_size = int(options["emoji_size"])
+        with timed_stage("emoji"):
+            md_text = replace_glyphs_with_svg(md_text, self.emoji_mapping, emoji_classes=emoji_classes,
+                                              emoji_size=emoji_size)
+        checkpoint()
+        
+        if options["auto_fix_markdown"]:
+            with timed_stage("auto-fix"):
+                md_text = MarkdownAutoFixer.fix(md_text)
+            checkpoint()
+
+        enabled_extensions = [name for name, enabled in options["extensions"].items() if enabled]
+        base_dir = base_dir or None
+        with timed_stage("markdown"):
+            if incremental:
+                blocks, table_columns = self.preview_markdown.render_blocks(md_text, enabled_extensions, cancelled,
+                                                                            base_dir)
+            else:
+                html_body, table_columns = markdown_parsers.render(md_text, enabled_extensions, base_dir,
+                                                                   rewrite_image, mark_sections)
+                blocks = [html_body]
+        checkpoint()
+
+        with timed_stage("emoji"):
+            emoji_css = emoji_stylesheet(emoji_classes, self.emoji_mapping, emoji_size=emoji_size) if emoji_classes else ""
+        return emoji_css, blocks, table_columns
+
+    def load_theme_css(self, options):
+        """Return the selected theme, or an empty string if it does not exist."""
+        return self.themes.theme_css(options["current_theme"])
+
+    def build_preview(self, md_text, options, base_dir=None, cancelled=None):
+        """Render the live preview, laid out like a printed page.
+
+        Returns the page's stylesheets, keyed by the id of their <style> element
+        in PREVIEW_SHELL, and the body as a list of HTML fragments.
+        """
+        emoji_css, fragments, table_columns = self._render_body(md_text, options, base_dir, cancelled, incremental=True)
+        if emoji_css:
+            fragments = [emoji_css] + fragments
+        
+        with timed_stage("styles"):
+            table_css = self.get_table_css(None, options, table_columns)
+
+            try:
+                theme_css = self.load_theme_css(options)
+            except Exception:
+                theme_css = "body { color: red; font-family: sans-serif; } /* THEME FAILED TO LOAD */"
+
+            styles = {
+                "md2pdf-theme": theme_css,
+                "md2pdf-tables": table_css,
+                # Preview-only styles to simulate page layout
+                "md2pdf-page": preview_page_css(options["page_size"], options["orientation"], options["margin_top"],
+                                                options["margin_bottom"], options["margin_left"],
+                                                options["margin_right"]),
+            }
+        return styles, fragments
+
+    def build_pdf_options(self, options):
+        """Translate converter options into wkhtmltopdf command-line options."""
+        pdf_options = {
+            'encoding': "UTF-8",
+            'dpi': options["pdf_dpi"],
+            'image-quality': options["image_quality"],
+            'image-dpi': options["image_dpi"],
+            'page-size': options["page_size"],
+            'orientation': options["orientation"].title(),
+            'margin-top': f'{options["margin_top"]}in',
+            'margin-bottom': f'{options["margin_bottom"]}in',
+            'margin-left': f'{options["margin_left"]}in',
+            'margin-right': f'{options["margin_right"]}in',
+            'header-left': options["header_left"] or None,
+            'header-center': options["header_center"] or None,
+            'header-right': options["header_right"] or None,
+            'footer-left': options["footer_left"] or None,
+            'footer-center': options["footer_center"] or None,
+            'footer-right': options["footer_right"] or None,
+            'header-font-size': '9',
+            'footer-font-size': '9',
+            'header-spacing': '5',
+            'footer-spacing': '5',
+            'zoom': '1',
+        }
+        pdf_options = {k: v for k, v in pdf_options.items() if v is not None}
+        # pdfkit passes options whose value is None as bare flags, so they are
+        # added after the empty header/footer fields have been dropped. The PDF
+        # outline (bookmarks) stays on, as it always has in practice. Local file
+        # access is always on: without it wkhtmltopdf 0.12.6 leaves out local images.
+        pdf_options['enable-local-file-access'] = None
+        if options["print_media_type"]:
+            pdf_options['print-media-type'] = None
+        if not options["smart_shrinking"]:
+            pdf_options['disable-smart-shrinking'] = None
+        return pdf_options
+
+    def build_html_document(self, md_text, options, base_dir=None, title=None):
+        """Render markdown text to the complete HTML page handed to wkhtmltopdf."""
+        stylesheet, html_body = self.render_html_parts(md_text, options, base_dir)
+        with timed_stage("html"):
+            return html_page(stylesheet, html_body, title)
+
+    def render_html_parts(self, md_text, options, base_dir=None):
+        """Return the stylesheet and body of the page build_html_document would produce."""
+        stylesheet, emoji_css, html_body = self._render_page_parts(md_text, options, base_dir)
+        return stylesheet, emoji_css + html_body
+
+    def build_html_sections(self, md_text, options, base_dir=None):
+        """Render markdown text as a list of HTML pages for sectioned conversion.
+
+        The body is cut before its top-level headings (see DocumentInspector)
+        and the pieces are joined into about ``parallel_sections`` pages of at
+        least SECTION_MIN_CHARS each, so a short document stays a single page,
+        identical to build_html_document's. Every page carries the stylesheet
+        and the emoji classes.
+        """
+        stylesheet, emoji_css, html_body = self._render_page_parts(md_text, options, base_dir, mark_sections=True)
+        target = max(SECTION_MIN_CHARS, len(html_body) // max(1, int(options["parallel_sections"])))
+        sections = [""]
+        for piece in html_body.split(f"<!--{SECTION_MARKER}-->"):
+            if len(sections[-1]) >= target:
+                sections.append("")
+            sections[-1] += piece
+        with timed_stage("html"):
+            return [html_page(stylesheet, emoji_css + section) for section in sections]
+
+    def _render_page_parts(self, md_text, options, base_dir=None, mark_sections=False):
+        rewrite_image = None
+        if options["optimize_images"]:
+            content_width_in = page_content_width_in(options["page_size"], options["orientation"],
+                                                     options["margin_left"], options["margin_right"])
+            rewrite_image = self.images.rewriter(content_width_in, int(options["image_dpi"]),
+                                                 int(options["image_quality"]))
+        emoji_css, blocks, table_columns = self._render_body(md_text, options, base_dir, None, False, rewrite_image,
+                                                             mark_sections)
+        with timed_stage("styles"):
+            width_bucket = table_width_bucket(table_columns)
+            stylesheet = self.themes.stylesheet(options["current_theme"], options["table_handling"],
+                                                options["orientation"], width_bucket)
+        return stylesheet, emoji_css, "\n".join(blocks)
+
+    def fetch_cached_pdf(self, options, html_documents, pdf_options, toc, config, output_path):
+        """Look a conversion up in the PDF cache.
+
+        Returns ``(hit, key)``. On a hit the stored PDF is already at
+        ``output_path``; on a miss, pass ``key`` to store_cached_pdf once the
+        PDF is written. ``key`` is None when the ``pdf_cache`` option is off or
+        the PDF cannot be cached (see PdfCache.cacheable).
+        """
+        key = None
+        if options["pdf_cache"] and self.pdf_cache.cacheable(pdf_options):
+            key = self.pdf_cache.key(html_documents, pdf_options, toc, config)
+            if self.pdf_cache.fetch(key, output_path):
+                return True, key
+        return False, key
+
+    def store_cached_pdf(self, options, key, pdf_path):
+        if key is None:
+            return
+        try:
+            self.pdf_cache.store(key, pdf_path, int(float(options["pdf_cache_max_mb"]) * 2**20))
+        except OSError as e:
+            # The PDF itself was written; only reusing it later is lost.
+            print(f"Warning: Could not add '{pdf_path}' to the PDF cache: {e}")
+
+    def convert_markdown_to_pdf(self, md_text, output_path, options, base_dir=None, work_dir=None):
+        """Convert ``md_text`` to ``output_path``. Returns True if the PDF came from the PDF cache.
+
+        Intermediate files go to ``work_dir`` if given, else next to the
+        output. With the ``parallel_sections`` option above 1, a long
+        document is rendered in sections by several wkhtmltopdf processes at
+        once (see convert_html_sections).
+        """
+        import pdfkit
+        if int(options["parallel_sections"]) > 1 and sectioned_conversion_blocker(options) is None:
+            pages = self.build_html_sections(md_text, options, base_dir)
+        else:
+            pages = [self.build_html_document(md_text, options, base_dir)]
+        config = find_wkhtmltopdf_configuration(options["wkhtmltopdf_path"])
+        pdf_options = self.build_pdf_options(options)
+        with timed_stage("cache"):
+            hit, key = self.fetch_cached_pdf(options, pages, pdf_options, options["generate_toc"], config,
+                                             output_path)
+        if hit:
+            return True
+        if len(pages) > 1:
+            try:
+                with timed_stage("wkhtmltopdf"):
+                    self.convert_html_sections(pages, output_path, options, config, pdf_options, work_dir)
+            except Exception as e:
+                # One wkhtmltopdf run over the whole document makes the same PDF, only more slowly.
+                print(f"Warning: Rendering '{output_path}' in sections failed ({e}); rendering it in one piece.")
+                pages = [self.build_html_document(md_text, options, base_dir)]
+                with timed_stage("cache"):
+                    hit, key = self.fetch_cached_pdf(options, pages, pdf_options, options["generate_toc"], config,
+                                                     output_path)
+                if hit:
+                    return True
+            else:
+                with timed_stage("cache"):
+                    self.store_cached_pdf(options, key, output_path)
+                return False
+
+        # A unique name per conversion, so parallel conversions into the same
+        # folder cannot overwrite (or delete) each other's input.
+        fd, temp_html_path = tempfile.mkstemp(prefix="temp_output_", suffix=".html",
+                                              dir=work_dir or os.path.dirname(os.path.abspath(output_path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(pages[0])
+            
+        try:
+            with timed_stage("wkhtmltopdf"):
+                if options["generate_toc"]:
+                    pdfkit.from_file(temp_html_path, output_path, configuration=config, options=pdf_options,
+                                     toc=WKHTMLTOPDF_TOC)
+                else:
+                    pdfkit.from_file(temp_html_path, output_path, configuration=config, options=pdf_options)
+
+        finally:
+            # Always clean up the temporary file.
+            if os.path.exists(temp_html_path):
+                os.remove(temp_html_path)
+        with timed_stage("cache"):
+            self.store_cached_pdf(options, key, output_path)
+        return False
+
+    def convert_html_sections(self, pages, output_path, options, config, pdf_options, work_dir=None):
+        """Render the section ``pages`` of one document in parallel and merge them into ``output_path``.
+
+        Up to ``parallel_sections`` wkhtmltopdf processes run at once, each
+        holding only its own section in memory. Header and footer fields with
+        page numbers ([page], [topage], [sitepage], ...) need the page counts
+        of all earlier sections, which are only known after rendering. So the
+        sections are rendered once without those fields, and the fields are
+        rendered afterwards onto blank pages with the document's numbering (see
+        blank_pages_html). The merge then lays each blank page under its page.
+        Only a field that also shows the current heading ([section], ...) can
+        not be split off like that. In that case the sections whose fields
+        change are rendered a second time, with --page-offset and the page total.
+
+        The table of contents and the PDF outline (bookmarks) are built from
+        the headings wkhtmltopdf reports while rendering. The table is rendered
+        as pages of their own in front, and its entries are linked to the pages
+        they list. Links between sections do not survive the merge. Needs the
+        optional ``pypdf`` package.
+        """
+        import pdfkit
+        from pypdf import PdfReader, PdfWriter
+
+        toc = options["generate_toc"]
+        outline = 'no-outline' not in pdf_options
+        numbered_fields = {key: value for key, value in pdf_options.items()
+                           if key in HEADER_FOOTER_OPTIONS and any(v in value for v in PAGE_NUMBER_VARIABLES)}
+        rerender = any(v in value for value in numbered_fields.values() for v in HEADING_VARIABLES)
+        # Without the page-numbered fields, unless they must be rendered with the content.
+        section_options = pdf_options if rerender else {
+            key: value for key, value in pdf_options.items() if key not in numbered_fields}
+        first_options = dict(section_options)
+        if toc or outline:
+            # The dumped outline is only reliable with the outline enabled.
+            first_options.pop('no-outline', None)
+            first_options['outline'] = None
+
+        with tempfile.TemporaryDirectory(prefix="md2pdf_sections_", dir=work_dir) as work_dir, \
+                ThreadPoolExecutor(max_workers=int(options["parallel_sections"])) as pool:
+            def write_html(name, page):
+                html_path = os.path.join(work_dir, f"{name}.html")
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(page)
+                return html_path
+
+            html_paths = [write_html(f"section{index:05d}", page) for index, page in enumerate(pages)]
+
+            def render(index, section_options, suffix):
+                pdf_path = os.path.join(work_dir, f"section{index:05d}{suffix}.pdf")
+                section_options = dict(section_options)
+                if (toc or outline) and suffix == "":
+                    section_options['dump-outline'] = os.path.join(work_dir, f"section{index:05d}.xml")
+                pdfkit.from_file(html_paths[index], pdf_path, configuration=config, options=section_options)
+                return pdf_path
+
+            pdf_paths = list(pool.map(lambda index: render(index, first_options, ""), range(len(pages))))
+            counts = [len(PdfReader(pdf_path).pages) for pdf_path in pdf_paths]
+            starts = [sum(counts[:index]) for index in range(len(counts))]
+
+            headings = []
+            if toc or outline:
+                for index, start in enumerate(starts):
+                    for level, title, page in _outline_headings(os.path.join(work_dir, f"section{index:05d}.xml")):
+                        headings.append((level, title, start + page))
+
+            toc_path, toc_pages = None, 0
+            if toc:
+                toc_html_path = os.path.join(work_dir, "toc.html")
+                toc_path = os.path.join(work_dir, "toc.pdf")
+                # The table's own length shifts every page number it lists;
+                # re-render until the assumed length is right.
+                toc_pages = 1
+                for _ in range(5):
+                    with open(toc_html_path, "w", encoding="utf-8") as f:
+                        f.write(sections_toc_page(headings, toc_pages))
+                    total = toc_pages + sum(counts)
+                    toc_options = numbered_pdf_options(pdf_options, 0, total) if rerender else section_options
+                    pdfkit.from_file(toc_html_path, toc_path, configuration=config, options=toc_options)
+                    rendered_pages = len(PdfReader(toc_path).pages)
+                    if rendered_pages == toc_pages:
+                        break
+                    toc_pages = rendered_pages
+                else:
+                    raise IOError("Could not build the table of contents: its length did not settle.")
+
+            total = toc_pages + sum(counts)
+            stamp_paths = []
+            if rerender:
+                final = {}
+                for index, start in enumerate(starts):
+                    numbered = numbered_pdf_options(pdf_options, toc_pages + start, total)
+                    if numbered != pdf_options:
+                        final[index] = pool.submit(render, index, numbered, "-numbered")
+                pdf_paths = [final[index].result() if index in final else pdf_path
+                             for index, pdf_path in enumerate(pdf_paths)]
+            elif numbered_fields:
+                # One run of blank pages per part, numbered like that part's pages. They
+                # carry only the numbered fields; the sections already show the others.
+                stamp_options = {key: value for key, value in pdf_options.items()
+                                 if key in numbered_fields or key not in STAMPED_OPTIONS}
+                ranges = ([(0, toc_pages)] if toc_path else []) + [
+                    (toc_pages + start, count) for start, count in zip(starts, counts)]
+
+                def render_stamp(index, offset, count):
+                    stamp_path = os.path.join(work_dir, f"stamp{index:05d}.pdf")
+                    pdfkit.from_file(write_html(f"stamp{index:05d}", blank_pages_html(count)), stamp_path,
+                                     configuration=config,
+                                     options=numbered_pdf_options(stamp_options, offset, total))
+                    if len(PdfReader(stamp_path).pages) != count:
+                        raise IOError("Could not number the merged PDF: the header/footer pages came out "
+                                      "at the wrong length.")
+                    return stamp_path
+
+                stamp_paths = list(pool.map(lambda args: render_stamp(*args),
+                                            [(index, offset, count) for index, (offset, count) in enumerate(ranges)]))
+
+            writer = PdfWriter()
+            for pdf_path in ([toc_path] if toc_path else []) + pdf_paths:
+                writer.append(pdf_path, import_outline=False)
+            pages_out = iter(writer.pages)
+            for stamp_path in stamp_paths:
+                for stamp_page in PdfReader(stamp_path).pages:
+                    next(pages_out).merge_page(stamp_page, over=False)
+            if toc_path:
+                _link_toc_entries(writer, toc_pages, [toc_pages + page for _, _, page in headings])
+            if outline:
+                parents = []
+                for level, title, page in headings:
+                    del parents[level - 1:]
+                    parents.append(writer.add_outline_item(title, toc_pages + page,
+                                                           parent=parents[-1] if parents else None))
+            # Written next to the output, then renamed over it, so a failure
+            # never leaves a half-written PDF behind.
+            fd, temp_path = tempfile.mkstemp(prefix="temp_output_", suffix=".pdf",
+                                             dir=os.path.dirname(os.path.abspath(output_path)))
+            os.close(fd)
+            try:
+                # Reopened rather than written through ``fd``, so the PDF gets the
+                # usual file mode instead of mkstemp's owner-only one.
+                os.remove(temp_path)
+                with open(temp_path, "wb") as f:
+                    writer.write(f)
+                os.replace(temp_path, output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def convert_markdown_book(self, documents, output_path, options):
+        """Render several documents into one combined PDF with a single wkhtmltopdf run.
+
+        ``documents`` is a list of (md_text, base_dir, title) tuples. Each document
+        starts on a new page and appears as a top-level outline entry; page numbers
+        and the optional table of contents span the whole book. Returns True if
+        the PDF came from the PDF cache.
+        """
+        import pdfkit
+        pages = [self.build_html_document(md_text, options, base_dir, title)
+                 for md_text, base_dir, title in documents]
+        config = find_wkhtmltopdf_configuration(options["wkhtmltopdf_path"])
+        pdf_options = self.build_pdf_options(options)
+        pdf_options.pop('no-outline', None)
+        pdf_options['outline'] = None
+        hit, key = self.fetch_cached_pdf(options, pages, pdf_options, options["generate_toc"], config, output_path)
+        if hit:
+            return True
+
+        with tempfile.TemporaryDirectory(prefix="md2pdf_book_") as work_dir:
+            html_paths = []
+            for index, page in enumerate(pages):
+                html_path = os.path.join(work_dir, f"doc{index:05d}.html")
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(page)
+                html_paths.append(html_path)
+
+            pdfkit.from_file(html_paths, output_path, configuration=config, options=pdf_options,
+                             toc=WKHTMLTOPDF_TOC if options["generate_toc"] else None)
+        self.store_cached_pdf(options, key, output_path)
+        return False
+
+    def convert_markdown_group(self, documents, options):
+        """Convert several small documents with one wkhtmltopdf run, then split the result.
+
+        Amortizes wkhtmltopdf's start-up cost. ``documents`` is a list of
+        (md_text, output_path, base_dir) tuples. Header/footer page fields are
+        rewritten to wkhtmltopdf's per-document [sitepage]/[sitepages] so every
+        split PDF is numbered from 1. Needs the optional ``pypdf`` package and
+        cannot be combined with the table of contents (see group_conversion_blocker).
+        Documents found in the PDF cache are left out of the run. Returns one
+        flag per document, True if its PDF came from the cache.
+        """
+        import pdfkit
+        blocker = group_conversion_blocker(options)
+        if blocker:
+            raise ValueError(f"Cannot convert documents as a group: {blocker}.")
+        from pypdf import PdfReader, PdfWriter
+
+        config = find_wkhtmltopdf_configuration(options["wkhtmltopdf_path"])
+        pdf_options = self.build_pdf_options(options)
+        for key in HEADER_FOOTER_OPTIONS:
+            if key in pdf_options:
+                pdf_options[key] = pdf_options[key].replace('[topage]', '[sitepages]').replace('[page]', '[sitepage]')
+        # The dumped outline is only reliable with the outline enabled.
+        pdf_options.pop('no-outline', None)
+        pdf_options['outline'] = None
+
+        hits = []
+        pending = []
+        for md_text, output_path, base_dir in documents:
+            stylesheet, html_body = self.render_html_parts(md_text, options, base_dir)
+            # Keyed without the title, which only depends on the position in the group.
+            hit, cache_key = self.fetch_cached_pdf(options, [html_page(stylesheet, html_body)], pdf_options,
+                                                   False, config, output_path)
+            hits.append(hit)
+            if not hit:
+                pending.append((stylesheet, html_body, output_path, cache_key))
+        if not pending:
+            return hits
+
+        with tempfile.TemporaryDirectory(prefix="md2pdf_group_") as work_dir:
+            html_paths = []
+            for index, (stylesheet, html_body, _, _) in enumerate(pending):
+                html_path = os.path.join(work_dir, f"doc{index:05d}.html")
+                with open(html_path, "w", encoding="utf-8") as f:
+                    # The title identifies the document in the dumped outline.
+                    f.write(html_page(stylesheet, html_body, title=f"md2pdf-doc-{index}"))
+                html_paths.append(html_path)
+
+            combined_path = os.path.join(work_dir, "combined.pdf")
+            outline_path = os.path.join(work_dir, "outline.xml")
+            pdf_options['dump-outline'] = outline_path
+            pdfkit.from_file(html_paths, combined_path, configuration=config, options=pdf_options)
+
+            reader = PdfReader(combined_path)
+            starts = _document_start_pages(outline_path, len(pending))
+            ends = starts[1:] + [len(reader.pages)]
+            if any(end <= start for start, end in zip(starts, ends)) or ends[-1] > len(reader.pages):
+                raise IOError("Could not split the combined PDF: unexpected document page ranges.")
+            for (_, _, output_path, cache_key), start, end in zip(pending, starts, ends):
+                writer = PdfWriter()
+                for page_index in range(start, end):
+                    writer.add_page(reader.pages[page_index])
+                with open(output_path, "wb") as f:
+                    writer.write(f)
+                self.store_cached_pdf(options, cache_key, output_path)
+        return hits
+
+
+def group_conversion_blocker(options):
+    """Return why ``options`` prevent grouped conversion, or None if grouping is safe."""
+    if options["generate_toc"]:
+        return "a table of contents would span every document in the group"
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return "splitting the combined PDF needs the 'pypdf' package (pip install pypdf)"
+    return None
+
+def sectioned_conversion_blocker(options):
+    """Return why ``options`` prevent sectioned conversion, or None if it can be used."""
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return "merging the sections needs the 'pypdf' package (pip install pypdf)"
+    return None
+
+# Sections are not made smaller than this many characters of HTML; below
+# that, starting another wkhtmltopdf costs more than it saves.
+SECTION_MIN_CHARS = 100_000
+
+HEADER_FOOTER_OPTIONS = ('header-left', 'header-center', 'header-right',
+                         'footer-left', 'footer-center', 'footer-right')
+# What the sections draw in the margins; blank stamp pages draw only their numbered fields.
+STAMPED_OPTIONS = HEADER_FOOTER_OPTIONS + ('header-line', 'footer-line')
+# Header/footer variables wkhtmltopdf fills with page numbers, and those it
+# fills from the headings on the page.
+PAGE_NUMBER_VARIABLES = ('[page]', '[frompage]', '[topage]', '[sitepage]', '[sitepages]')
+HEADING_VARIABLES = ('[section]', '[subsection]', '[subsubsection]')
+
+def numbered_pdf_options(pdf_options, offset, total):
+    """Return ``pdf_options`` for a part of a ``total``-page document that starts after ``offset`` pages.
+
+    [topage], [sitepages] and [frompage] in the header and footer become
+    fixed numbers, and [page] and [sitepage] (the document is a single input,
+    so they are the same) are shifted with --page-offset. Options without page
+    fields come back unchanged, since the part renders the same either way.
+    """
+    numbered = dict(pdf_options)
+    uses_page = False
+    for key in HEADER_FOOTER_OPTIONS:
+        if key in numbered:
+            value = numbered[key].replace('[sitepage]', '[page]')
+            uses_page = uses_page or '[page]' in value
+            numbered[key] = (value.replace('[topage]', str(total)).replace('[sitepages]', str(total))
+                             .replace('[frompage]', '1'))
+    if uses_page and offset:
+        numbered['page-offset'] = str(offset)
+    return numbered
+
+def blank_pages_html(count):
+    """An HTML page that wkhtmltopdf renders as ``count`` empty pages, to carry a header and footer."""
+    pages = '<div style="page-break-before: always">&nbsp;</div>' * (count - 1)
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"></head>
+<body><div>&nbsp;</div>{pages}</body>
+</html>
+"""
+
+def _outline_headings(outline_path):
+    """Read (level, title, 0-based page) for each heading in a single-document --dump-outline XML."""
+    document = next(iter(ET.parse(outline_path).getroot()), None)
+    if document is None:
+        return []
+    first = int(document.get('page'))
+    headings = []
+
+    def walk(items, level):
+        for item in items:
+            headings.append((level, item.get('title', ''), int(item.get('page')) - first))
+            walk(item, level + 1)
+
+    walk(document, 1)
+    return headings
+
+# Close to wkhtmltopdf's default table of contents stylesheet.
+SECTIONS_TOC_CSS = """
+h1 { text-align: center; font-size: 20px; font-family: arial; }
+div { border-bottom: 1px dashed rgb(200,200,200); font-family: arial; }
+a { display: block; color: inherit; text-decoration: none; }
+div.level-1 { font-size: 20px; }
+div.level-2 { font-size: 16px; padding-left: 1em; }
+div.level-3 { font-size: 12.8px; padding-left: 2em; }
+div.level-4 { font-size: 10.24px; padding-left: 3em; }
+span { float: right; }
+"""
+
+# wkhtmltopdf keeps links to web addresses as PDF link annotations; the table
+# of contents links its entries to these, and _link_toc_entries points them at
+# the pages the entries list once the sections are merged.
+SECTIONS_TOC_LINK = "https://md2pdf.invalid/toc/"
+
+def sections_toc_page(headings, toc_pages):
+    """The table of contents page for sectioned conversion; ``toc_pages`` is its own length."""
+    entries = "\n".join(
+        f'<div class="level-{min(level, 4)}"><a href="{SECTIONS_TOC_LINK}{index}">'
+        f'<span>{toc_pages + page + 1}</span>{html.escape(title)}</a></div>'
+        for index, (level, title, page) in enumerate(headings))
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>{SECTIONS_TOC_CSS}</style>
+</head>
+<body>
+<h1>Table of Contents</h1>
+{entries}
+</body>
+</html>
+"""
+
+def _link_toc_entries(writer, toc_pages, targets):
+    """Turn the table of contents links in the first ``toc_pages`` pages of ``writer`` into links to ``targets``.
+
+    ``targets`` holds the 0-based page index of each entry.
+    """
+    from pypdf.generic import ArrayObject, DictionaryObject, NameObject, NullObject
+
+    for page in writer.pages[:toc_pages]:
+        for annotation in page.get("/Annots", []):
+            annotation = annotation.get_object()
+            action = annotation.get("/A")
+            uri = str(action.get_object().get("/URI", "")) if action is not None else ""
+            if not uri.startswith(SECTIONS_TOC_LINK):
+                continue
+            index = int(uri[len(SECTIONS_TOC_LINK):])
+            if index >= len(targets):
+                continue
+            destination = ArrayObject([writer.pages[targets[index]].indirect_reference, NameObject("/XYZ"),
+                                       NullObject(), NullObject(), NullObject()])
+            annotation[NameObject("/A")] = DictionaryObject({NameObject("/S"): NameObject("/GoTo"),
+                                                             NameObject("/D"): destination})
+
+def _document_start_pages(outline_path, count):
+    """Read the 0-based first page of each grouped document from wkhtmltopdf's --dump-outline XML.
+
+    Every input page is a top-level outline item titled "md2pdf-doc-<index>".
+    """
+    root = ET.parse(outline_path).getroot()
+    pages = {}
+    for item in root:
+        match = re.fullmatch(r'md2pdf-doc-(\d+)', item.get('title', ''))
+        if match:
+            pages[int(match.group(1))] = int(item.get('page'))
+    if sorted(pages) != list(range(count)):
+        raise IOError("Could not split the combined PDF: documents missing from the wkhtmltopdf outline.")
+    first = pages[0]
+    return [pages[index] - first for index in range(count)]
+
+class PreviewRenderer:
+    """Runs preview renders on one background thread, newest request wins.
+
+    ``submit`` only stores the request, so a burst of edits collapses into a
+    single pending render, and bumps the generation so a render already in
+    progress stops at its next pipeline stage. ``deliver(generation, preview,
+    error, timings)`` is called on the render thread with the result of
+    ConversionPipeline.build_preview and its StageTimings; the receiver should
+    hop back to the UI thread and drop results for which ``is_current`` is False.
+    """
+
+    def __init__(self, pipeline, deliver):
+        self.pipeline = pipeline
+        self.deliver = deliver
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="preview-renderer", daemon=True)
+        self._thread.start()
+
+    def submit(self, md_text, options, base_dir=None):
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, md_text, options, base_dir)
+            self._condition.notify()
+
+    def cancel(self):
+        """Abandon the pending and in-progress renders, e.g. because newer text is on its way."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._generation += 1
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                generation, md_text, options, base_dir = self._pending
+                self._pending = None
+            try:
+                with StageTimings("preview", options["trace_log"]) as timings:
+                    preview = self.pipeline.build_preview(
+                        md_text, options, base_dir, cancelled=lambda: not self.is_current(generation))
+            except RenderCancelled:
+                continue
+            except Exception as e:
+                if self.is_current(generation):
+                    self.deliver(generation, None, e, timings)
+                continue
+            if self.is_current(generation):
+                self.deliver(generation, preview, None, timings)
+
+class PreviewPacer:
+    """Picks how long the preview waits after an edit, from what recent renders cost.
+
+    Render cost is tracked per character (a moving average over recent
+    renders), so a much larger document is accounted for before its first
+    render. Three limits set the wait, in units of the expected render time:
+
+    - the debounce: DEBOUNCE_FACTOR after the latest edit, so a burst of
+      typing is rendered once;
+    - the max-wait: at most MAX_WAIT_FACTOR (and the caller's ceiling) after
+      the first edit not yet rendered, so continuous typing still gets a
+      preview;
+    - the minimum interval: at least INTERVAL_FACTOR after the previous render
+      ended, which leaves the UI at least half of the time while typing into
+      a document that is slow to render. It wins over the other two.
+
+    Call ``render_started`` when a render is handed the text.
+    """
+
+    MIN_DELAY_MS = 30
+    # Used until the first render has been measured.
+    INITIAL_DELAY_MS = 150
+    DEBOUNCE_FACTOR = 1.5
+    MAX_WAIT_FACTOR = 3.0
+    INTERVAL_FACTOR = 1.0
+    # Weight of the newest render in the moving average.
+    SMOOTHING = 0.3
+    # Documents shorter than this are costed as if they had this many characters.
+    MIN_CHARS = 1000
+
+    def __init__(self):
+        self.ms_per_char = None
+        self.last_render_end = None
+        # When the wait for the first edit not yet rendered began.
+        self.waiting_since = None
+
+    def record(self, seconds, chars):
+        """Add a finished render of a ``chars``-character document that took ``seconds``."""
+        ms_per_char = seconds * 1000 / max(chars, self.MIN_CHARS)
+        if self.ms_per_char is None:
+            self.ms_per_char = ms_per_char
+        else:
+            self.ms_per_char += self.SMOOTHING * (ms_per_char - self.ms_per_char)
+        self.last_render_end = time.monotonic()
+
+    def render_started(self):
+        self.waiting_since = None
+
+    def expected_ms(self, chars):
+        """The expected render time of a ``chars``-character document, or None before any render."""
+        if self.ms_per_char is None:
+            return None
+        return self.ms_per_char * max(chars, self.MIN_CHARS)
+
+    def delay_ms(self, chars, max_delay_ms):
+        """Milliseconds from now to wait before rendering a ``chars``-character document."""
+        now = time.monotonic()
+        if self.waiting_since is None:
+            self.waiting_since = now
+        waited = (now - self.waiting_since) * 1000
+        expected = self.expected_ms(chars)
+        if expected is None:
+            return round(max(min(self.INITIAL_DELAY_MS, max_delay_ms - waited), self.MIN_DELAY_MS))
+        delay = min(self.DEBOUNCE_FACTOR * expected, min(self.MAX_WAIT_FACTOR * expected, max_delay_ms) - waited)
+        if self.last_render_end is not None:
+            since_render = (now - self.last_render_end) * 1000
+            delay = max(delay, self.INTERVAL_FACTOR * expected - since_render)
+        return round(max(delay, self.MIN_DELAY_MS))
+
+class TextFileReader:
+    """Reads a text file in chunks, decoding it and normalizing line endings as it goes.
+
+    The encoding is taken from the byte order mark if there is one (UTF-8,
+    UTF-16 or UTF-32). Otherwise the file is read as UTF-8, or as
+    FALLBACK_ENCODING if its first chunk is not valid UTF-8. Bytes that do not
+    decode are replaced. CRLF and CR line endings become LF, also where a CRLF
+    is split between two chunks. The file is opened, and its encoding
+    detected, when the reader is created, so a file that cannot be read fails
+    there; ``chunks`` closes it.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    FALLBACK_ENCODING = "cp1252"
+    # The UTF-32 LE mark starts with the UTF-16 LE one, so it is tried first.
+    BOMS = ((codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"), (codecs.BOM_UTF8, "utf-8"),
+            (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        self._head = self._file.read(chunk_size)
+        self.encoding, bom_length = self.detect_encoding(self._head)
+        self._head = self._head[bom_length:]
+        # Bytes read so far, for progress reports.
+        self.position = self._file.tell()
+
+    @classmethod
+    def detect_encoding(cls, head):
+        """Return the encoding of a file starting with ``head`` and the length of its byte order mark."""
+        for bom, encoding in cls.BOMS:
+            if head.startswith(bom):
+                return encoding, len(bom)
+        try:
+            # Not final: a character cut off at the end of ``head`` is fine.
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+        except UnicodeDecodeError:
+            return cls.FALLBACK_ENCODING, 0
+        return "utf-8", 0
+
+    def chunks(self):
+        """Yield the file's text a chunk at a time."""
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(self.encoding)(errors="replace"),
+                                               translate=True)
+        with self._file:
+            data = self._head
+            while data:
+                text = decoder.decode(data)
+                if text:
+                    yield text
+                data = self._file.read(self.chunk_size)
+                self.position = self._file.tell()
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+
+def job_workspace_root():
+    """A RAM-backed (tmpfs) directory for job workspaces if the system has one, else None for the default."""
+    for candidate in ("/dev/shm", os.environ.get("XDG_RUNTIME_DIR")):
+        if candidate and os.path.isdir(candidate) and os.access(candidate, os.W_OK | os.X_OK):
+            return candidate
+    return None
+
+class ConversionJob:
+    """One queued GUI conversion, as shown in the job list."""
+
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+    def __init__(self, job_id, output_path):
+        self.id = job_id
+        self.output_path = output_path
+        self.state = self.QUEUED
+        self.error = None
+        self.cached = False
+        self.seconds = None
+        self.timings = None
+
+    @property
+    def finished(self):
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+class ConversionQueue:
+    """Runs GUI conversions on ``workers`` background threads, oldest job first.
+
+    Every job converts its own snapshot of the text and options in a private
+    temp workspace (on tmpfs where available), which is deleted afterwards.
+    Jobs that write the same output path run one after the other.
+    ``notify(job)`` is called on a worker thread whenever a job changes
+    state; the receiver should hop back to the UI thread.
+    """
+
+    def __init__(self, pipeline, workers, notify):
+        self.pipeline = pipeline
+        self.notify = notify
+        self.jobs = []
+        self._condition = threading.Condition()
+        self._pending = collections.deque()
+        # Normalized output paths of the running jobs.
+        self._writing = set()
+        self._next_id = 0
+        self._closed = False
+        self._workspace_root = job_workspace_root()
+        for index in range(max(1, int(workers))):
+            threading.Thread(target=self._run, name=f"pdf-converter-{index}", daemon=True).start()
+
+    def submit(self, md_text, output_path, options, base_dir=None):
+        with self._condition:
+            self._next_id += 1
+            job = ConversionJob(self._next_id, output_path)
+            self.jobs.append(job)
+            self._pending.append((job, md_text, options, base_dir))
+            self._condition.notify()
+        self.notify(job)
+        return job
+
+    def cancel(self, job):
+        """Drop ``job`` if it has not started yet. Returns False if it is already running or finished."""
+        with self._condition:
+            if job.state != ConversionJob.QUEUED:
+                return False
+            self._pending = collections.deque(entry for entry in self._pending if entry[0] is not job)
+            job.state = ConversionJob.CANCELLED
+        self.notify(job)
+        return True
+
+    def clear_finished(self):
+        with self._condition:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def active(self):
+        """The number of queued and running jobs."""
+        with self._condition:
+            return sum(1 for job in self.jobs if not job.finished)
+
+    def close(self):
+        """Stop taking jobs. Queued jobs are dropped; running ones end with the process."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _next(self):
+        """Take the oldest pending job whose output path is not being written."""
+        for entry in self._pending:
+            key = os.path.normcase(os.path.abspath(entry[0].output_path))
+            if key not in self._writing:
+                self._pending.remove(entry)
+                self._writing.add(key)
+                return entry, key
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                entry, key = self._next()
+                while entry is None and not self._closed:
+                    self._condition.wait()
+                    entry, key = self._next()
+                if self._closed:
+                    return
+                job, md_text, options, base_dir = entry
+                job.state = ConversionJob.RUNNING
+            self.notify(job)
+            start = time.perf_counter()
+            work_dir = tempfile.mkdtemp(prefix="md2pdf_job_", dir=self._workspace_root)
+            job.timings = StageTimings("convert", options["trace_log"])
+            try:
+                with job.timings:
+                    job.cached = self.pipeline.convert_markdown_to_pdf(md_text, job.output_path, options, base_dir,
+                                                                       work_dir=work_dir)
+                job.state = ConversionJob.DONE
+            except Exception as e:
+                job.error = str(e)
+                job.state = ConversionJob.FAILED
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                job.seconds = time.perf_counter() - start
+                job.timings.log()
+                with self._condition:
+                    self._writing.discard(key)
+                    # A job for the same output path may be waiting for this one.
+                    self._condition.notify_all()
+            self.notify(job)
+
+# --- Headless batch conversion: python -m markdown_converter_app convert ... ---
+
+# The pipeline owned by each batch worker process, built once by _init_batch_worker.
+_batch_pipeline = None
+
+def _init_batch_worker(themes_dir):
+    global _batch_pipeline
+    _batch_pipeline = ConversionPipeline(themes_dir=themes_dir)
+    if not _batch_pipeline.emoji_mapping:
+        print("Warning: Could not load 'assets/emoji_mapping.json'. Emoji-to-SVG replacement will be disabled.",
+              file=sys.stderr)
+
+def _convert_batch_file(input_path, output_path, options):
+    """Convert one file inside a worker and report the outcome as a plain dict."""
+    start = time.perf_counter()
+    probe_before = wkhtmltopdf_probe_seconds()
+    result = {"input": input_path, "output": output_path}
+    timings = StageTimings("convert", options["trace_log"])
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            md_text = f.read()
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with timings:
+            hit = _batch_pipeline.convert_markdown_to_pdf(md_text, output_path, options,
+                                                          base_dir=os.path.dirname(input_path))
+        result["status"] = "ok"
+        if options["pdf_cache"]:
+            result["cache"] = "hit" if hit else "miss"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    result["stages"] = {stage: round(seconds, 4) for stage, seconds in timings.stages.items()}
+    timings.log()
+    # Only the first file per worker should pay for locating wkhtmltopdf.
+    result["wkhtmltopdf_probe_seconds"] = round(wkhtmltopdf_probe_seconds() - probe_before, 4)
+    return result
+
+def _convert_batch_group(pairs, options):
+    """Convert several files with one wkhtmltopdf run inside a worker.
+
+    Falls back to converting each file on its own if the grouped run fails, so
+    one bad document cannot fail its neighbours. Every result carries its share
+    of the group's time plus the group's wall time.
+    """
+    if len(pairs) == 1:
+        return [_convert_batch_file(*pairs[0], options)]
+    start = time.perf_counter()
+    probe_before = wkhtmltopdf_probe_seconds()
+    try:
+        documents = []
+        for input_path, output_path in pairs:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                md_text = f.read()
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            documents.append((md_text, output_path, os.path.dirname(input_path)))
+        hits = _batch_pipeline.convert_markdown_group(documents, options)
+    except Exception as e:
+        print(f"Warning: grouped conversion of {len(pairs)} files failed ({type(e).__name__}: {e}); "
+              "converting them one by one.", file=sys.stderr)
+        return [_convert_batch_file(input_path, output_path, options) for input_path, output_path in pairs]
+
+    group_seconds = round(time.perf_counter() - start, 4)
+    probe_seconds = round(wkhtmltopdf_probe_seconds() - probe_before, 4)
+    results = []
+    for index, ((input_path, output_path), hit) in enumerate(zip(pairs, hits)):
+        result = {
+            "input": input_path,
+            "output": output_path,
+            "status": "ok",
+            "seconds": round(group_seconds / len(pairs), 4),
+            "group": len(pairs),
+            "group_seconds": group_seconds,
+            "wkhtmltopdf_probe_seconds": probe_seconds if index == 0 else 0.0,
+        }
+        if options["pdf_cache"]:
+            result["cache"] = "hit" if hit else "miss"
+        results.append(result)
+    return results
+
+def collect_batch_inputs(sources, output_dir, pattern="*.md"):
+    """Expand files, globs and directories into (input, output) path pairs.
+
+    Files found under a directory keep their relative layout below ``output_dir``;
+    files given directly or through a glob are written to ``output_dir`` itself.
+    """
+    pairs = {}
+
+    def add(input_path, relative_path):
+        input_path = os.path.abspath(input_path)
+        output_path = os.path.join(os.path.abspath(output_dir), os.path.splitext(relative_path)[0] + '.pdf')
+        pairs.setdefault(input_path, output_path)
+
+    for source in sources:
+        if os.path.isdir(source):
+            for input_path in sorted(glob.glob(os.path.join(source, '**', pattern), recursive=True)):
+                if os.path.isfile(input_path):
+                    add(input_path, os.path.relpath(input_path, source))
+        elif os.path.isfile(source):
+            add(source, os.path.basename(source))
+        else:
+            matches = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+            if not matches:
+                raise ValueError(f"No input files match '{source}'.")
+            for input_path in matches:
+                add(input_path, os.path.basename(input_path))
+
+    # Two inputs with the same name would silently overwrite each other's PDF.
+    seen = {}
+    for input_path, output_path in pairs.items():
+        key = os.path.normcase(output_path)
+        if key in seen:
+            raise ValueError(f"'{seen[key]}' and '{input_path}' would both be written to '{output_path}'.")
+        seen[key] = input_path
+    return list(pairs.items())
+
+def run_batch(pairs, options, jobs=None, themes_dir=THEMES_DIR, progress=None, group_size=1):
+    """Convert ``pairs`` of (input, output) paths on a pool of ``jobs`` processes.
+
+    With ``group_size`` > 1, up to that many files share one wkhtmltopdf run
+    (see ConversionPipeline.convert_markdown_group). ``progress`` is called with
+    each file's result as it finishes. Returns a JSON-serializable summary with
+    per-file timings and errors.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    group_size = max(1, group_size or 1)
+    if group_size > 1:
+        blocker = group_conversion_blocker(options)
+        if blocker:
+            print(f"Warning: converting files one by one; {blocker}.", file=sys.stderr)
+            group_size = 1
+    groups = [pairs[i:i + group_size] for i in range(0, len(pairs), group_size)]
+    setup_themes(themes_dir)
+    start = time.perf_counter()
+    results = []
+
+    def collect(group_results):
+        for result in group_results:
+            results.append(result)
+            if progress:
+                progress(result)
+
+    if jobs == 1:
+        _init_batch_worker(themes_dir)
+        for group in groups:
+            collect(_convert_batch_group(group, options))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker, initargs=(themes_dir,)) as pool:
+            futures = [pool.submit(_convert_batch_group, group, options) for group in groups]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    order = {input_path: index for index, (input_path, _) in enumerate(pairs)}
+    results.sort(key=lambda result: order[result["input"]])
+    summary = {
+        "jobs": jobs,
+        "group_size": group_size,
+        "total": len(results),
+        "succeeded": sum(1 for result in results if result["status"] == "ok"),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "wall_seconds": round(time.perf_counter() - start, 4),
+        "wkhtmltopdf_probe_seconds": round(sum(result["wkhtmltopdf_probe_seconds"] for result in results), 4),
+    }
+    if options["pdf_cache"]:
+        summary["pdf_cache"] = pdf_cache_summary(results)
+    summary["files"] = results
+    return summary
+
+def pdf_cache_summary(results):
+    """Count the PDF cache hits and misses among batch results."""
+    hits = sum(1 for result in results if result.get("cache") == "hit")
+    misses = sum(1 for result in results if result.get("cache") == "miss")
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0}
+
+def run_book(pairs, output_path, options, themes_dir=THEMES_DIR):
+    """Combine the inputs of ``pairs`` into a single PDF at ``output_path`` with one wkhtmltopdf run.
+
+    Each file becomes a chapter titled after its file name. Returns a
+    JSON-serializable summary in the same shape as run_batch.
+    """
+    setup_themes(themes_dir)
+    start = time.perf_counter()
+    result = {"input": [input_path for input_path, _ in pairs], "output": os.path.abspath(output_path)}
+    try:
+        pipeline = ConversionPipeline(themes_dir=themes_dir)
+        documents = []
+        for input_path, _ in pairs:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                documents.append((f.read(), os.path.dirname(input_path),
+                                  os.path.splitext(os.path.basename(input_path))[0]))
+        os.makedirs(os.path.dirname(result["output"]), exist_ok=True)
+        hit = pipeline.convert_markdown_book(documents, result["output"], options)
+        result["status"] = "ok"
+        if options["pdf_cache"]:
+            result["cache"] = "hit" if hit else "miss"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    result["wkhtmltopdf_probe_seconds"] = round(wkhtmltopdf_probe_seconds(), 4)
+    summary = {
+        "jobs": 1,
+        "total": 1,
+        "succeeded": 1 if result["status"] == "ok" else 0,
+        "failed": 0 if result["status"] == "ok" else 1,
+        "wall_seconds": result["seconds"],
+        "wkhtmltopdf_probe_seconds": result["wkhtmltopdf_probe_seconds"],
+    }
+    if options["pdf_cache"]:
+        summary["pdf_cache"] = pdf_cache_summary([result])
+    summary["files"] = [result]
+    return summary
+
+def _parse_option_override(text):
+    """Parse a KEY=VALUE override; values are read as JSON when possible (true, 0.5, ...)."""
+    key, sep, raw_value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got '{text}'")
+    try:
+        value = json.loads(raw_value)
+    except json.JSONDecodeError:
+        value = raw_value
+    return key.strip(), value
+
+def cli_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m markdown_converter_app convert",
+        description="Convert Markdown files to PDF without the GUI.")
+    parser.add_argument('inputs', nargs='+', help="Markdown files, glob patterns or directories")
+    parser.add_argument('-o', '--output-dir', help="where to write PDFs (default: output_folder from the config)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes (default: CPU count; 1 converts in-process)")
+    parser.add_argument('--config', default=CONFIG_PATH, help="options file (default: %(default)s)")
+    parser.add_argument('--themes-dir', default=THEMES_DIR, help="theme CSS directory (default: %(default)s)")
+    parser.add_argument('--option', dest='overrides', action='append', default=[], type=_parse_option_override,
+                        metavar='KEY=VALUE',
+                        help="override a config option, e.g. generate_toc=false or extensions.meta=true")
+    parser.add_argument('--profile', choices=list(RENDER_PROFILES),
+                        help="render quality profile, applied before any --option (default: from the config)")
+    parser.add_argument('--pattern', default='*.md', help="file pattern used inside directories (default: %(default)s)")
+    parser.add_argument('--summary', metavar='PATH', help="write the JSON summary here instead of stdout")
+    parser.add_argument('--group-size', type=int, default=1, metavar='N',
+                        help="convert up to N files per wkhtmltopdf run to amortize its start-up "
+                             "(needs pypdf; default: %(default)s)")
+    parser.add_argument('--book', metavar='PATH',
+                        help="combine all inputs into this single PDF instead of one PDF per file")
+    args = parser.parse_args(argv)
+
+    options = load_options(args.config)
+    if args.profile:
+        options = apply_render_profile(options, args.profile)
+    for key, value in args.overrides:
+        if key == "render_profile":
+            try:
+                options = apply_render_profile(options, value)
+            except ValueError as e:
+                parser.error(str(e))
+        elif key.startswith('extensions.'):
+            options["extensions"][key.split('.', 1)[1]] = value
+        elif key in DEFAULT_OPTIONS:
+            options[key] = value
+        else:
+            parser.error(f"unknown option '{key}'")
+
+    try:
+        pairs = collect_batch_inputs(args.inputs, args.output_dir or options["output_folder"], args.pattern)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progress(result):
+        line = f"[{result['status']}] {result['input']} ({result['seconds']:.2f}s"
+        line += ", cached)" if result.get("cache") == "hit" else ")"
+        if result["status"] != "ok":
+            line += f": {result['error']}"
+        print(line, file=sys.stderr)
+
+    if args.book:
+        summary = run_book(pairs, args.book, options, args.themes_dir)
+        progress({**summary["files"][0], "input": args.book})
+    else:
+        summary = run_batch(pairs, options, args.jobs, args.themes_dir, progress, args.group_size)
+    summary_json = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(summary_json)
+    else:
+        print(summary_json)
+    return 1 if summary["failed"] else 0
@@ -0,0 +1,1194 @@
+"""The Tk desktop app: editor, live preview and conversion queue.
+
+The conversion itself is done by markdown_converter_core.
+"""
+# PRE-REQUISITES:
+# pip install tkinterweb tkinterdnd2 markdown pdfkit
+import os
+import re
+import json
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from tkinter.scrolledtext import ScrolledText
+from tkwebview2.tkwebview2 import WebView2 # Using a modern WebView2-based renderer instead of tkinterweb
+from tkinterdnd2 import DND_FILES, TkinterDnD
+import bisect
+import hashlib
+import itertools
+import queue
+import threading
+import time
+
+from markdown_converter_core import (
+    CONFIG_PATH, DEFAULT_OPTIONS, RENDER_PROFILES, THEMES_DIR, ConversionJob, ConversionPipeline, ConversionQueue,
+    PreviewPacer, PreviewRenderer, TextFileReader, load_mapping_from_file, options_from_config, preview_options_key,
+    setup_themes,
+)
+
+# The preview page. Its body is filled and later patched by md2pdfPatch, which
+# keeps the DOM nodes of every fragment that did not change. For large documents
+# md2pdfPatch is given a view, and only the fragments near view.focus and near
+# the visible part of the page are turned into DOM nodes; the others are empty
+# placeholders of about their height, filled in once they scroll close to view.
+PREVIEW_SHELL = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style id="md2pdf-theme"></style>
+    <style id="md2pdf-tables"></style>
+    <style id="md2pdf-page"></style>
+    <script>
+    window.md2pdfBlocks = new Map();
+    // Set by the first md2pdfPatch that is given a view; the page is reloaded to leave that mode.
+    window.md2pdfVirtual = null;
+
+    function md2pdfNodes(html) {
+        const template = document.createElement("template");
+        template.innerHTML = html;
+        return Array.from(template.content.childNodes);
+    }
+
+    function md2pdfRect(nodes) {
+        const range = document.createRange();
+        range.setStartBefore(nodes[0]);
+        range.setEndAfter(nodes[nodes.length - 1]);
+        return range.getBoundingClientRect();
+    }
+
+    function md2pdfVirtualState(view) {
+        const state = {
+            html: new Map(),      // key: html of every fragment
+            heights: new Map(),   // key: measured height in px
+            live: new Set(),      // keys whose nodes are in the page
+            order: new Map(),     // key: position in the document
+            owner: new WeakMap(), // node: key
+            pxPerChar: 0.25,      // placeholder height per character of html, from measured fragments
+            window: view.window,
+            maxLive: view.maxLive,
+        };
+        state.observer = new IntersectionObserver(entries => {
+            const shown = entries.filter(entry => entry.isIntersecting).map(entry => entry.target.dataset.key);
+            shown.forEach(md2pdfMaterialize);
+            if (shown.length) {
+                md2pdfTrim(state.order.get(md2pdfCentre()) ?? 0);
+            }
+        }, {rootMargin: "100%% 0px"});
+        return state;
+    }
+
+    function md2pdfPlaceholder(key) {
+        const state = window.md2pdfVirtual;
+        const html = state.html.get(key);
+        const div = document.createElement("div");
+        div.className = "md2pdf-placeholder";
+        div.dataset.key = key;
+        div.style.height = (state.heights.get(key) ?? Math.max(16, html.length * state.pxPerChar)) + "px";
+        state.owner.set(div, key);
+        state.observer.observe(div);
+        return [div];
+    }
+
+    function md2pdfReplace(key, nodes) {
+        const old = window.md2pdfBlocks.get(key);
+        old[0].before(...nodes);
+        old.forEach(node => node.remove());
+        window.md2pdfBlocks.set(key, nodes);
+    }
+
+    function md2pdfMaterialize(key) {
+        const state = window.md2pdfVirtual;
+        if (state.live.has(key) || !window.md2pdfBlocks.has(key)) {
+            return;
+        }
+        const [placeholder] = window.md2pdfBlocks.get(key);
+        state.observer.unobserve(placeholder);
+        const nodes = md2pdfNodes(state.html.get(key));
+        nodes.forEach(node => state.owner.set(node, key));
+        // An empty fragment still needs a node to mark its place.
+        md2pdfReplace(key, nodes.length ? nodes : [document.createTextNode("")]);
+        state.live.add(key);
+    }
+
+    // The key of the fragment in the middle of the window, if it is one.
+    function md2pdfCentre() {
+        let node = document.elementFromPoint(window.innerWidth / 2, window.innerHeight / 2);
+        while (node && node.parentNode !== document.body) {
+            node = node.parentNode;
+        }
+        return node ? window.md2pdfVirtual.owner.get(node) : undefined;
+    }
+
+    // Turn the fragments farthest from position ``centre`` back into placeholders.
+    function md2pdfTrim(centre) {
+        const state = window.md2pdfVirtual;
+        if (state.live.size <= state.maxLive) {
+            return;
+        }
+        const far = Array.from(state.live)
+            .filter(key => !state.html.get(key).startsWith("<style"))
+            .sort((a, b) => Math.abs(state.order.get(b) - centre) - Math.abs(state.order.get(a) - centre));
+        for (const key of far.slice(0, state.live.size - state.maxLive)) {
+            state.heights.set(key, md2pdfRect(window.md2pdfBlocks.get(key)).height);
+            state.live.delete(key);
+            md2pdfReplace(key, md2pdfPlaceholder(key));
+        }
+    }
+
+    // Fill in the fragments around view.focus and scroll there if it is out of sight.
+    function md2pdfFocus(keys, view) {
+        const state = window.md2pdfVirtual;
+        const first = Math.max(0, view.focus - state.window);
+        keys.slice(first, view.focus + state.window + 1).forEach(md2pdfMaterialize);
+        // Fragments that only hold a stylesheet apply to the whole page.
+        keys.filter(key => state.html.get(key).startsWith("<style")).forEach(md2pdfMaterialize);
+        md2pdfTrim(view.focus);
+        requestAnimationFrame(() => {
+            let px = 0, chars = 0;
+            for (const key of state.live) {
+                const height = md2pdfRect(window.md2pdfBlocks.get(key)).height;
+                state.heights.set(key, height);
+                px += height;
+                chars += state.html.get(key).length;
+            }
+            if (px && chars) {
+                state.pxPerChar = px / chars;
+            }
+            const nodes = window.md2pdfBlocks.get(keys[view.focus]);
+            if (nodes) {
+                const top = md2pdfRect(nodes).top;
+                if (top < 0 || top > window.innerHeight) {
+                    window.scrollBy(0, top - window.innerHeight / 3);
+                }
+            }
+        });
+    }
+
+    // styles: {style element id: css}; keys: the fragment keys in document order;
+    // fragments: {key: html} for every key the page does not have yet;
+    // view: null, or {focus: index of the fragment to show, window: fragments to
+    // fill in on either side of it, maxLive: most fragments to keep filled in}.
+    window.md2pdfPatch = function (styles, keys, fragments, view) {
+        for (const id in styles) {
+            document.getElementById(id).textContent = styles[id];
+        }
+        const old = window.md2pdfBlocks;
+        if (keys.some(key => !old.has(key) && !(key in fragments))) {
+            return "resync";
+        }
+        if (view && !window.md2pdfVirtual) {
+            window.md2pdfVirtual = md2pdfVirtualState(view);
+        }
+        const state = window.md2pdfVirtual;
+        const next = new Map();
+        const body = document.body;
+        let cursor = body.firstChild;
+        for (const key of keys) {
+            let nodes = old.get(key);
+            if (nodes) {
+                old.delete(key);
+            } else if (state) {
+                state.html.set(key, fragments[key]);
+                nodes = md2pdfPlaceholder(key);
+            } else {
+                nodes = md2pdfNodes(fragments[key]);
+            }
+            next.set(key, nodes);
+            for (const node of nodes) {
+                if (node === cursor) {
+                    cursor = cursor.nextSibling;
+                } else {
+                    body.insertBefore(node, cursor);
+                }
+            }
+        }
+        for (const [key, nodes] of old) {
+            nodes.forEach(node => node.remove());
+            if (state) {
+                state.observer.unobserve(nodes[0]);
+                state.html.delete(key);
+                state.heights.delete(key);
+                state.live.delete(key);
+            }
+        }
+        window.md2pdfBlocks = next;
+        if (state) {
+            state.order = new Map(keys.map((key, index) => [key, index]));
+            md2pdfFocus(keys, view);
+        }
+        return "ok";
+    };
+    document.addEventListener("DOMContentLoaded", () => md2pdfPatch(%s));
+    </script>
+</head>
+<body></body>
+</html>
+"""
+
+def preview_fragment_keys(fragments):
+    """Key each fragment by its content; repeated fragments get distinct keys."""
+    seen = {}
+    keys = []
+    for fragment in fragments:
+        digest = hashlib.blake2b(fragment.encode('utf-8'), digest_size=8).hexdigest()
+        seen[digest] = seen.get(digest, 0) + 1
+        keys.append(f"{digest}-{seen[digest]}")
+    return keys
+
+class PreviewPage:
+    """Keeps the WebView2 preview up to date without reloading it.
+
+    The first update loads PREVIEW_SHELL. Later ones run md2pdfPatch through
+    evaluate_js with only the stylesheets that changed and the fragments the
+    page does not have yet, so the preview keeps its scroll position and only
+    re-lays out what changed. If the page reports it missed an update (it was
+    still loading), everything is sent again.
+
+    Once the fragments add up to more than ``virtual_bytes`` (0: never), the
+    page is virtualized: it holds every fragment as text but only builds the
+    DOM for the VIRTUAL_WINDOW fragments on either side of ``position`` and
+    for those scrolled close to view, at most VIRTUAL_MAX_LIVE at a time.
+    Crossing the threshold in either direction reloads the page.
+    """
+
+    VIRTUAL_WINDOW = 20
+    VIRTUAL_MAX_LIVE = 200
+
+    def __init__(self, webview, after, virtual_bytes=0):
+        self.webview = webview
+        self.after = after
+        self.virtual_bytes = virtual_bytes
+        self.virtual = False
+        self.revision = 0
+        self.latest = None
+        self._loaded = False
+        self._styles = {}
+        self._keys = set()
+
+    def show(self, styles, fragments, position=0.0):
+        """Show the fragments; ``position`` (0.0 to 1.0) is where the editor's cursor is in the text."""
+        self.revision += 1
+        self.latest = (styles, fragments, position)
+        sizes = [len(fragment) for fragment in fragments]
+        virtual = 0 < self.virtual_bytes < sum(sizes)
+        if virtual != self.virtual:
+            self.virtual = virtual
+            self._loaded = False
+            self._styles = {}
+            self._keys = set()
+        view = None
+        if virtual:
+            # Fragment sizes stand in for how far through the text each one starts.
+            offsets = list(itertools.accumulate(sizes))
+            focus = min(bisect.bisect_left(offsets, position * offsets[-1]), len(fragments) - 1)
+            view = {"focus": focus, "window": self.VIRTUAL_WINDOW, "maxLive": self.VIRTUAL_MAX_LIVE}
+
+        keys = preview_fragment_keys(fragments)
+        changed_styles = {name: css for name, css in styles.items() if self._styles.get(name) != css}
+        new_fragments = {key: fragment for key, fragment in zip(keys, fragments) if key not in self._keys}
+        arguments = ", ".join(json.dumps(value) for value in (changed_styles, keys, new_fragments, view))
+        self._styles = dict(styles)
+        self._keys = set(keys)
+
+        if not self._loaded:
+            self._loaded = True
+            # "<" only occurs inside JSON strings; escaping it keeps "</script>" in the
+            # data from closing the shell's script element.
+            self.webview.load_html(PREVIEW_SHELL % arguments.replace("<", "\\u003c"))
+            return
+        revision = self.revision
+        self.webview.evaluate_js(
+            f"window.md2pdfPatch ? md2pdfPatch({arguments}) : 'pending'",
+            lambda result: self.after(0, lambda: self._patched(revision, result)))
+
+    def _patched(self, revision, result):
+        result = str(result).strip('"')
+        if revision != self.revision or result not in ("pending", "resync"):
+            return
+        self._styles = {}
+        self._keys = set()
+        self.after(100 if result == "pending" else 0, lambda: self._resend(revision))
+
+    def _resend(self, revision):
+        if revision == self.revision:
+            self.show(*self.latest)
+
+class MarkdownToPDFConverter:
+    def __init__(self, root):
+        self.root = root
+        
+        # --- Core Application State ---
+        self.current_file_path = None
+        self.preview_update_job = None
+        self.preview_pacer = PreviewPacer()
+        # Length of the text last handed to the preview, for PreviewPacer.
+        self.preview_chars = 0
+        # The wait chosen for the pending (or last) preview update, in ms.
+        self.preview_delay_ms = None
+        # Set by <<Modified>> until the preview has been handed the new text.
+        self.text_changed = False
+        # preview_options_key() of the last render handed to the preview renderer.
+        self.preview_key = None
+        # The file being loaded into the editor (see load_file), or None.
+        self.file_load = None
+        self.config_path = CONFIG_PATH
+        self.themes_dir = THEMES_DIR
+
+        # --- Default Settings & Configurable Variables ---
+        self.output_folder = DEFAULT_OPTIONS["output_folder"]
+        # Only settable in the config file; empty means search the usual locations.
+        self.wkhtmltopdf_path = DEFAULT_OPTIONS["wkhtmltopdf_path"]
+        # Only settable in the config file; empty means no trace log.
+        self.trace_log = DEFAULT_OPTIONS["trace_log"]
+        self.preview_max_delay_ms = DEFAULT_OPTIONS["preview_max_delay_ms"]
+        self.preview_virtual_kb = DEFAULT_OPTIONS["preview_virtual_kb"]
+        # Set through the render profile, or individually in the config file.
+        self.pdf_dpi = DEFAULT_OPTIONS["pdf_dpi"]
+        self.image_dpi = DEFAULT_OPTIONS["image_dpi"]
+        self.image_quality = DEFAULT_OPTIONS["image_quality"]
+        self.emoji_size = DEFAULT_OPTIONS["emoji_size"]
+        self.smart_shrinking = DEFAULT_OPTIONS["smart_shrinking"]
+        self.print_media_type = DEFAULT_OPTIONS["print_media_type"]
+        # Only settable in the config file.
+        self.pdf_cache = DEFAULT_OPTIONS["pdf_cache"]
+        self.pdf_cache_max_mb = DEFAULT_OPTIONS["pdf_cache_max_mb"]
+        self.parallel_sections = DEFAULT_OPTIONS["parallel_sections"]
+        self.conversion_workers = DEFAULT_OPTIONS["conversion_workers"]
+        
+        # Options with tk variables for UI binding
+        self.table_handling = tk.StringVar(value="smart_fit")
+        self.orientation = tk.StringVar(value="portrait")
+        self.filename_var = tk.StringVar(value="document")
+        self.folder_var = tk.StringVar(value=self.output_folder)
+        self.page_size = tk.StringVar(value="A4")
+        self.margin_top = tk.StringVar(value="0.8")
+        self.margin_bottom = tk.StringVar(value="0.8")
+        self.margin_left = tk.StringVar(value="0.6")
+        self.margin_right = tk.StringVar(value="0.6")
+        self.header_left = tk.StringVar()
+        self.header_center = tk.StringVar()
+        self.header_right = tk.StringVar()
+        self.footer_left = tk.StringVar()
+        self.footer_center = tk.StringVar(value="Page [page] of [topage]")
+        self.footer_right = tk.StringVar()
+        self.generate_toc = tk.BooleanVar(value=DEFAULT_OPTIONS["generate_toc"])
+        self.auto_fix_markdown = tk.BooleanVar(value=True)
+        self.dedupe_emoji = tk.BooleanVar(value=True)
+        self.optimize_images = tk.BooleanVar(value=True)
+        self.render_profile = tk.StringVar(value=DEFAULT_OPTIONS["render_profile"])
+        self.current_theme = tk.StringVar()
+        
+        # Markdown Extensions
+        self.extensions_config = {
+            'tables': tk.BooleanVar(value=True), 'extra': tk.BooleanVar(value=True),
+            'sane_lists': tk.BooleanVar(value=True), 'fenced_code': tk.BooleanVar(value=True),
+            'codehilite': tk.BooleanVar(value=True), 'nl2br': tk.BooleanVar(value=True),
+            'toc': tk.BooleanVar(value=True), 'admonition': tk.BooleanVar(value=True),
+            'attr_list': tk.BooleanVar(value=True), 'def_list': tk.BooleanVar(value=True),
+            'footnotes': tk.BooleanVar(value=True), 'meta': tk.BooleanVar(value=False),
+            'smarty': tk.BooleanVar(value=True), 'wikilinks': tk.BooleanVar(value=False)
+        }
+
+        # Trigger preview update when page layout or margins change
+        self.page_size.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.orientation.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.margin_top.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.margin_bottom.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.margin_left.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.margin_right.trace_add("write", lambda *a: self.schedule_preview_update())
+
+        # Re-render preview when any other option changes
+        self.table_handling.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.current_theme.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.generate_toc.trace_add("write", lambda *a: self.on_toc_changed())
+        self.render_profile.trace_add("write", lambda *a: self.on_render_profile_changed())
+        self.auto_fix_markdown.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.dedupe_emoji.trace_add("write", lambda *a: self.schedule_preview_update())
+        # Header/Footer fields
+        self.header_left.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.header_center.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.header_right.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.footer_left.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.footer_center.trace_add("write", lambda *a: self.schedule_preview_update())
+        self.footer_right.trace_add("write", lambda *a: self.schedule_preview_update())
+        # Markdown extensions
+        for var in self.extensions_config.values():
+            var.trace_add("write", lambda *a: self.schedule_preview_update())
+
+        # --- Initial Setup ---
+        self.setup_themes()
+        
+        # --- Emoji Mapping ---
+        # MODIFICATION: Load mapping and provide a console warning if it fails.
+        self.emoji_mapping = load_mapping_from_file()
+        if not self.emoji_mapping:
+            print("Warning: Could not load 'assets/emoji_mapping.json'. Emoji-to-SVG replacement will be disabled.")
+        self.pipeline = ConversionPipeline(self.emoji_mapping, self.themes_dir)
+        self.preview_renderer = PreviewRenderer(self.pipeline, self._deliver_preview)
+
+        self.load_config()
+        self.ensure_output_folder()
+        # Takes its worker count from the config, so it starts after load_config.
+        self.conversions = ConversionQueue(self.pipeline, self.conversion_workers, self._notify_job)
+        
+        self.root.title("Markdown to PDF Converter")
+        # Geometry is set in load_config
+        self.root.minsize(800, 600)
+        
+        self.setup_ui()
+        self.update_window_title()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def on_closing(self):
+        """Handle saving config before closing the app."""
+        if self.conversions.active() and not messagebox.askyesno(
+                "Conversions Running", "Some PDFs are still being converted. Quit anyway?"):
+            return
+        self.save_config()
+        self.cancel_file_load()
+        self.preview_renderer.close()
+        self.conversions.close()
+        self.root.destroy()
+        
+    def load_config(self):
+        """Load settings from the config file."""
+        try:
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # If config doesn't exist, fall back to the defaults.
+            config = {}
+
+        self.root.geometry(config.get("geometry", "1200x800"))
+        self.apply_options(options_from_config(config))
+
+    def apply_options(self, options):
+        """Set the UI variables from an options dict (see DEFAULT_OPTIONS)."""
+        self.output_folder = options["output_folder"]
+        self.folder_var.set(self.output_folder)
+        self.wkhtmltopdf_path = options["wkhtmltopdf_path"]
+        self.trace_log = options["trace_log"]
+        self.preview_max_delay_ms = options["preview_max_delay_ms"]
+        self.preview_virtual_kb = options["preview_virtual_kb"]
+        self.render_profile.set(options["render_profile"])
+        self.pdf_dpi = options["pdf_dpi"]
+        self.image_dpi = options["image_dpi"]
+        self.image_quality = options["image_quality"]
+        self.emoji_size = options["emoji_size"]
+        self.smart_shrinking = options["smart_shrinking"]
+        self.print_media_type = options["print_media_type"]
+        self.pdf_cache = options["pdf_cache"]
+        self.pdf_cache_max_mb = options["pdf_cache_max_mb"]
+        self.parallel_sections = options["parallel_sections"]
+        self.conversion_workers = options["conversion_workers"]
+
+        self.table_handling.set(options["table_handling"])
+        self.orientation.set(options["orientation"])
+        self.page_size.set(options["page_size"])
+        self.margin_top.set(options["margin_top"])
+        self.margin_bottom.set(options["margin_bottom"])
+        self.margin_left.set(options["margin_left"])
+        self.margin_right.set(options["margin_right"])
+        self.header_left.set(options["header_left"])
+        self.header_center.set(options["header_center"])
+        self.header_right.set(options["header_right"])
+        self.footer_left.set(options["footer_left"])
+        self.footer_center.set(options["footer_center"])
+        self.footer_right.set(options["footer_right"])
+        self.generate_toc.set(options["generate_toc"])
+        self.auto_fix_markdown.set(options["auto_fix_markdown"])
+        self.dedupe_emoji.set(options["dedupe_emoji"])
+        self.optimize_images.set(options["optimize_images"])
+        self.current_theme.set(options["current_theme"])
+
+        for ext_name, value in options["extensions"].items():
+            if ext_name in self.extensions_config:
+                self.extensions_config[ext_name].set(value)
+
+    def save_config(self):
+        """Save current settings to the config file."""
+        config = {"geometry": self.root.winfo_geometry(), **self.get_options()}
+        with open(self.config_path, 'w') as f:
+            json.dump(config, f, indent=4)
+
+    def setup_themes(self):
+        """Create themes directory and default themes if they don't exist."""
+        setup_themes(self.themes_dir)
+    
+    def get_available_themes(self):
+        """Scan themes directory for CSS files."""
+        if not os.path.exists(self.themes_dir):
+            return []
+        return sorted([f for f in os.listdir(self.themes_dir) if f.endswith('.css')])
+
+    def ensure_output_folder(self):
+        """Create output folder if it doesn't exist"""
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+    
+    def setup_ui(self):
+        # --- Menu Bar ---
+        menubar = tk.Menu(self.root)
+        self.root.config(menu=menubar)
+        
+        file_menu = self.file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="New", accelerator="Ctrl+N", command=self.new_file)
+        file_menu.add_command(label="Open...", accelerator="Ctrl+O", command=self.open_file)
+        file_menu.add_separator()
+        file_menu.add_command(label="Save", accelerator="Ctrl+S", command=self.save_file)
+        file_menu.add_command(label="Save As...", accelerator="Ctrl+Shift+S", command=self.save_file_as)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.on_closing)
+        
+        settings_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Settings", menu=settings_menu)
+        settings_menu.add_command(label="Markdown Extensions...", command=self.open_extensions_dialog)
+        
+        # --- Main Layout ---
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=0) # Control Frame
+        self.root.rowconfigure(1, weight=1) # Paned Window
+        self.root.rowconfigure(2, weight=0) # Status Bar
+        self.root.rowconfigure(3, weight=0) # Conversion jobs
+        
+        # --- Top Control Frame ---
+        control_frame = ttk.Frame(self.root, padding="10")
+        control_frame.grid(row=0, column=0, sticky="ew")
+        
+        self.convert_btn = ttk.Button(control_frame, text="Convert to PDF", command=self.convert_to_pdf)
+        self.convert_btn.pack(side="left", padx=(0, 10))
+        ttk.Button(control_frame, text="Paste from Clipboard", command=self.paste_from_clipboard).pack(side="left", padx=(0, 10))
+        ttk.Button(control_frame, text="Open Output Folder", command=lambda: os.startfile(self.output_folder)).pack(side="left")
+
+        # --- Paned Window for Editor and Preview ---
+        paned_window = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
+        paned_window.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+        
+        # --- Left Pane: Editor and Options ---
+        left_pane = ttk.Frame(paned_window)
+        paned_window.add(left_pane, weight=1)
+        left_pane.columnconfigure(0, weight=1)
+        left_pane.rowconfigure(0, weight=1)
+        
+        # Editor
+        self.text_area = ScrolledText(left_pane, wrap=tk.WORD, width=70, height=18,
+                                     font=("Consolas", 11), undo=True)
+        self.text_area.grid(row=0, column=0, sticky="nsew")
+        # Only edits set the modified flag, so moving the cursor or scrolling never re-renders.
+        self.text_area.bind("<<Modified>>", self.on_text_modified)
+        
+        # Drag-and-drop integration
+        self.text_area.drop_target_register(DND_FILES)
+        self.text_area.dnd_bind('<<Drop>>', self.drop_handler)
+        
+        # --- Right Pane: Preview and Options ---
+        right_pane = ttk.Frame(paned_window)
+        paned_window.add(right_pane, weight=1)
+        right_pane.columnconfigure(0, weight=1)
+        right_pane.rowconfigure(0, weight=1) # Preview
+        right_pane.rowconfigure(1, weight=0) # Options Notebook
+        
+        # Live Preview
+        self.html_preview = WebView2(right_pane, width=800, height=600) # NEW: Using a modern WebView2-based renderer
+        self.html_preview.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
+        self.preview_page = PreviewPage(self.html_preview, self.root.after, int(self.preview_virtual_kb) * 1024)
+        
+        # Options Notebook
+        notebook = ttk.Notebook(right_pane)
+        notebook.grid(row=1, column=0, sticky="ew")
+
+        # PDF Options Tab
+        pdf_options_tab = ttk.Frame(notebook, padding="10")
+        notebook.add(pdf_options_tab, text="PDF Options")
+        
+        # Filename
+        fn_frame = ttk.Frame(pdf_options_tab)
+        fn_frame.pack(fill="x", pady=2)
+        ttk.Label(fn_frame, text="Filename:", width=12).pack(side="left")
+        self.filename_entry = ttk.Entry(fn_frame, textvariable=self.filename_var)
+        self.filename_entry.pack(side="left", expand=True, fill="x", padx=(0,5))
+        ttk.Label(fn_frame, text=".pdf").pack(side="left")
+
+        # Output Folder
+        fd_frame = ttk.Frame(pdf_options_tab)
+        fd_frame.pack(fill="x", pady=2)
+        ttk.Label(fd_frame, text="Output Folder:", width=12).pack(side="left")
+        self.folder_label = ttk.Label(fd_frame, textvariable=self.folder_var, relief="sunken", padding=2)
+        self.folder_label.pack(side="left", expand=True, fill="x", padx=(0,5))
+        ttk.Button(fd_frame, text="Browse", command=self.browse_folder).pack(side="left")
+
+        # Theme Selector
+        th_frame = ttk.Frame(pdf_options_tab)
+        th_frame.pack(fill="x", pady=2)
+        ttk.Label(th_frame, text="Theme:", width=12).pack(side="left")
+        self.theme_selector = ttk.Combobox(th_frame, textvariable=self.current_theme, values=self.get_available_themes(), state="readonly")
+        self.theme_selector.pack(side="left", expand=True, fill="x")
+        self.theme_selector.bind("<<ComboboxSelected>>", self.schedule_preview_update)
+
+        # Page Layout
+        pl_frame = ttk.LabelFrame(pdf_options_tab, text="Page Layout", padding=5)
+        pl_frame.pack(fill="x", pady=(10,2))
+        
+        ttk.Label(pl_frame, text="Page Size:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        ttk.Combobox(pl_frame, textvariable=self.page_size, values=["A4", "Letter", "Legal", "A3", "A5"], state="readonly", width=10).grid(row=0, column=1, sticky="w")
+        
+        ttk.Label(pl_frame, text="Orientation:").grid(row=0, column=2, sticky="w", padx=(10,5), pady=2)
+        ttk.Radiobutton(pl_frame, text="Portrait", variable=self.orientation, value="portrait").grid(row=0, column=3, sticky="w")
+        ttk.Radiobutton(pl_frame, text="Landscape", variable=self.orientation, value="landscape").grid(row=0, column=4, sticky="w")
+        
+        # Margins (in)
+        m_frame = ttk.LabelFrame(pdf_options_tab, text="Margins (inches)", padding=5)
+        m_frame.pack(fill="x", pady=2)
+        
+        ttk.Label(m_frame, text="Top:").grid(row=0, column=0, padx=5)
+        ttk.Entry(m_frame, textvariable=self.margin_top, width=5).grid(row=0, column=1)
+        ttk.Label(m_frame, text="Bottom:").grid(row=0, column=2, padx=5)
+        ttk.Entry(m_frame, textvariable=self.margin_bottom, width=5).grid(row=0, column=3)
+        ttk.Label(m_frame, text="Left:").grid(row=0, column=4, padx=5)
+        ttk.Entry(m_frame, textvariable=self.margin_left, width=5).grid(row=0, column=5)
+        ttk.Label(m_frame, text="Right:").grid(row=0, column=6, padx=5)
+        ttk.Entry(m_frame, textvariable=self.margin_right, width=5).grid(row=0, column=7)
+
+        # Advanced Tab
+        adv_options_tab = ttk.Frame(notebook, padding="10")
+        notebook.add(adv_options_tab, text="Advanced")
+        
+        # Header/Footer
+        hf_frame = ttk.LabelFrame(adv_options_tab, text="Header & Footer (use [page], [topage], [date])", padding=5)
+        hf_frame.pack(fill="x", pady=2)
+        
+        ttk.Label(hf_frame, text="H. Left:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.header_left).grid(row=0, column=1, sticky="ew")
+        ttk.Label(hf_frame, text="H. Center:").grid(row=0, column=2, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.header_center).grid(row=0, column=3, sticky="ew")
+        ttk.Label(hf_frame, text="H. Right:").grid(row=0, column=4, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.header_right).grid(row=0, column=5, sticky="ew")
+        
+        ttk.Label(hf_frame, text="F. Left:").grid(row=1, column=0, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.footer_left).grid(row=1, column=1, sticky="ew")
+        ttk.Label(hf_frame, text="F. Center:").grid(row=1, column=2, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.footer_center).grid(row=1, column=3, sticky="ew")
+        ttk.Label(hf_frame, text="F. Right:").grid(row=1, column=4, sticky="w")
+        ttk.Entry(hf_frame, textvariable=self.footer_right).grid(row=1, column=5, sticky="ew")
+        hf_frame.columnconfigure(1, weight=1)
+        hf_frame.columnconfigure(3, weight=1)
+        hf_frame.columnconfigure(5, weight=1)
+
+        # Table/Misc
+        tm_frame = ttk.LabelFrame(adv_options_tab, text="Content Handling", padding=5)
+        tm_frame.pack(fill="x", pady=(10,2))
+        
+        ttk.Label(tm_frame, text="Wide table handling:").grid(row=0, column=0, sticky="w", padx=(0, 10))
+        table_frame = ttk.Frame(tm_frame)
+        table_frame.grid(row=0, column=1, sticky="w")
+        ttk.Radiobutton(table_frame, text="Smart", variable=self.table_handling, value="smart_fit").pack(side="left", padx=(0, 5))
+        ttk.Radiobutton(table_frame, text="Small Font", variable=self.table_handling, value="smaller_font").pack(side="left", padx=(0, 5))
+        ttk.Radiobutton(table_frame, text="Break Words", variable=self.table_handling, value="break_words").pack(side="left", padx=(0, 5))
+
+        ttk.Checkbutton(tm_frame, text="Generate Table of Contents", variable=self.generate_toc).grid(row=1, column=0, columnspan=2, sticky="w", pady=5)
+        ttk.Checkbutton(tm_frame, text="Auto-fix common Markdown errors", variable=self.auto_fix_markdown).grid(row=2, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(tm_frame, text="Embed each distinct emoji once (smaller HTML/PDF)", variable=self.dedupe_emoji).grid(row=3, column=0, columnspan=2, sticky="w", pady=(5, 0))
+        ttk.Checkbutton(tm_frame, text="Downsample large images to print resolution (needs Pillow)", variable=self.optimize_images).grid(row=4, column=0, columnspan=2, sticky="w", pady=(5, 0))
+        ttk.Label(tm_frame, text="Render quality:").grid(row=5, column=0, sticky="w", padx=(0, 10), pady=(5, 0))
+        ttk.Combobox(tm_frame, textvariable=self.render_profile, values=[*RENDER_PROFILES, "custom"],
+                     state="readonly", width=12).grid(row=5, column=1, sticky="w", pady=(5, 0))
+
+        # --- Status Bar ---
+        self.status_var = tk.StringVar(value="Ready")
+        self.status_bar = ttk.Label(self.root, textvariable=self.status_var, relief="sunken", padding=5)
+        self.status_bar.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
+        # Placed at the right end of the status bar while a file is loading.
+        self.load_progress = ttk.Progressbar(self.root, mode="determinate", maximum=1.0, length=200)
+        
+        # --- Conversion Jobs (hidden until the first conversion) ---
+        self.jobs_frame = ttk.Frame(self.root)
+        self.jobs_frame.columnconfigure(0, weight=1)
+        self.jobs_tree = ttk.Treeview(self.jobs_frame, columns=("document", "state", "time"), show="headings",
+                                      height=4, selectmode="browse")
+        self.jobs_tree.heading("document", text="Document")
+        self.jobs_tree.heading("state", text="State")
+        self.jobs_tree.heading("time", text="Time")
+        self.jobs_tree.column("state", width=140, stretch=False)
+        self.jobs_tree.column("time", width=80, stretch=False, anchor="e")
+        self.jobs_tree.grid(row=0, column=0, rowspan=2, sticky="ew")
+        self.jobs_tree.bind("<Double-1>", self.open_selected_job)
+        ttk.Button(self.jobs_frame, text="Cancel", command=self.cancel_selected_job).grid(row=0, column=1, sticky="ew", padx=(5, 0))
+        ttk.Button(self.jobs_frame, text="Clear Finished", command=self.clear_finished_jobs).grid(row=1, column=1, sticky="ew", padx=(5, 0))
+        
+        # --- Keyboard Shortcuts ---
+        self.root.bind("<Control-n>", lambda event: self.new_file())
+        self.root.bind("<Control-o>", lambda event: self.open_file())
+        self.root.bind("<Control-s>", lambda event: self.save_file())
+        self.root.bind("<Control-S>", lambda event: self.save_file_as()) # Captial S for Shift
+        
+    def open_extensions_dialog(self):
+        """Open a Toplevel window to manage Markdown extensions."""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Markdown Extensions")
+        dialog.geometry("300x450")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        ttk.Label(dialog, text="Select extensions to enable:", font="-weight bold").pack(pady=10)
+        
+        ext_frame = ttk.Frame(dialog, padding=10)
+        ext_frame.pack(expand=True, fill="both")
+
+        for i, (name, var) in enumerate(self.extensions_config.items()):
+            ttk.Checkbutton(ext_frame, text=name, variable=var).pack(anchor="w")
+
+        ttk.Button(dialog, text="Done", command=dialog.destroy).pack(pady=10)
+    
+    def on_render_profile_changed(self):
+        """Copy the selected render profile's settings; "custom" keeps the current ones."""
+        profile = RENDER_PROFILES.get(self.render_profile.get())
+        if profile:
+            self.pdf_dpi = profile["pdf_dpi"]
+            self.image_dpi = profile["image_dpi"]
+            self.image_quality = profile["image_quality"]
+            self.emoji_size = profile["emoji_size"]
+            self.smart_shrinking = profile["smart_shrinking"]
+            self.print_media_type = profile["print_media_type"]
+            self.generate_toc.set(profile["generate_toc"])
+        self.schedule_preview_update()
+
+    def on_toc_changed(self):
+        """Switch the render profile to "custom" when the TOC no longer matches it."""
+        profile = RENDER_PROFILES.get(self.render_profile.get())
+        if profile and profile["generate_toc"] != self.generate_toc.get():
+            self.render_profile.set("custom")
+        self.schedule_preview_update()
+
+    def on_text_modified(self, event=None):
+        """Note that the text changed and schedule a preview update."""
+        if not self.text_area.edit_modified():
+            return  # Raised by clearing the flag below.
+        # Clear the flag so that the next edit raises <<Modified>> again.
+        self.text_area.edit_modified(False)
+        self.text_changed = True
+        # Whatever is rendering now is already stale; stop it rather than let it finish.
+        self.preview_renderer.cancel()
+        self.schedule_preview_update()
+
+    def schedule_preview_update(self, event=None):
+        """Schedule a delayed update to the HTML preview pane, if the text or a preview option changed."""
+        if self.file_load is not None:
+            return  # The first preview is scheduled once the file is loaded.
+        if not self.text_changed and self._preview_options_key() == self.preview_key:
+            return
+        if self.preview_update_job:
+            self.root.after_cancel(self.preview_update_job)
+        self.preview_delay_ms = self.preview_pacer.delay_ms(self.preview_chars, int(self.preview_max_delay_ms))
+        self.preview_update_job = self.root.after(self.preview_delay_ms, self._render_preview)
+
+    def _preview_options_key(self, options=None):
+        base_dir = os.path.dirname(self.current_file_path) if self.current_file_path else None
+        return preview_options_key(options or self.get_options(), base_dir)
+
+    def _render_preview(self):
+        """Hand the current text and options to the background preview renderer."""
+        self.preview_update_job = None
+        options = self.get_options()
+        key = self._preview_options_key(options)
+        if not self.text_changed and key == self.preview_key:
+            return
+        self.text_changed = False
+        self.preview_key = key
+        self.preview_pacer.render_started()
+        md_text = self.text_area.get(1.0, tk.END)
+        self.preview_chars = len(md_text)
+        base_dir = os.path.dirname(self.current_file_path) if self.current_file_path else None
+        self.preview_renderer.submit(md_text, options, base_dir)
+
+    def _editor_position(self):
+        """How far through the text the insertion cursor is, from 0.0 to 1.0."""
+        line = int(self.text_area.index(tk.INSERT).split('.')[0])
+        lines = int(self.text_area.index('end-1c').split('.')[0])
+        return (line - 1) / max(lines - 1, 1)
+
+    def _deliver_preview(self, generation, preview, error, timings):
+        """Called on the render thread; marshal the result onto the Tk main loop."""
+        self.root.after(0, lambda: self._show_preview(generation, preview, error, timings))
+
+    def _show_preview(self, generation, preview, error, timings):
+        # A newer render was requested after this one started; it will arrive shortly.
+        if not self.preview_renderer.is_current(generation):
+            return
+        if error is not None:
+            self.status_var.set(f"Preview failed: {error}")
+            return
+        start = time.perf_counter()
+        self.preview_page.show(*preview, position=self._editor_position())
+        end = time.perf_counter()
+        timings.add("display", start, end)
+        timings.log()
+        self.preview_pacer.record(end - timings.start, self.preview_chars)
+        self.status_var.set(f"Preview: {timings.summary()} (waited {self.preview_delay_ms} ms after the last edit)")
+    
+    def drop_handler(self, event):
+        """Handle file drop event."""
+        filepath = event.data.strip('{}') # Clean up path string from dnd
+        if filepath.endswith(('.md', '.txt')):
+            self.open_file(filepath=filepath)
+        else:
+            messagebox.showwarning("Invalid File", "Please drop a Markdown (.md) or Text (.txt) file.")
+    
+    def new_file(self):
+        if self.text_area.get(1.0, tk.END).strip():
+            if not messagebox.askyesno("Confirm", "Clear current content?"):
+                return
+        self.cancel_file_load()
+        self.current_file_path = None
+        self.text_area.delete(1.0, tk.END)
+        self.filename_var.set("document")
+        self.update_window_title()
+        self.status_var.set("New file created.")
+        self.schedule_preview_update()
+
+    def open_file(self, filepath=None):
+        if not filepath:
+            filepath = filedialog.askopenfilename(
+                defaultextension=".md",
+                filetypes=[("Markdown Files", "*.md"), ("Text Files", "*.txt"), ("All Files", "*.*")]
+            )
+        if not filepath:
+            return
+        self.load_file(filepath)
+
+    def load_file(self, filepath):
+        """Load a file into the editor without blocking the UI.
+
+        A worker thread reads and decodes the file (see TextFileReader) and
+        queues its text; the main loop inserts one chunk per event, showing
+        progress in the status bar. The editor is read-only until the file is
+        loaded, and the preview is only updated then.
+        """
+        try:
+            reader = TextFileReader(filepath)
+        except Exception as e:
+            messagebox.showerror("Error Opening File", str(e))
+            return
+        self.cancel_file_load()
+        if self.preview_update_job:
+            self.root.after_cancel(self.preview_update_job)
+            self.preview_update_job = None
+        # Bounded, so that reading stays only a few chunks ahead of the editor.
+        chunks = queue.Queue(maxsize=8)
+        stop = threading.Event()
+        self.file_load = (filepath, reader, chunks, stop)
+
+        # Until it is fully loaded, the editor holds part of the file; Save must not write that over anything.
+        self.current_file_path = None
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.configure(state="disabled")
+        # Until then they would work on a truncated document; the shortcuts are refused in the commands.
+        self._enable_document_actions(False)
+        self.load_progress["value"] = 0
+        self.load_progress.place(in_=self.status_bar, relx=1.0, rely=0.5, x=-5, anchor="e")
+        threading.Thread(target=self._read_file, args=(reader, chunks, stop), name="file-loader",
+                         daemon=True).start()
+        self._insert_loaded_chunk(self.file_load, 0)
+
+    @staticmethod
+    def _read_file(reader, chunks, stop):
+        """Runs on the loader thread: queue the file's text, then None, or the exception that stopped it."""
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            for text in reader.chunks():
+                if not put(text):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(None)
+
+    def _insert_loaded_chunk(self, load, loaded_chars):
+        if load is not self.file_load:
+            return  # Cancelled.
+        filepath, reader, chunks, stop = load
+        filename = os.path.basename(filepath)
+        try:
+            item = chunks.get_nowait()
+        except queue.Empty:
+            self.root.after(10, lambda: self._insert_loaded_chunk(load, loaded_chars))
+            return
+        if isinstance(item, Exception):
+            self.cancel_file_load()
+            self.status_var.set(f"Could not open {filename}")
+            messagebox.showerror("Error Opening File", str(item))
+            return
+        if item is None:
+            self.cancel_file_load()
+            self.current_file_path = filepath
+            self.filename_var.set(os.path.splitext(filename)[0])
+            self.update_window_title()
+            self.status_var.set(f"Opened: {filename}")
+            # Lets the preview pace itself for the new document before its first render.
+            self.preview_chars = loaded_chars
+            self.text_changed = True
+            self.schedule_preview_update()
+            return
+        self.text_area.configure(state="normal")
+        self.text_area.insert(tk.END, item)
+        self.text_area.configure(state="disabled")
+        progress = reader.position / reader.size if reader.size else 1.0
+        self.load_progress["value"] = progress
+        self.status_var.set(f"Opening {filename}: {progress:.0%} ({reader.encoding})")
+        self.root.after(1, lambda: self._insert_loaded_chunk(load, loaded_chars + len(item)))
+
+    def cancel_file_load(self):
+        """Stop loading a file into the editor, keeping what has been loaded so far."""
+        if self.file_load is None:
+            return
+        self.file_load[3].set()
+        self.file_load = None
+        self.text_area.configure(state="normal")
+        self._enable_document_actions(True)
+        self.load_progress.place_forget()
+
+    def _enable_document_actions(self, enabled):
+        """Enable or disable Convert, Save and Save As."""
+        self.convert_btn.configure(state="normal" if enabled else "disabled")
+        for label in ("Save", "Save As..."):
+            self.file_menu.entryconfigure(label, state="normal" if enabled else "disabled")
+
+    def _refuse_while_loading(self, action):
+        """True (after saying so in the status bar) if a file is still loading into the editor."""
+        if self.file_load is None:
+            return False
+        self.status_var.set(f"Cannot {action} until {os.path.basename(self.file_load[0])} has finished loading.")
+        return True
+
+    def save_file(self):
+        if self._refuse_while_loading("save"):
+            return
+        if not self.current_file_path:
+            self.save_file_as()
+        else:
+            try:
+                with open(self.current_file_path, 'w', encoding='utf-8') as f:
+                    f.write(self.text_area.get(1.0, tk.END))
+                self.update_window_title()
+                self.status_var.set(f"Saved: {os.path.basename(self.current_file_path)}")
+            except Exception as e:
+                messagebox.showerror("Error Saving File", str(e))
+    
+    def save_file_as(self):
+        if self._refuse_while_loading("save"):
+            return
+        filepath = filedialog.asksaveasfilename(
+            initialfile=os.path.basename(self.current_file_path) if self.current_file_path else "untitled.md",
+            defaultextension=".md",
+            filetypes=[("Markdown Files", "*.md"), ("All Files", "*.*")]
+        )
+        if not filepath:
+            return
+        self.current_file_path = filepath
+        self.save_file()
+
+    def update_window_title(self):
+        base_title = "Markdown to PDF Converter"
+        if self.current_file_path:
+            self.root.title(f"{os.path.basename(self.current_file_path)} - {base_title}")
+        else:
+            self.root.title(base_title)
+            
+    def browse_folder(self):
+        folder = filedialog.askdirectory(initialdir=self.output_folder)
+        if folder:
+            self.output_folder = folder
+            self.folder_var.set(folder)
+    
+    def clear_text(self):
+        self.cancel_file_load()
+        self.text_area.delete(1.0, tk.END)
+        self.status_var.set("Text cleared")
+        self.schedule_preview_update()
+    
+    def paste_from_clipboard(self):
+        try:
+            clipboard_text = self.root.clipboard_get()
+            # Replaces the whole text, so a file still loading is abandoned as in new_file.
+            self.cancel_file_load()
+            self.text_area.delete(1.0, tk.END)
+            self.text_area.insert(1.0, clipboard_text)
+            self.status_var.set("Text pasted from clipboard")
+            self.schedule_preview_update()
+        except tk.TclError:
+            messagebox.showwarning("Warning", "No text found in clipboard")
+
+    def get_options(self):
+        """Snapshot the current settings as a plain options dict (see DEFAULT_OPTIONS)."""
+        return {
+            "output_folder": self.output_folder,
+            "table_handling": self.table_handling.get(),
+            "orientation": self.orientation.get(),
+            "page_size": self.page_size.get(),
+            "margin_top": self.margin_top.get(),
+            "margin_bottom": self.margin_bottom.get(),
+            "margin_left": self.margin_left.get(),
+            "margin_right": self.margin_right.get(),
+            "header_left": self.header_left.get(),
+            "header_center": self.header_center.get(),
+            "header_right": self.header_right.get(),
+            "footer_left": self.footer_left.get(),
+            "footer_center": self.footer_center.get(),
+            "footer_right": self.footer_right.get(),
+            "generate_toc": self.generate_toc.get(),
+            "auto_fix_markdown": self.auto_fix_markdown.get(),
+            "dedupe_emoji": self.dedupe_emoji.get(),
+            "optimize_images": self.optimize_images.get(),
+            "render_profile": self.render_profile.get(),
+            "pdf_dpi": self.pdf_dpi,
+            "image_dpi": self.image_dpi,
+            "image_quality": self.image_quality,
+            "emoji_size": self.emoji_size,
+            "smart_shrinking": self.smart_shrinking,
+            "print_media_type": self.print_media_type,
+            "pdf_cache": self.pdf_cache,
+            "pdf_cache_max_mb": self.pdf_cache_max_mb,
+            "parallel_sections": self.parallel_sections,
+            "conversion_workers": self.conversion_workers,
+            "current_theme": self.current_theme.get(),
+            "wkhtmltopdf_path": self.wkhtmltopdf_path,
+            "trace_log": self.trace_log,
+            "preview_max_delay_ms": self.preview_max_delay_ms,
+            "preview_virtual_kb": self.preview_virtual_kb,
+            "extensions": {name: var.get() for name, var in self.extensions_config.items()}
+        }
+
+    def get_table_css(self, html_content):
+        return self.pipeline.get_table_css(html_content, self.get_options())
+
+    def _create_html_body(self, md_text):
+        """Processes markdown text to a clean HTML body."""
+        base_dir = os.path.dirname(self.current_file_path) if self.current_file_path else None
+        return self.pipeline.create_html_body(md_text, self.get_options(), base_dir)
+        
+    def convert_markdown_to_pdf(self, md_text, output_path, options=None, base_dir=None):
+        if options is None:
+            options = self.get_options()
+            base_dir = os.path.dirname(self.current_file_path) if self.current_file_path else None
+        return self.pipeline.convert_markdown_to_pdf(md_text, output_path, options, base_dir)
+                
+    def convert_to_pdf(self):
+        if self._refuse_while_loading("convert"):
+            return
+        md_text = self.text_area.get(1.0, tk.END).strip()
+        if not md_text:
+            messagebox.showwarning("Warning", "Please enter some markdown text")
+            return
+        
+        filename = self.filename_var.get().strip()
+        invalid_chars = r'[<>:"/\\|?*]'
+        filename = re.sub(invalid_chars, '_', filename)
+        if not filename:
+            filename = "document"
+        
+        if not filename.lower().endswith('.pdf'):
+            filename += '.pdf'
+        
+        output_path = os.path.join(self.output_folder, filename)
+        if os.path.exists(output_path):
+            if not messagebox.askyesno("Confirm Overwrite", f"The file '{filename}' already exists. Do you want to overwrite it?"):
+                self.status_var.set("Conversion cancelled.")
+                return
+                
+        # Read the Tk variables here, on the UI thread, and hand the job a snapshot.
+        options = self.get_options()
+        base_dir = os.path.dirname(self.current_file_path) if self.current_file_path else None
+        self.conversions.submit(md_text, output_path, options, base_dir)
+    
+    def _notify_job(self, job):
+        # Called on a converter thread; the job may move on before the UI gets to it.
+        snapshot = (job.state, job.error, job.cached, job.seconds)
+        self.root.after(0, lambda: self._show_job(job, *snapshot))
+
+    def _show_job(self, job, state, error, cached, seconds):
+        """Update ``job``'s row in the job list and report finished jobs."""
+        label = state
+        if state == ConversionJob.DONE and cached:
+            label = "done (unchanged)"
+        elif state == ConversionJob.FAILED:
+            label = f"failed: {error}"
+        values = (os.path.basename(job.output_path), label, f"{seconds:.1f}s" if seconds is not None else "")
+        iid = str(job.id)
+        if not self.jobs_tree.exists(iid) and job not in self.conversions.jobs:
+            return  # Cleared from the list before this update arrived.
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert("", "end", iid=iid, values=values)
+            self.jobs_tree.see(iid)
+            self.jobs_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=(0, 5))
+
+        active = self.conversions.active()
+        if state == ConversionJob.QUEUED:
+            self.status_var.set(f"Queued: {os.path.basename(job.output_path)} ({active} conversion(s) pending)")
+        elif state == ConversionJob.RUNNING:
+            self.status_var.set(f"Converting to PDF: {os.path.basename(job.output_path)}")
+        elif state == ConversionJob.DONE:
+            self._conversion_complete(job.output_path, ask_to_open=not active, timings=job.timings)
+        elif state == ConversionJob.FAILED:
+            self._conversion_error(error)
+
+    def open_selected_job(self, event=None):
+        job = self._selected_job()
+        if job is not None and job.state == ConversionJob.DONE:
+            os.startfile(job.output_path)
+
+    def cancel_selected_job(self):
+        job = self._selected_job()
+        if job is not None and not self.conversions.cancel(job) and not job.finished:
+            self.status_var.set("A running conversion cannot be cancelled.")
+
+    def clear_finished_jobs(self):
+        self.conversions.clear_finished()
+        known = {str(job.id) for job in self.conversions.jobs}
+        for iid in self.jobs_tree.get_children():
+            if iid not in known:
+                self.jobs_tree.delete(iid)
+        if not self.jobs_tree.get_children():
+            self.jobs_frame.grid_remove()
+
+    def _selected_job(self):
+        selection = self.jobs_tree.selection()
+        if not selection:
+            return None
+        return next((job for job in self.conversions.jobs if str(job.id) == selection[0]), None)
+    
+    def _conversion_complete(self, output_path, ask_to_open=True, timings=None):
+        status = f"PDF saved successfully: {os.path.basename(output_path)}"
+        if timings is not None and timings.stages:
+            status += f" ({timings.summary()})"
+        self.status_var.set(status)
+        # With more conversions under way, finished ones are opened from the job list instead.
+        if ask_to_open and messagebox.askyesno("Success", f"PDF created successfully!\n\nWould you like to open it?"):
+            os.startfile(output_path)
+    
+    def _conversion_error(self, error_msg):
+        self.status_var.set("Conversion failed")
+        
+        error_dialog = f"Failed to convert to PDF.\n\nError: {error_msg}\n\n"
+        if "wkhtmltopdf" in error_msg.lower():
+            error_dialog += "Make sure wkhtmltopdf is installed:\n"
+            error_dialog += "1. Download from: https://wkhtmltopdf.org/downloads.html\n"
+            error_dialog += "2. Install to default location (or ensure it's in your system PATH)\n"
+            error_dialog += "3. Restart this application"
+        
+        messagebox.showerror("Conversion Error", error_dialog)
+
+def run():
+    """Open the main window and run the Tk event loop until it is closed."""
+    root = TkinterDnD.Tk()
+    app = MarkdownToPDFConverter(root)
+    root.mainloop()